@@ -0,0 +1,106 @@
+"""
+Benchmark: per-audit client setup overhead, before vs after the ClientRegistry.
+
+"before" rebuilds AzureChatOpenAI + AzureOpenAIEmbeddings (+ AzureSearch with
+--with-search) for every simulated audit, as audit_content_node used to.
+"after" fetches them from the shared registry.
+
+Without --with-search no network calls are made, so the script runs offline
+with placeholder credentials. --with-search needs a real Azure AI Search
+configuration in .env, because AzureSearch fetches the index schema on construction.
+
+Usage (from the project root):
+    uv run python -m backend.scripts.benchmark_clients --iterations 50
+    uv run python -m backend.scripts.benchmark_clients --iterations 10 --with-search
+"""
+import os
+import time
+import argparse
+import statistics
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# Placeholders so the OpenAI clients can be constructed offline
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark-placeholder")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://benchmark.openai.azure.com")
+os.environ.setdefault("AZURE_OPENAI_API_VERSION", "2024-02-01")
+os.environ.setdefault("AZURE_OPENAI_CHAT_DEPLOYMENT", "gpt-4o")
+
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from langchain_community.vectorstores import AzureSearch
+
+from backend.src.services.clients import ClientRegistry
+
+
+def build_fresh_clients(with_search):
+    """What audit_content_node did on every call before the registry."""
+    llm = AzureChatOpenAI(
+        azure_deployment=os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT"),
+        openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        temperature=0.0
+    )
+    embeddings = AzureOpenAIEmbeddings(
+        azure_deployment="text-embedding-3-small",
+        openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION")
+    )
+    if with_search:
+        AzureSearch(
+            azure_search_endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
+            azure_search_key=os.getenv("AZURE_SEARCH_API_KEY"),
+            index_name=os.getenv("AZURE_SEARCH_INDEX_NAME"),
+            embedding_function=embeddings.embed_query
+        )
+    return llm
+
+
+def fetch_shared_clients(registry, with_search):
+    llm = registry.llm()
+    registry.embeddings()
+    if with_search:
+        registry.vector_store()
+    return llm
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    ordered = sorted(samples)
+    p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+    print(f"{label:<28} mean {statistics.mean(samples):9.3f} ms   "
+          f"p50 {statistics.median(samples):9.3f} ms   p95 {p95:9.3f} ms   "
+          f"total {sum(samples):9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50, help="simulated audits per variant")
+    parser.add_argument("--with-search", action="store_true", help="include AzureSearch (needs real Azure config)")
+    args = parser.parse_args()
+
+    registry = ClientRegistry()
+
+    print(f"Per-audit client setup overhead over {args.iterations} audits "
+          f"({'LLM + embeddings + search' if args.with_search else 'LLM + embeddings'})")
+    print("-" * 100)
+    before = measure(lambda: build_fresh_clients(args.with_search), args.iterations)
+    report("before (new clients/audit)", before)
+
+    # First call builds the clients; it is counted, like a cold start
+    after = measure(lambda: fetch_shared_clients(registry, args.with_search), args.iterations)
+    report("after (shared registry)", after)
+    print("-" * 100)
+    print(f"Saved per audit: {statistics.mean(before) - statistics.mean(after):.3f} ms (mean)")
+
+    registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark: parsing a large Video Indexer /Index document.
+
+Compares, for parse time and peak Python memory (tracemalloc, measured on
+a separate run):
+
+- "response.json()": the whole document as dicts, as get_video_index used
+  to return it,
+- "json + slim": the parse_insights() fallback without ijson (full parse,
+  then slim_insights()),
+- "streaming (ijson/...)": parse_insights() reading the file incrementally
+  (only if ijson is installed).
+
+and checks the slim results agree with each other.
+
+--fixture takes a recorded /Index response (e.g. saved with
+`curl ".../Videos/<id>/Index?accessToken=..." > index.json`). Without it, a
+synthetic document of about --size-mb MB is generated: transcript and OCR
+plus the faces, labels, keyframes and the like that make real documents
+large.
+
+Usage (from the project root):
+    uv run python -m backend.scripts.benchmark_insights_parser --size-mb 50
+    uv run python -m backend.scripts.benchmark_insights_parser --fixture index.json
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+from backend.src.services.insights_parser import parse_insights, streaming_backend, ijson
+from backend.src.services.segments import slim_insights
+
+
+def _vi_time(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours)}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def _instances(start, length):
+    return [{
+        "adjustedStart": _vi_time(start), "adjustedEnd": _vi_time(start + length),
+        "start": _vi_time(start), "end": _vi_time(start + length),
+    }]
+
+
+def generate_fixture(path, size_mb, seed=7):
+    """Writes a synthetic /Index document of roughly size_mb MB to path."""
+    rng = random.Random(seed)
+    words = ("use code save twenty link in bio sponsored partner this product changed my "
+             "skin results guaranteed limited offer today only swipe up discount").split()
+
+    def sentence(n):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    # About 1 MB of transcript + OCR per 10 minutes of video; the rest is the bulk of a real document
+    minutes = max(10, int(size_mb * 2))
+    duration = minutes * 60
+    transcript = [
+        {"id": i, "text": sentence(12), "confidence": round(rng.uniform(0.7, 1.0), 4),
+         "speakerId": 1, "language": "en-US", "instances": _instances(i * 4.0, 4.0)}
+        for i in range(duration // 4)
+    ]
+    ocr = [
+        {"id": i, "text": sentence(4), "confidence": round(rng.uniform(0.5, 1.0), 4), "left": 100,
+         "top": 600, "width": 400, "height": 60, "angle": 0, "language": "en-US",
+         "instances": _instances(i * 2.0, 2.0)}
+        for i in range(duration // 2)
+    ]
+    insights = {
+        "version": "1.0.0.0", "duration": _vi_time(duration), "sourceLanguage": "en-US",
+        "language": "en-US", "transcript": transcript, "ocr": ocr,
+        "keywords": [], "topics": [], "faces": [], "labels": [], "shots": [],
+        "brands": [], "namedLocations": [], "namedPeople": [], "audioEffects": [],
+        "sentiments": [], "emotions": [], "blocks": [], "framePatterns": [],
+        "speakers": [{"id": 1, "name": "Speaker #1", "instances": _instances(0, duration)}],
+        "textualContentModeration": {"id": 0, "bannedWordsCount": 0, "bannedWordsRatio": 0.0, "instances": []},
+        "statistics": {"correspondenceCount": 0, "speakerTalkToListenRatio": {"1": 1.0}},
+    }
+
+    with open(path, "w") as f:
+        # Stream the filler out in pieces: it is the part the parsers must skip
+        head = {
+            "partition": None, "description": None, "privacyMode": "Private", "state": "Processed",
+            "accountId": "00000000-0000-0000-0000-000000000000", "id": "benchmark", "name": "benchmark",
+            "userName": "benchmark", "created": "2026-01-01T00:00:00+00:00", "isOwned": True,
+            "isEditable": True, "isBase": True, "durationInSeconds": duration,
+            "summarizedInsights": {"name": "benchmark", "id": "benchmark",
+                                   "duration": {"time": _vi_time(duration), "seconds": duration},
+                                   "thumbnailId": "t", "faces": [], "keywords": [], "labels": []},
+        }
+        f.write(json.dumps(head)[:-1] + ', "videos": [{"accountId": "x", "id": "benchmark", '
+                '"state": "Processed", "processingProgress": "100%", "insights": ')
+        f.write(json.dumps(insights)[:-1])
+
+        target = int(size_mb * 1024 * 1024)
+        for name, make in (
+            ("faces", lambda i: {"id": i, "name": f"Unknown #{i}", "confidence": 0.0, "thumbnailId": f"{i:032x}",
+                                 "thumbnails": [{"id": f"{i}-{t:04d}", "fileName": f"FaceInstanceThumbnail_{i}_{t}.jpg",
+                                                 "instances": _instances(t, 0.04)} for t in range(20)],
+                                 "instances": _instances(i, 3.0)}),
+            ("labels", lambda i: {"id": i, "name": sentence(2), "language": "en-US",
+                                  "instances": [{"confidence": 0.9, **_instances(t, 1.0)[0]} for t in range(20)]}),
+            ("keyFrames", lambda i: {"id": i, "instances": [{"thumbnailId": f"{i:032x}", **_instances(i, 0.04)[0]}]}),
+        ):
+            f.write(f', "{name}": [')
+            i = 0
+            while f.tell() < target * (0.4 if name == "faces" else 0.7 if name == "labels" else 1.0):
+                f.write(("," if i else "") + json.dumps(make(i)))
+                i += 1
+            f.write("]")
+        f.write("}}], \"videosRanges\": []}")
+
+
+def measure(label, fn, path):
+    # Timed without tracemalloc, which slows allocation-heavy parsing; memory on a second run
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        fn(f)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    with open(path, "rb") as f:
+        result = fn(f)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<26} {elapsed:8.2f} s   peak {peak / 2**20:9.1f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", help="recorded /Index JSON (default: generate one)")
+    parser.add_argument("--size-mb", type=float, default=50, help="size of the generated document")
+    args = parser.parse_args()
+
+    path = args.fixture
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f"vi_index_{int(args.size_mb)}mb.json")
+        if not os.path.exists(path):
+            print(f"Generating {args.size_mb:.0f} MB /Index fixture at {path} ...")
+            generate_fixture(path, args.size_mb)
+
+    print(f"/Index document: {os.path.getsize(path) / 2**20:.1f} MB ({path})")
+    print("-" * 60)
+    measure("response.json()", json.load, path)
+    slim = measure("json + slim", lambda f: slim_insights(json.load(f)), path)
+    if ijson is not None:
+        streamed = measure(f"streaming ({streaming_backend()})", parse_insights, path)
+        if json.dumps(streamed, sort_keys=True) != json.dumps(slim, sort_keys=True):
+            print("WARNING: streaming and json results differ")
+    else:
+        print("streaming                  skipped: ijson is not installed (uv sync)")
+    print("-" * 60)
+    videos = slim.get("videos") or []
+    print(f"Kept: {sum(len(v['insights']['transcript']) for v in videos)} transcript items, "
+          f"{sum(len(v['insights']['ocr']) for v in videos)} OCR items, "
+          f"{len(json.dumps(slim)) / 2**20:.1f} MB as JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Benchmark: end-to-end audit throughput and latency on a fake Azure / YouTube stack.
+
+Everything an audit talks to is replaced by a local stand-in, so runs cost
+no Azure or YouTube quota and are reproducible:
+
+- Video Indexer + ARM tokens + the media download: fake_vi_server.py in a
+  background thread, with --processing-seconds (+/- --processing-jitter)
+  of indexing and recorded /Index fixtures (backend/scripts/fixtures)
+- yt-dlp, embeddings, rulebook search and the LLM: pipeline_fakes.py
+  (deterministic, each with a configurable latency)
+
+Targets:
+
+    graph   --audits audits through compliance_graph (the server's
+            stream_workflow), --concurrency at a time
+    api     the same through the FastAPI app in process: POST /audit, then
+            polling GET /audit/{job_id}, with AUDIT_MAX_WORKERS=--concurrency
+    both    graph, then api
+
+Each target reports latency p50 / p95 / p99, throughput, peak RSS, event
+loop lag (how late a 10 ms timer fires while audits run), verdicts and the
+mean seconds per graph node. Results are written as JSON (--output, by
+default .cache/benchmarks/pipeline_<commit>_<time>.json). --compare prints
+the change against an earlier run, e.g. one from the previous commit.
+
+Usage (from the project root):
+    uv run python -m backend.scripts.benchmark_pipeline --audits 100 --concurrency 20
+    uv run python -m backend.scripts.benchmark_pipeline --target api --compare .cache/benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_FIXTURES = [os.path.join(FIXTURES_DIR, name) for name in ("vi_index_sponsored.json", "vi_index_clean.json")]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("graph", "api", "both"), default="both")
+    parser.add_argument("--audits", type=int, default=50, help="audits per target")
+    parser.add_argument("--concurrency", type=int, default=10, help="audits in flight at once")
+    parser.add_argument("--processing-seconds", type=float, default=2.0, help="fake VI indexing time per video")
+    parser.add_argument("--processing-jitter", type=float, default=0.5, help="+/- seconds of indexing time")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake VI per-request latency")
+    parser.add_argument("--media-kb", type=int, default=512, help="size of each fake video")
+    parser.add_argument("--extract-ms", type=float, default=200.0, help="fake yt-dlp extraction time")
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0, help="fake embedding call latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=1500.0, help="fake LLM call latency")
+    parser.add_argument("--fixtures", nargs="+", default=DEFAULT_FIXTURES,
+                        help="recorded /Index documents, served round-robin")
+    parser.add_argument("--output", help="results JSON (default .cache/benchmarks/pipeline_<commit>_<time>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    return parser.parse_args()
+
+
+args = parse_args()
+
+# Hermetic settings, before the server module reads them at import
+os.environ.update({
+    "VI_INSIGHTS_STORE": "off",
+    "AUDIT_CACHE_BACKEND": "none",
+    "CHECKPOINT_BACKEND": "memory",
+    "CHECKPOINT_RESUME_ON_STARTUP": "false",
+    "WARM_UP_CLIENTS": "false",
+    "APPLICATIONINSIGHTS_CONNECTION_STRING": "",
+    "AUDIT_MAX_WORKERS": str(args.concurrency),
+    "AUDIT_QUEUE_SIZE": str(max(args.audits, 100)),
+    "VI_POLL_INITIAL_SECONDS": "0.5",
+    "VI_POLL_MAX_SECONDS": "2",
+    "FAKE_VI_PROCESSING_SECONDS": str(args.processing_seconds),
+    "FAKE_VI_PROCESSING_JITTER": str(args.processing_jitter),
+    "FAKE_VI_LATENCY_MS": str(args.latency_ms),
+    "FAKE_VI_MEDIA_KB": str(args.media_kb),
+    "FAKE_VI_INSIGHTS_FIXTURES": ",".join(args.fixtures),
+})
+for name in ("VI_CALLBACK_URL", "OTEL_SPANS_FILE", "LANGCHAIN_TRACING_V2"):
+    os.environ.pop(name, None)
+os.environ.setdefault("AZURE_VI_ACCOUNT_ID", "benchmark-account")
+os.environ.setdefault("AZURE_VI_LOCATION", "trial")
+os.environ.setdefault("AZURE_SUBSCRIPTION_ID", "benchmark-subscription")
+os.environ.setdefault("AZURE_RESOURCE_GROUP", "benchmark-rg")
+
+import httpx
+
+from backend.scripts.load_test_vi import free_port, start_fake_server
+from backend.scripts.pipeline_fakes import install_fakes
+from backend.src.api import server
+from backend.src.services.instrumentation import audit_timings
+from backend.src.services.progress import ProgressLog
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def rss_bytes():
+    """Current resident set size (Linux /proc), else the peak from getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class LoopMonitor:
+    """Samples event loop lag (timer overshoot) and RSS while a target runs."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+        self.peak_rss = rss_bytes()
+        self._task = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - start - self.interval, 0.0))
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+
+
+def video_url():
+    # Distinct 11-character IDs, so no audit reuses another's media info
+    return f"https://youtu.be/bm{uuid.uuid4().hex[:9]}"
+
+
+async def run_graph_audit(i):
+    session_id = str(uuid.uuid4())
+    payload = server.build_initial_inputs(video_url(), session_id)
+    with audit_timings() as timings:
+        final_state = await server.stream_workflow(payload, ProgressLog(), thread_id=session_id)
+    await server.forget_checkpoints(session_id)
+    return {
+        "status": final_state.get("final_status", "UNKNOWN"),
+        "errors": final_state.get("errors") or [],
+        "precheck": (final_state.get("precheck") or {}).get("decision"),
+        "timings": timings.to_dict(),
+    }
+
+
+async def run_api_audit(client, i):
+    response = await client.post("/audit", json={"video_url": video_url()})
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        await asyncio.sleep(0.05)
+        job = (await client.get(f"/audit/{job_id}")).json()
+        if job["status"] == "COMPLETED":
+            result = job["result"]
+            return {"status": result["status"], "errors": [], "precheck": (result.get("precheck") or {}).get("decision"),
+                    "timings": result.get("timings") or {}}
+        if job["status"] == "FAILED":
+            return {"status": "ERROR", "errors": [job.get("error")], "precheck": None, "timings": {}}
+
+
+async def drive(run_one, audits, concurrency):
+    """Runs `audits` audits, `concurrency` at a time; returns (wall seconds, [(latency, outcome)])."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                outcome = await run_one(i)
+            except Exception as e:
+                outcome = {"status": "ERROR", "errors": [str(e)], "precheck": None, "timings": {}}
+            return time.perf_counter() - start, outcome
+
+    start = time.perf_counter()
+    runs = await asyncio.gather(*(timed(i) for i in range(audits)))
+    return time.perf_counter() - start, runs
+
+
+def summarize(target, wall, runs, monitor):
+    latencies = [latency for latency, _ in runs]
+    outcomes = [outcome for _, outcome in runs]
+    statuses, prechecks, node_seconds = {}, {}, {}
+    for outcome in outcomes:
+        statuses[outcome["status"]] = statuses.get(outcome["status"], 0) + 1
+        if outcome["precheck"]:
+            prechecks[outcome["precheck"]] = prechecks.get(outcome["precheck"], 0) + 1
+        for node, seconds in (outcome["timings"].get("nodes") or {}).items():
+            node_seconds.setdefault(node, []).append(seconds)
+    errors = [error for outcome in outcomes for error in outcome["errors"]]
+    return {
+        "target": target,
+        "audits": len(runs),
+        "wall_seconds": round(wall, 3),
+        "throughput_per_second": round(len(runs) / wall, 3) if wall else 0.0,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(max(latencies, default=0.0), 3),
+            "mean": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        },
+        "event_loop_lag_ms": {
+            "p50": round(percentile(monitor.lags, 0.50) * 1000, 2),
+            "p99": round(percentile(monitor.lags, 0.99) * 1000, 2),
+            "max": round(max(monitor.lags, default=0.0) * 1000, 2),
+        },
+        "peak_rss_mb": round(monitor.peak_rss / 2**20, 1),
+        "statuses": statuses,
+        "precheck": prechecks,
+        "node_seconds_mean": {node: round(statistics.fmean(values), 3) for node, values in sorted(node_seconds.items())},
+        "errors": errors[:5],
+    }
+
+
+async def run_target(target, vi_base_url, index_dir):
+    install_fakes(vi_base_url, index_dir, llm_latency_ms=args.llm_latency_ms,
+                  embed_latency_ms=args.embed_latency_ms, extract_ms=args.extract_ms)
+    if target == "graph":
+        async with LoopMonitor() as monitor:
+            wall, runs = await drive(run_graph_audit, args.audits, args.concurrency)
+        return summarize(target, wall, runs, monitor)
+
+    async with server.app.router.lifespan_context(server.app):
+        # The lifespan warm-up is off; reinstall in case anything reset the registry
+        install_fakes(vi_base_url, index_dir, llm_latency_ms=args.llm_latency_ms,
+                      embed_latency_ms=args.embed_latency_ms, extract_ms=args.extract_ms)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            async with LoopMonitor() as monitor:
+                wall, runs = await drive(lambda i: run_api_audit(client, i), args.audits, args.concurrency)
+    return summarize(target, wall, runs, monitor)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def print_result(result):
+    latency, lag = result["latency_seconds"], result["event_loop_lag_ms"]
+    print(f"{result['target']:<6} {result['audits']} audits in {result['wall_seconds']:7.2f} s  "
+          f"{result['throughput_per_second']:6.2f} audits/s  latency p50 {latency['p50']:6.2f} s  "
+          f"p95 {latency['p95']:6.2f} s  p99 {latency['p99']:6.2f} s  loop lag p99 {lag['p99']:6.1f} ms  "
+          f"peak RSS {result['peak_rss_mb']:7.1f} MB")
+    print(f"       verdicts {result['statuses']}  precheck {result['precheck']}  "
+          f"node seconds (mean) {result['node_seconds_mean']}")
+    for error in result["errors"]:
+        print(f"       error: {error}")
+
+
+# (label, path into a target's result, higher is better)
+COMPARED = [
+    ("throughput/s", ("throughput_per_second",), True),
+    ("latency p50 s", ("latency_seconds", "p50"), False),
+    ("latency p95 s", ("latency_seconds", "p95"), False),
+    ("latency p99 s", ("latency_seconds", "p99"), False),
+    ("loop lag p99 ms", ("event_loop_lag_ms", "p99"), False),
+    ("peak RSS MB", ("peak_rss_mb",), False),
+]
+
+
+def compare(baseline, current):
+    print(f"Compared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    for target, result in current["results"].items():
+        before = baseline.get("results", {}).get(target)
+        if before is None:
+            continue
+        for label, path, higher_is_better in COMPARED:
+            old, new = before, result
+            for key in path:
+                old, new = old.get(key), new.get(key)
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            worse = change < 0 if higher_is_better else change > 0
+            flag = "  <- regression" if worse and abs(change) >= 10 else ""
+            print(f"  {target:<6} {label:<16} {old:>10} -> {new:>10}  ({change:+6.1f}%){flag}")
+
+
+async def main():
+    port = free_port()
+    vi_base_url = f"http://127.0.0.1:{port}"
+    fake_server, thread = start_fake_server(port, args.processing_seconds, args.latency_ms)
+    index_dir = tempfile.mkdtemp(prefix="benchmark_rulebook_")
+
+    print(f"Fake stack at {vi_base_url}: VI indexing {args.processing_seconds}+/-{args.processing_jitter}s, "
+          f"{args.latency_ms}ms VI latency, {args.media_kb} KB media, yt-dlp {args.extract_ms}ms, "
+          f"embeddings {args.embed_latency_ms}ms, LLM {args.llm_latency_ms}ms; "
+          f"{len(args.fixtures)} /Index fixture(s)")
+    print("-" * 120)
+    results = {}
+    try:
+        for target in (("graph", "api") if args.target == "both" else (args.target,)):
+            results[target] = await run_target(target, vi_base_url, index_dir)
+            print_result(results[target])
+    finally:
+        fake_server.should_exit = True
+        thread.join(timeout=5)
+    print("-" * 120)
+    return results
+
+
+if __name__ == "__main__":
+    results = asyncio.run(main())
+
+    commit, dirty = git_commit()
+    created_at = datetime.now(timezone.utc)
+    report = {
+        "benchmark": "pipeline",
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        ".cache", "benchmarks", f"pipeline_{commit or 'nogit'}_{created_at:%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,146 @@
+"""
+Local fake of Azure Video Indexer (plus the ARM token exchange), for load tests.
+
+Implements only what VideoIndexerService / AsyncVideoIndexerService call:
+
+    POST /subscriptions/.../generateAccessToken          -> {"accessToken": <JWT>}
+    POST /{location}/Accounts/{account}/Videos           -> {"id": ...}  (upload body is drained)
+    GET  /{location}/Accounts/{account}/Videos/{id}/Index -> Processing (with progress), then Processed
+                                                             (transcript / OCR only if includedInsights asks)
+    GET  /media/{name}                                    -> FAKE_VI_MEDIA_KB of bytes, a stand-in
+                                                             for a YouTube media URL
+
+Point both AZURE_ARM_BASE and AZURE_VI_API_BASE at it. Each video takes
+FAKE_VI_PROCESSING_SECONDS (+/- FAKE_VI_PROCESSING_JITTER) to "index" and
+every request waits FAKE_VI_LATENCY_MS first, to mimic network round-trips.
+
+A Processed video's /Index is a tiny built-in document, or, with
+FAKE_VI_INSIGHTS_FIXTURES (comma-separated paths to recorded /Index
+responses, e.g. backend/scripts/fixtures/*.json), one fixture per video in
+upload order.
+
+Run standalone (load_test_vi.py and benchmark_pipeline.py start it for you):
+    uv run uvicorn backend.scripts.fake_vi_server:app --port 8099
+"""
+import os
+import json
+import time
+import uuid
+import base64
+import random
+import asyncio
+from typing import Dict, List, Tuple
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+PROCESSING_SECONDS = float(os.getenv("FAKE_VI_PROCESSING_SECONDS", "5"))
+PROCESSING_JITTER = float(os.getenv("FAKE_VI_PROCESSING_JITTER", "0"))
+LATENCY_MS = float(os.getenv("FAKE_VI_LATENCY_MS", "50"))
+MEDIA_KB = int(os.getenv("FAKE_VI_MEDIA_KB", "512"))
+INSIGHTS_FIXTURES = [path for path in os.getenv("FAKE_VI_INSIGHTS_FIXTURES", "").split(",") if path.strip()]
+
+app = FastAPI(title="Fake Video Indexer")
+
+# azure video id -> (upload time (monotonic), seconds to index, fixture index)
+videos: Dict[str, Tuple[float, float, int]] = {}
+counters = {"token_requests": 0, "uploads": 0, "index_requests": 0, "insights_requests": 0,
+            "upload_bytes": 0, "media_bytes": 0}
+_rng = random.Random(int(os.getenv("FAKE_VI_SEED", "7")))
+
+
+def _load_fixtures() -> List[bytes]:
+    """Recorded /Index documents, serialised once (they are served as-is)."""
+    fixtures = []
+    for path in INSIGHTS_FIXTURES:
+        with open(path.strip(), "rb") as f:
+            fixtures.append(json.dumps(json.load(f)).encode("utf-8"))
+    return fixtures
+
+
+fixtures = _load_fixtures()
+media_body = random.Random(0).randbytes(MEDIA_KB * 1024)
+
+
+def fake_jwt(lifetime: int = 3600) -> str:
+    """Unsigned JWT whose `exp` claim the token cache can read."""
+    def b64(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return f"{b64({'alg': 'none'})}.{b64({'exp': int(time.time()) + lifetime})}.sig"
+
+
+async def network_latency():
+    if LATENCY_MS > 0:
+        await asyncio.sleep(LATENCY_MS / 1000)
+
+
+@app.post("/subscriptions/{path:path}")
+async def generate_access_token(path: str):
+    await network_latency()
+    counters["token_requests"] += 1
+    return {"accessToken": fake_jwt()}
+
+
+@app.post("/{location}/Accounts/{account_id}/Videos")
+async def upload_video(location: str, account_id: str, request: Request):
+    await network_latency()
+    async for chunk in request.stream():
+        counters["upload_bytes"] += len(chunk)
+    video_id = uuid.uuid4().hex[:10]
+    seconds = max(PROCESSING_SECONDS + _rng.uniform(-PROCESSING_JITTER, PROCESSING_JITTER), 0.0)
+    videos[video_id] = (time.monotonic(), seconds, counters["uploads"])
+    counters["uploads"] += 1
+    return {"id": video_id, "name": request.query_params.get("name")}
+
+
+@app.get("/{location}/Accounts/{account_id}/Videos/{video_id}/Index")
+async def get_video_index(location: str, account_id: str, video_id: str, includedInsights: str = ""):
+    await network_latency()
+    counters["index_requests"] += 1
+    video = videos.get(video_id)
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    uploaded_at, seconds, ordinal = video
+    elapsed = time.monotonic() - uploaded_at
+    if elapsed < seconds:
+        progress = int(100 * elapsed / seconds)
+        return {"state": "Processing", "videos": [{"processingProgress": f"{progress}%"}]}
+    if "Transcript" not in includedInsights.split(","):
+        # A status poll (INDEX_STATE_PARAMS): no transcript / OCR in the view
+        return {"state": "Processed", "videos": [{"state": "Processed", "processingProgress": "100%"}]}
+
+    counters["insights_requests"] += 1
+
+    if fixtures:
+        return Response(content=fixtures[ordinal % len(fixtures)], media_type="application/json")
+    return {
+        "state": "Processed",
+        "summarizedInsights": {"duration": {"seconds": 30}},
+        "videos": [{
+            "processingProgress": "100%",
+            "insights": {
+                "transcript": [{"text": "This product is guaranteed to work for everyone."}],
+                "ocr": [{"text": "#ad"}],
+            },
+        }],
+    }
+
+
+@app.get("/media/{name}")
+async def get_media(name: str):
+    """Media bytes, streamed in chunks like a CDN response."""
+    await network_latency()
+
+    async def body():
+        for start in range(0, len(media_body), 64 * 1024):
+            chunk = media_body[start:start + 64 * 1024]
+            counters["media_bytes"] += len(chunk)
+            yield chunk
+
+    return StreamingResponse(body(), media_type="video/mp4", headers={"Content-Length": str(len(media_body))})
+
+
+@app.get("/stats")
+async def stats():
+    return {**counters, "videos": len(videos)}
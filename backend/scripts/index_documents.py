@@ -1,6 +1,11 @@
 import os
+import sys
 import glob
+import json
+import hashlib
 import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
@@ -13,6 +18,15 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import AzureOpenAIEmbeddings
 from langchain_community.vectorstores import AzureSearch
 
+# Local vector index (lets the auditor retrieve rules without Azure AI Search)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from backend.src.services.rulebook_index import (
+    save_local_index,
+    load_local_index,
+    local_index_dir,
+    local_index_exists,
+)
+
 # 1. Setup Logging & Configuration
 logging.basicConfig(
     level=logging.INFO,
@@ -20,9 +34,93 @@ logging.basicConfig(
 )
 logger = logging.getLogger("indexer")
 
-def index_docs():
+# Manifest of what has been indexed: file hashes -> chunk IDs, plus the chunk
+# IDs currently in Azure AI Search. Lets re-runs skip unchanged PDFs.
+MANIFEST_PATH = os.getenv("RULEBOOK_MANIFEST", ".cache/rulebook_manifest.json")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source, text, ordinal):
+    """Stable ID for a chunk: same file + same text + same position = same ID."""
+    return hashlib.sha256(f"{source}\x1f{ordinal}\x1f{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def load_and_split(pdf_path):
+    """
+    Loads one PDF and splits it into chunks. Runs in a worker process, so it
+    returns plain (chunk_id, text, metadata) tuples rather than Documents.
+    """
+    raw_docs = PyPDFLoader(pdf_path).load()
+
+    # 9. Chunking Strategy
+    # We split text into 1000-character chunks with 200- character overlap
+    # to ensure context isn't lost between cuts.
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200
+    )
+    splits = text_splitter.split_documents(raw_docs)
+
+    source = os.path.basename(pdf_path)
+    chunks = []
+    for ordinal, split in enumerate(splits):
+        # Tag the source for citation later
+        metadata = {k: v for k, v in split.metadata.items() if isinstance(v, (str, int, float, bool))}
+        metadata["source"] = source
+        cid = chunk_id(source, split.page_content, ordinal)
+        metadata["chunk_id"] = cid
+        chunks.append((cid, split.page_content, metadata))
+    return chunks
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {"files": {}, "azure_chunk_ids": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def embed_in_batches(embeddings, texts, batch_size, parallelism):
+    """Embeds texts in fixed-size batches, several batches in flight at once."""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if not batches:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(batches)))) as pool:
+        results = list(pool.map(embeddings.embed_documents, batches))
+    return [vector for batch in results for vector in batch]
+
+
+def index_docs(upload_to_azure=True, write_local_index=True, full=False,
+               parse_workers=None, embed_batch_size=64, embed_parallelism=4):
     """
     Read PDFs from backend/data, chunk them, and uploads vectors to Azure AI Search.
+
+    Also writes the chunks + embeddings to the local vector index
+    (RULEBOOK_INDEX_DIR) used by the auditor for in-process retrieval.
+
+    Incremental: only PDFs whose hash changed are re-parsed, only chunks
+    that are new are embedded and uploaded, and chunks whose source PDF
+    changed or was removed are deleted from the index. Pass full=True to
+    ignore the manifest and rebuild everything.
+
+    Returns the names of PDFs that failed to parse but were indexed before:
+    their previous chunks are kept, so their rules stay searchable until a
+    later run parses them.
     """
     # 2. Define Paths
     # We look for the 'data' folder relative to this script's location
@@ -34,27 +132,30 @@ def index_docs():
     logger.info("Environment Configuration Check:")
     logger.info(f"AZURE_OPENAI_ENDPOINT: {os.getenv('AZURE_OPENAI_ENDPOINT')}")
     logger.info(f"AZURE_OPENAI_API_VERSION: {os.getenv('AZURE_OPENAI_API_VERSION')}")
-    logger.info(f"Embedding Deployment: {os.getenv('AZURE_OPENAI_EMBEDDING_DEPLOYMENT', 
+    logger.info(f"Embedding Deployment: {os.getenv('AZURE_OPENAI_EMBEDDING_DEPLOYMENT',
                                                    'text-embedding-3-small')}")
     logger.info(f"AZURE_SEARCH_ENDPOINT: {os.getenv('AZURE_SEARCH_ENDPOINT')}")
     logger.info(f"AZURE_SEARCH_INDEX_NAME: {os.getenv('AZURE_SEARCH_INDEX_NAME')}")
     logger.info("=" * 60)
-    
+
     # 4. Validate Required Environment Variables
     required_vars = [
         "AZURE_OPENAI_ENDPOINT",
         "AZURE_OPENAI_API_KEY",
-        "AZURE_SEARCH_ENDPOINT",
-        "AZURE_SEARCH_API_KEY",
-        "AZURE_SEARCH_INDEX_NAME"
     ]
-    
+    if upload_to_azure:
+        required_vars += [
+            "AZURE_SEARCH_ENDPOINT",
+            "AZURE_SEARCH_API_KEY",
+            "AZURE_SEARCH_INDEX_NAME"
+        ]
+
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     if missing_vars:
         logger.error(f"Missing required environment variables: {missing_vars}")
         logger.error("Please check your .env file and ensure all variables are set.")
         return
-    
+
     # 5. Initialize Embedding Model (The "Translator")
     # This turns text into numbers (vectors).
     # MUST match the model you deployed in Azure AI Foundry ("text-embedding-3-small")
@@ -71,75 +172,210 @@ def index_docs():
         logger.error(f"Failed to initialize embeddings: {e}")
         logger.error("Please verify your Azure OpenAI deployment name and endpoint.")
         return
-    
+
     # 6. Initialize Azure Search (The Database)
-    try:
-        logger.info("Initializing Azure AI Search vector store...")
-        index_name = os.getenv("AZURE_SEARCH_INDEX_NAME")
-        vector_store = AzureSearch(
-            azure_search_endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
-            azure_search_key=os.getenv("AZURE_SEARCH_API_KEY"),
-            index_name=index_name,
-            embedding_function=embeddings.embed_query
-        )
-        logger.info(f"Vector store initialized for index: {index_name}")
-    except Exception as e:
-        logger.error(f"Failed to initialize Azure Search: {e}")
-        logger.error("Please verify your Azure Search endpoint, API key, and index name.")
-        return
-    
+    index_name = os.getenv("AZURE_SEARCH_INDEX_NAME")
+    vector_store = None
+    if upload_to_azure:
+        try:
+            logger.info("Initializing Azure AI Search vector store...")
+            vector_store = AzureSearch(
+                azure_search_endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
+                azure_search_key=os.getenv("AZURE_SEARCH_API_KEY"),
+                index_name=index_name,
+                embedding_function=embeddings.embed_query
+            )
+            logger.info(f"Vector store initialized for index: {index_name}")
+        except Exception as e:
+            logger.error(f"Failed to initialize Azure Search: {e}")
+            logger.error("Please verify your Azure Search endpoint, API key, and index name.")
+            return
+
     # 7. Find PDF Files
-    pdf_files = glob.glob(os.path.join(data_folder, "*.pdf"))
+    pdf_files = sorted(glob.glob(os.path.join(data_folder, "*.pdf")))
     if not pdf_files:
         logger.warning(f"No PDFs found in {data_folder}. Please add files.")
         return
-    
+
     logger.info(f"Found {len(pdf_files)} PDFs to process: {[os.path.basename(f) for f in pdf_files]}")
 
-    all_splits =[]
+    manifest = {"files": {}, "azure_chunk_ids": []} if full else load_manifest(MANIFEST_PATH)
+
+    # Chunks (text + vector) we already have, keyed by chunk ID
+    known_chunks = {}
+    if not full:
+        for chunk, vector in load_local_index(local_index_dir()):
+            cid = chunk.get("metadata", {}).get("chunk_id")
+            if cid:
+                known_chunks[cid] = (chunk["text"], chunk.get("metadata", {}), vector)
 
-    # 8. Process Each PDF
+    azure_chunk_ids = set(manifest.get("azure_chunk_ids", []))
+
+    def needs_data(cid):
+        """A chunk's text + vector are needed to write the local index or to upload it."""
+        return write_local_index or (upload_to_azure and cid not in azure_chunk_ids)
+
+    # 8. Decide which PDFs changed
+    file_hashes = {os.path.basename(p): file_sha256(p) for p in pdf_files}
+    changed, unchanged = [], set()
     for pdf_path in pdf_files:
-        try:
-            logger.info(f"Loading: {os.path.basename(pdf_path)}...")
-            loader = PyPDFLoader(pdf_path)
-            raw_docs = loader.load()
-
-            # 9. Chunking Strategy
-            # We split text into 1000-character chunks with 200- character overlap
-            # to ensure context isn't lost between cuts.
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            splits = text_splitter.split_documents(raw_docs)
+        name = os.path.basename(pdf_path)
+        previous = manifest["files"].get(name)
+        reusable = (
+            previous is not None
+            and previous["sha256"] == file_hashes[name]
+            and all(cid in known_chunks or not needs_data(cid) for cid in previous["chunk_ids"])
+        )
+        if reusable:
+            unchanged.add(pdf_path)
+        else:
+            changed.append(pdf_path)
+    removed = sorted(set(manifest["files"]) - set(file_hashes))
+
+    logger.info(f"{len(unchanged)} unchanged, {len(changed)} new/changed, {len(removed)} removed PDFs")
 
-            # Tag the source for citation later
-            for split in splits:
-                split.metadata["source"] = os.path.basename(pdf_path)
+    # 9. Parse changed PDFs in parallel worker processes
+    parsed = {}
+    if changed:
+        with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+            futures = {pool.submit(load_and_split, p): p for p in changed}
+            for future, pdf_path in futures.items():
+                name = os.path.basename(pdf_path)
+                try:
+                    parsed[name] = future.result()
+                    logger.info(f"Loaded {name} -> {len(parsed[name])} chunks.")
+                except Exception as e:
+                    logger.error(f"Failed to process {pdf_path}: {e}")
 
-            all_splits.extend(splits)
-            logger.info(f" -> Split into {len(splits)} chunks.")
+    # Assemble the full chunk set: reused chunks + freshly parsed ones
+    all_chunk_ids = []  # every chunk that should be in the index, in file order
+    chunk_data = {}     # chunk_id -> (text, metadata), for the chunks we have text for
+    new_manifest_files = {}
+    stale = []          # failed to parse, previous chunks kept
+    for pdf_path in pdf_files:
+        name = os.path.basename(pdf_path)
+        if pdf_path in unchanged:
+            chunk_ids = manifest["files"][name]["chunk_ids"]
+            for cid in chunk_ids:
+                if cid in known_chunks:
+                    chunk_data[cid] = known_chunks[cid][:2]
+        elif name in parsed:
+            chunk_ids = [cid for cid, _, _ in parsed[name]]
+            for cid, text, metadata in parsed[name]:
+                chunk_data[cid] = (text, metadata)
+        elif name in manifest["files"]:
+            # Failed to parse, but indexed before: keep its previous chunks
+            # (and hash, so it is retried) instead of deleting its rules
+            previous = manifest["files"][name]
+            for cid in previous["chunk_ids"]:
+                if cid in known_chunks:
+                    chunk_data[cid] = known_chunks[cid][:2]
+            all_chunk_ids.extend(previous["chunk_ids"])
+            new_manifest_files[name] = previous
+            stale.append(name)
+            continue
+        else:
+            continue  # never indexed and failed to parse; retried next run
+        all_chunk_ids.extend(chunk_ids)
+        new_manifest_files[name] = {"sha256": file_hashes[name], "chunk_ids": chunk_ids}
 
+    if stale:
+        logger.warning(f"Stale rules kept for {len(stale)} PDF(s) that failed to parse: {stale}. "
+                       "Their previously indexed chunks stay in the index until they parse again.")
+
+    if not all_chunk_ids:
+        logger.warning("No documents were processed.")
+        return
+
+    # 10. Embed only chunks we have no vector for, in parallel batches
+    vectors = {cid: known_chunks[cid][2] for cid in chunk_data if cid in known_chunks}
+    to_embed = [cid for cid in chunk_data if cid not in vectors and needs_data(cid)]
+    if to_embed:
+        logger.info(f"Embedding {len(to_embed)} new chunks "
+                    f"(batch size {embed_batch_size}, {embed_parallelism} in flight)...")
+        try:
+            fresh = embed_in_batches(embeddings, [chunk_data[cid][0] for cid in to_embed],
+                                     embed_batch_size, embed_parallelism)
         except Exception as e:
-            logger.error(f"Failed to process {pdf_path}: {e}")
+            logger.error(f"Failed to embed chunks: {e}")
+            return
+        vectors.update(zip(to_embed, fresh))
+    else:
+        logger.info("No new chunks to embed.")
 
-    # 10. Upload to Azure
-    if all_splits:
-        logger.info(f"Uploading {len(all_splits)} chunks to Azure AI Search Index '{index_name}'...")
+    # 11. Sync Azure AI Search: upload new chunks, delete stale ones
+    if upload_to_azure:
+        to_upload = [cid for cid in all_chunk_ids if cid not in azure_chunk_ids and cid in chunk_data]
+        to_delete = sorted(azure_chunk_ids - set(all_chunk_ids))
         try:
-            # Azure Search accepts batches automatically via this methos
-            vector_store.add_documents(documents=all_splits)
+            if to_upload:
+                logger.info(f"Uploading {len(to_upload)} chunks to Azure AI Search Index '{index_name}'...")
+                vector_store.add_embeddings(
+                    text_embeddings=[(chunk_data[cid][0], vectors[cid]) for cid in to_upload],
+                    metadatas=[chunk_data[cid][1] for cid in to_upload],
+                    keys=to_upload,
+                )
+            if to_delete:
+                logger.info(f"Deleting {len(to_delete)} stale chunks from '{index_name}'...")
+                vector_store.delete(ids=to_delete)
+            azure_chunk_ids = (azure_chunk_ids | set(to_upload)) - set(to_delete)
             logger.info("=" * 60)
             logger.info("✅ Indexing Complete! The Knowledge Base is ready.")
-            logger.info(f"Total chunks indexed: {len(all_splits)}")
+            logger.info(f"Total chunks indexed: {len(all_chunk_ids)} "
+                        f"({len(to_upload)} uploaded, {len(to_delete)} deleted)")
             logger.info("=" * 60)
         except Exception as e:
-            logger.error(f"Failed to upload documents to Azure Search: {e}")
+            logger.error(f"Failed to sync documents with Azure Search: {e}")
             logger.error("Please check your Azure Search configuration and try again.")
-    else:
-        logger.warning("No documents were processed.")
+
+    # 12. Write the local vector index
+    if write_local_index and (changed or removed or full or not local_index_exists()):
+        # Kept chunks of a stale PDF are missing only if the local index was lost
+        local_ids = [cid for cid in all_chunk_ids if cid in chunk_data]
+        if len(local_ids) < len(all_chunk_ids):
+            logger.warning(f"{len(all_chunk_ids) - len(local_ids)} kept chunks have no local copy "
+                           "and are left out of the local index.")
+        try:
+            fingerprint = save_local_index(
+                local_index_dir(),
+                [chunk_data[cid][0] for cid in local_ids],
+                [vectors[cid] for cid in local_ids],
+                metadatas=[chunk_data[cid][1] for cid in local_ids],
+                model=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small"),
+            )
+            logger.info(f"✅ Local rulebook index written to {local_index_dir()} (fingerprint {fingerprint})")
+        except Exception as e:
+            logger.error(f"Failed to write local rulebook index: {e}")
+    elif write_local_index:
+        logger.info("Local rulebook index is up to date.")
+
+    save_manifest(MANIFEST_PATH, {"files": new_manifest_files, "azure_chunk_ids": sorted(azure_chunk_ids)})
+    return stale
+
 
 if __name__ == "__main__":
-    index_docs()
+    parser = argparse.ArgumentParser(description="Index the rulebook PDFs in backend/data.")
+    parser.add_argument("--local-only", action="store_true",
+                        help="only write the local vector index, skip Azure AI Search")
+    parser.add_argument("--no-local", action="store_true",
+                        help="only upload to Azure AI Search, skip the local vector index")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the manifest and re-parse / re-embed everything")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="processes used to parse PDFs (default: CPU count)")
+    parser.add_argument("--embed-batch-size", type=int, default=64,
+                        help="chunks per embeddings request")
+    parser.add_argument("--embed-parallelism", type=int, default=4,
+                        help="embeddings requests in flight at once")
+    args = parser.parse_args()
 
+    stale = index_docs(
+        upload_to_azure=not args.local_only,
+        write_local_index=not args.no_local,
+        full=args.full,
+        parse_workers=args.parse_workers,
+        embed_batch_size=args.embed_batch_size,
+        embed_parallelism=args.embed_parallelism,
+    )
+    if stale:
+        sys.exit(1)
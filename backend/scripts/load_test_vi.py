@@ -0,0 +1,181 @@
+"""
+Load test: many concurrent audits' Video Indexer phase against a local fake VI.
+
+Starts backend/scripts/fake_vi_server.py in a background thread and runs
+--audits audits at once. Each one uploads a small generated file, waits for
+indexing (adaptive polling) and extracts the transcript, the same calls
+index_video_node makes (yt-dlp is not involved).
+
+    --mode async   every audit is a coroutine on ONE event loop
+                   (AsyncVideoIndexerService, as the API now runs them)
+    --mode sync    audits run on a thread pool of --threads workers
+                   (blocking VideoIndexerService, as the API used to)
+    --mode both    sync first, then async
+
+Usage (from the project root):
+    uv run python -m backend.scripts.load_test_vi --audits 50 --processing-seconds 5
+    uv run python -m backend.scripts.load_test_vi --mode both --audits 50 --threads 2
+"""
+import os
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep the test hermetic: no insights reuse, fast polling, no VI callbacks
+os.environ["VI_INSIGHTS_STORE"] = "off"
+os.environ.pop("VI_CALLBACK_URL", None)
+os.environ.setdefault("AZURE_VI_ACCOUNT_ID", "load-test-account")
+os.environ.setdefault("AZURE_VI_LOCATION", "trial")
+os.environ.setdefault("AZURE_SUBSCRIPTION_ID", "load-test-subscription")
+os.environ.setdefault("AZURE_RESOURCE_GROUP", "load-test-rg")
+
+import uvicorn
+
+from backend.src.services.video_indexer import VideoIndexerService
+from backend.src.services.video_indexer_async import AsyncVideoIndexerService
+from backend.src.services.vi_polling import PollingPolicy
+from backend.src.services.vi_http import token_cache, close_async_http_client
+
+
+class FakeCredential:
+    """Stands in for DefaultAzureCredential (no Azure login needed)."""
+
+    class _Token:
+        def __init__(self):
+            self.token = "fake-arm-token"
+            self.expires_on = int(time.time()) + 3600
+
+    def get_token(self, *scopes):
+        return self._Token()
+
+
+def start_fake_server(port, processing_seconds, latency_ms):
+    os.environ["FAKE_VI_PROCESSING_SECONDS"] = str(processing_seconds)
+    os.environ["FAKE_VI_LATENCY_MS"] = str(latency_ms)
+    from backend.scripts.fake_vi_server import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_video_file(size_kb):
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    with os.fdopen(fd, "wb") as f:
+        f.write(os.urandom(size_kb * 1024))
+    return path
+
+
+class ThreadPeak:
+    """Samples threading.active_count() to report the peak thread count."""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(0.05):
+            self.peak = max(self.peak, threading.active_count())
+
+
+def run_sync(args, base_url, video_path, policy):
+    def one_audit(i):
+        start = time.perf_counter()
+        service = VideoIndexerService(credential=FakeCredential(), api_base=base_url, arm_base=base_url)
+        video_id = service.upload_video(video_path, f"load_{i}")
+        service.extract_data(service.wait_for_processing(video_id, policy=policy))
+        return time.perf_counter() - start
+
+    with ThreadPeak() as threads, ThreadPoolExecutor(max_workers=args.threads) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(one_audit, range(args.audits)))
+        wall = time.perf_counter() - start
+    return wall, latencies, threads.peak
+
+
+def run_async(args, base_url, video_path, policy):
+    async def one_audit(i):
+        start = time.perf_counter()
+        service = AsyncVideoIndexerService(credential=FakeCredential(), api_base=base_url, arm_base=base_url)
+        video_id = await service.upload_video(video_path, f"load_{i}")
+        service.extract_data(await service.wait_for_processing(video_id, policy=policy))
+        return time.perf_counter() - start
+
+    async def main():
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one_audit(i) for i in range(args.audits)))
+        wall = time.perf_counter() - start
+        await close_async_http_client()
+        return wall, latencies
+
+    with ThreadPeak() as threads:
+        wall, latencies = asyncio.run(main())
+    return wall, latencies, threads.peak
+
+
+def report(label, audits, wall, latencies, peak_threads):
+    ordered = sorted(latencies)
+    p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+    print(f"{label:<8} {audits} audits in {wall:7.2f} s   {audits / wall:6.2f} audits/s   "
+          f"latency p50 {statistics.median(latencies):6.2f} s  p95 {p95:6.2f} s   "
+          f"peak threads {peak_threads}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("async", "sync", "both"), default="both")
+    parser.add_argument("--audits", type=int, default=50, help="concurrent audits")
+    parser.add_argument("--threads", type=int, default=2,
+                        help="sync mode worker threads (the old AUDIT_MAX_WORKERS default)")
+    parser.add_argument("--processing-seconds", type=float, default=5.0, help="fake VI indexing time per video")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake per-request latency")
+    parser.add_argument("--video-kb", type=int, default=512, help="size of the uploaded test file")
+    args = parser.parse_args()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server, thread = start_fake_server(port, args.processing_seconds, args.latency_ms)
+    video_path = make_video_file(args.video_kb)
+    policy = PollingPolicy(initial_interval=0.5, max_interval=2.0, timeout=args.processing_seconds * 20 + 60)
+
+    print(f"Fake VI at {base_url}: {args.processing_seconds}s indexing, {args.latency_ms}ms latency, "
+          f"{args.video_kb} KB uploads")
+    print("-" * 110)
+    try:
+        if args.mode in ("sync", "both"):
+            report("sync", args.audits, *run_sync(args, base_url, video_path, policy))
+            token_cache.clear()
+        if args.mode in ("async", "both"):
+            report("async", args.audits, *run_async(args, base_url, video_path, policy))
+    finally:
+        os.remove(video_path)
+        server.should_exit = True
+        thread.join(timeout=5)
+    print("-" * 110)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Offline stand-ins for the Azure and YouTube services an audit calls.
+
+Used by benchmark_pipeline.py so the whole pipeline runs with no Azure
+subscription, YouTube access or OpenAI quota:
+
+- FakeCredential      DefaultAzureCredential without an Azure login
+- stub_ytdlp()        yt-dlp "extraction" returning a media URL on the fake
+                      VI server (fake_vi_server.py serves /media/...)
+- HashingEmbeddings   deterministic bag-of-words embeddings (hashing trick),
+                      so rule similarity still tracks shared vocabulary
+- build_fake_rulebook()  a LocalVectorIndex of synthetic rules
+- FakeAuditLLM        deterministic chat model: FAIL with one issue per line
+                      containing a claim or disclosure phrase, else PASS
+- install_fakes()     wires all of them into the process
+
+Each fake takes a latency so benchmarks can model the real services' round
+trips without calling them.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from backend.src.services import video_indexer
+from backend.src.services.video_indexer import VideoIndexerService
+from backend.src.services.media_info import get_media_info_cache, media_info_key
+from backend.src.services.rulebook_index import LocalVectorIndex, save_local_index
+from backend.src.services.clients import get_clients
+from backend.src.services.youtube import parse_video_id
+
+# Synthetic rulebook: the kind of passages the FTC guide / YouTube ad specs chunk into
+FAKE_RULES = [
+    ("ftc", "Influencers must clearly disclose any material connection to a brand, such as payment, "
+            "free products or a sponsorship, using words like #ad or sponsored."),
+    ("ftc", "A disclosure must be hard to miss: in the video itself, said out loud and shown on screen, "
+            "not only in the description or behind a link in bio."),
+    ("ftc", "Discount codes and affiliate links are material connections and must be disclosed."),
+    ("ftc", "Endorsers may not make claims the advertiser could not substantiate, such as guaranteed "
+            "results or clinically proven effects without evidence."),
+    ("ftc", "Before and after comparisons must reflect typical results for consumers."),
+    ("ftc", "An honest review of a gifted product still needs a disclosure of the gift."),
+    ("youtube", "Paid product placements and endorsements must be declared with the paid promotion "
+                "setting in YouTube Studio."),
+    ("youtube", "Ads may not promise miracle cures, guaranteed weight loss or risk free health outcomes."),
+    ("youtube", "Promotions with limited time offers must state the terms of the offer."),
+    ("youtube", "Ads for cosmetics and skincare may not claim medical effects."),
+    ("youtube", "Video ads must be at least 480p and include a clear call to action."),
+    ("youtube", "Thumbnails and titles may not be misleading about the content of the video."),
+]
+
+# (phrase, category, severity) the fake LLM flags
+FAKE_FINDINGS = [
+    ("guaranteed", "Claim Validation", "CRITICAL"),
+    ("clinically proven", "Claim Validation", "CRITICAL"),
+    ("before and after", "Claim Validation", "WARNING"),
+    ("sponsored", "Disclosure", "WARNING"),
+    ("use code", "Disclosure", "WARNING"),
+    ("#ad", "Disclosure", "WARNING"),
+]
+
+_LINE_TIME = re.compile(r"^\s*\[(\d+:\d{2}(?::\d{2})?)\]")
+
+
+class FakeCredential:
+    """Stands in for DefaultAzureCredential (no Azure login needed)."""
+
+    class _Token:
+        def __init__(self):
+            self.token = "fake-arm-token"
+            self.expires_on = int(time.time()) + 3600
+
+    def get_token(self, *scopes):
+        return self._Token()
+
+
+def stub_ytdlp(media_base_url: str, extract_ms: float = 0.0) -> None:
+    """
+    Replaces yt-dlp extraction with a fixed media URL on the fake server.
+    Runs on the same bounded executor, sleeping extract_ms like a real
+    extraction would block.
+    """
+    def extract_and_cache(self, url):
+        time.sleep(extract_ms / 1000)
+        video_id = parse_video_id(url) or hashlib.sha1(url.encode("utf-8")).hexdigest()[:11]
+        info = {
+            "id": video_id,
+            "title": f"Benchmark video {video_id}",
+            "duration": 30,
+            "url": f"{media_base_url}/media/{video_id}.mp4",
+            "http_headers": {},
+        }
+        get_media_info_cache().set(media_info_key(url), info)
+        return info
+
+    VideoIndexerService._extract_and_cache = extract_and_cache
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings: each word hashes to a signed dimension."""
+
+    def __init__(self, dimensions: int = 256, latency_ms: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"[\w#%]+", (text or "").lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0 if digest[4] & 1 else -1.0
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self.embed_query(text)
+
+
+def build_fake_rulebook(index_dir: str, embeddings: HashingEmbeddings) -> LocalVectorIndex:
+    """Writes FAKE_RULES as a local index in index_dir and loads it."""
+    texts = [text for _, text in FAKE_RULES]
+    save_local_index(index_dir, texts, embeddings.embed_documents(texts),
+                     metadatas=[{"source": f"{source}.pdf"} for source, _ in FAKE_RULES], model="hashing")
+    return LocalVectorIndex(index_dir, embeddings.embed_query)
+
+
+class FakeAuditLLM(BaseChatModel):
+    """
+    Deterministic stand-in for the audit chat model. Flags every transcript /
+    OCR line containing a FAKE_FINDINGS phrase and answers in the audit
+    prompt's JSON format, with usage metadata for the token limiter. Like
+    GPT-4o, it wraps the JSON in a ```json fence unless a response_format
+    is requested.
+    """
+
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-audit"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = self._verdict(messages, fenced=kwargs.get("response_format") is None)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._generate(messages, stop=stop, **kwargs)
+
+    def _verdict(self, messages: List[BaseMessage], fenced: bool = True) -> AIMessage:
+        prompt = str(messages[-1].content)
+        issues = []
+        for line in prompt.splitlines():
+            lower = line.lower()
+            for phrase, category, severity in FAKE_FINDINGS:
+                if phrase in lower:
+                    match = _LINE_TIME.match(line)
+                    issues.append({
+                        "category": category,
+                        "severity": severity,
+                        "description": f"'{phrase}' in: {line.strip()[:160]}",
+                        "timestamp": match.group(1) if match else None,
+                    })
+                    break
+        verdict = {
+            "compliance_results": issues[:8],
+            "status": "FAIL" if issues else "PASS",
+            "final_report": f"{len(issues)} potential issue(s) found." if issues else "No violations found.",
+        }
+        content = f"```json\n{json.dumps(verdict)}\n```" if fenced else json.dumps(verdict)
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = len(content) // 4
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+
+
+def install_fakes(vi_base_url: str, index_dir: str, llm_latency_ms: float = 0.0,
+                  embed_latency_ms: float = 0.0, extract_ms: float = 0.0) -> None:
+    """
+    Points the VI clients at the fake server and installs the fake yt-dlp,
+    credential, embeddings, rulebook and LLM. Call again after anything that
+    closes the client registry (the API's shutdown does).
+    """
+    os.environ["AZURE_VI_API_BASE"] = vi_base_url
+    os.environ["AZURE_ARM_BASE"] = vi_base_url
+    os.environ["RULEBOOK_BACKEND"] = "local"
+    os.environ["RULEBOOK_INDEX_DIR"] = index_dir
+    video_indexer.get_default_credential = lambda: FakeCredential()
+    stub_ytdlp(vi_base_url, extract_ms)
+
+    embeddings = HashingEmbeddings(latency_ms=embed_latency_ms)
+    llm = FakeAuditLLM(latency_ms=llm_latency_ms)
+    get_clients().override(llm=llm, cheap_llm=llm, embeddings=embeddings,
+                           rulebook=build_fake_rulebook(index_dir, embeddings))
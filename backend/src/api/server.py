@@ -1,13 +1,17 @@
 import os
 import uuid
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from pydantic import BaseModel
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
@@ -15,21 +19,294 @@ load_dotenv(override=True)
 from backend.src.api.telemetry import setup_telemetry
 setup_telemetry()
 
-from backend.src.graph.workflow import app as compliance_graph
-from backend.src.services.video_indexer import VideoIndexerService
+from backend.src.graph.workflow import create_graph
+from backend.src.graph.nodes import audit_fingerprint
+from backend.src.services.video_indexer_async import AsyncVideoIndexerService
+from backend.src.services.job_queue import InMemoryJobQueue, AuditJob, QueueFullError
+from backend.src.services.result_cache import create_result_cache, make_cache_key
+from backend.src.services.youtube import parse_video_id
+from backend.src.services.vi_http import client_stats, close_http_session, close_async_http_client
+from backend.src.services.vi_polling import completion_notifier, vi_poller
+from backend.src.services.clients import get_clients
+from backend.src.services.progress import ProgressLog
+from backend.src.services.media_info import get_media_info_cache
+from backend.src.services.stage_limits import stage_limiter
+from backend.src.services.openai_limits import limiter_stats
+from backend.src.services.precheck import precheck_stats
+from backend.src.services.batch import BatchRunner, BatchTooLargeError, parse_video_urls
+from backend.src.services.instrumentation import audit_results, audit_timings, metrics
+from backend.src.services.single_flight import create_single_flight
+from backend.src.services.checkpoints import (
+    age_seconds,
+    athread_ids,
+    checkpoint_backend,
+    create_checkpointer,
+    resume_max_age_seconds,
+    resume_on_startup,
+    thread_config,
+)
 
 MAX_VIDEO_DURATION = 50  # seconds
 
+# Audit worker pool: how many audits run at once, and how many may wait.
+# Audits are async and spend most of their time waiting on Video Indexer,
+# so one process can run many of them.
+AUDIT_MAX_WORKERS = int(os.getenv("AUDIT_MAX_WORKERS", "16"))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "100"))
+
+# Unique videos accepted in one POST /audit/batch
+BATCH_MAX_VIDEOS = int(os.getenv("BATCH_MAX_VIDEOS", "200"))
+
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
 logging.getLogger("azure.identity").setLevel(logging.WARNING)
 logging.getLogger("azure.core").setLevel(logging.WARNING)
 logger = logging.getLogger("api-server")
 
+# Seconds of silence after which the SSE stream sends a keep-alive comment
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+# State is checkpointed after every node, keyed by job ID, so an audit
+# interrupted by a restart resumes instead of starting over. The
+# checkpointer is opened in lifespan(), so importing this module doesn't
+# open (or create) the checkpoint store.
+checkpointer: Optional[BaseCheckpointSaver] = None
+compliance_graph = create_graph()
+
+
+async def stream_workflow(payload: dict, events: ProgressLog, thread_id: Optional[str] = None) -> dict:
+    """
+    Runs the workflow with graph.astream() on the event loop, forwarding
+    progress to `events`, and returns the final state. With a thread_id
+    the state is checkpointed under it; a payload with "resume" continues
+    from that thread's last checkpoint instead of starting over.
+
+    - "custom":   events the nodes/services report via report_progress()
+    - "updates":  one node_finished event per completed node
+    - "messages": LLM output as it is generated (llm_token events)
+    - "values":   full state after each step; the last one is the result
+    """
+    final_state = {}
+    graph_input = None if payload.get("resume") else payload
+    config = thread_config(thread_id) if thread_id and checkpointer is not None else None
+    async for mode, chunk in compliance_graph.astream(graph_input, config=config,
+                                                      stream_mode=["values", "updates", "custom", "messages"]):
+        if mode == "values":
+            final_state = chunk
+        elif mode == "updates":
+            for node, update in chunk.items():
+                events.append("node_finished", {"node": node, "errors": (update or {}).get("errors", [])})
+        elif mode == "custom":
+            data = dict(chunk)
+            events.append(data.pop("event", "progress"), data)
+        elif mode == "messages":
+            message, metadata = chunk
+            if isinstance(message.content, str) and message.content:
+                events.append("llm_token", {"node": metadata.get("langgraph_node"), "text": message.content})
+    return final_state
+
+
+async def run_audit_job(job: AuditJob) -> dict:
+    """
+    Runs one queued audit, or attaches it to an identical audit (same video,
+    same rulebook / prompt) already running and returns that one's verdict.
+    """
+    youtube_id = parse_video_id(job.payload["video_url"])
+    if audit_flights is None or not youtube_id:
+        return await run_audit(job)
+
+    def joined(leader: str) -> None:
+        job.events.append("joined", {"job_id": leader})
+
+    key = make_cache_key(youtube_id, audit_fingerprint())
+    result, leader = await audit_flights.run(key, job.job_id, lambda: run_audit(job), on_join=joined)
+    if leader == job.job_id:
+        return result
+    # A resumed audit that joined another run won't continue its own checkpoint
+    await forget_checkpoints(job.job_id)
+    return {**result, "session_id": job.job_id, "shared_with": leader}
+
+
+async def run_audit(job: AuditJob) -> dict:
+    """Runs the compliance workflow for one job and returns an AuditResponse dict."""
+    logger.info(f"Starting Audit Job: {job.payload['video_url']} (Session: {job.job_id})")
+
+    with audit_timings() as timings:
+        final_state = await stream_workflow(job.payload, job.events, thread_id=job.job_id)
+    # The workflow finished: nothing left to resume
+    await forget_checkpoints(job.job_id)
+
+    result = AuditResponse(
+        session_id=job.job_id,
+        video_id=final_state.get("video_id"),
+        status=final_state.get("final_status", "UNKNOWN"),
+        final_report=final_state.get("final_report", "No report generated."),
+        compliance_results=final_state.get("compliance_results", []),
+        prompt_stats=final_state.get("prompt_stats"),
+        precheck=final_state.get("precheck"),
+        timings=timings.to_dict(),
+    ).model_dump()
+    audit_results.inc(status=result["status"])
+
+    # Only cache real verdicts; a FAIL caused by a system error must be retried.
+    # Keyed by the rulebook the audit searched, which a re-index may have replaced since.
+    youtube_id = parse_video_id(job.payload["video_url"])
+    if result_cache is not None and youtube_id and not final_state.get("errors") \
+            and result["status"] in ("PASS", "FAIL"):
+        result_cache.set(make_cache_key(youtube_id, audit_fingerprint(final_state.get("rulebook_version"))), result)
+
+    return result
+
+
+async def forget_checkpoints(thread_id: str) -> None:
+    if checkpointer is None:
+        return
+    try:
+        await checkpointer.adelete_thread(thread_id)
+    except Exception as e:
+        logger.warning(f"Could not delete checkpoints of {thread_id}: {e}")
+
+
+async def resume_payload(job_id: str) -> Optional[dict]:
+    """Job payload continuing `job_id` from its last checkpoint; None if it has no unfinished one."""
+    if checkpointer is None:
+        return None
+    snapshot = await compliance_graph.aget_state(thread_config(job_id))
+    return _resume_payload(snapshot) if snapshot.next else None
+
+
+def _resume_payload(snapshot) -> dict:
+    return {
+        "video_url": snapshot.values.get("video_url"),
+        "video_id": snapshot.values.get("video_id"),
+        "resume": True,
+    }
+
+
+async def resume_orphaned_audits() -> int:
+    """
+    Startup sweep: requeues every audit a previous process left unfinished,
+    and drops checkpoints older than CHECKPOINT_RESUME_MAX_AGE_SECONDS.
+
+    Single-replica only: checkpoints have no owner, so with a shared store
+    this would also requeue audits other replicas are running. It is off by
+    default unless CHECKPOINT_BACKEND is the local SQLite file.
+    """
+    if checkpointer is None or not resume_on_startup():
+        return 0
+    if checkpoint_backend().lower() != "sqlite":
+        logger.warning(f"Resuming unfinished audits from CHECKPOINT_BACKEND={checkpoint_backend()}: "
+                       "safe only if no other replica shares it")
+    resumed, max_age = 0, resume_max_age_seconds()
+    for thread_id in await athread_ids(checkpointer):
+        snapshot = await compliance_graph.aget_state(thread_config(thread_id))
+        if not snapshot.next or age_seconds(snapshot.created_at) > max_age:
+            await forget_checkpoints(thread_id)
+            continue
+        payload = _resume_payload(snapshot)
+        try:
+            await job_queue.submit(payload, job_id=thread_id)
+        except QueueFullError:
+            logger.warning(f"Queue full; {thread_id} and later orphans stay checkpointed (POST /audit/{{id}}/resume)")
+            break
+        logger.info(f"Resuming audit {thread_id} at {', '.join(snapshot.next)} ({payload['video_url']})")
+        resumed += 1
+    return resumed
+
+
+async def run_batch_item(job: AuditJob) -> dict:
+    """Batch handler: serves a cached verdict if there is one, else runs the audit."""
+    cached = cached_result(job.payload["video_url"], job.job_id)
+    if cached is not None:
+        return cached
+    return await run_audit_job(job)
+
+
+def build_initial_inputs(video_url: str, session_id: str) -> dict:
+    """Workflow input for one audit."""
+    return {
+        "video_url": video_url,                 # From the API request
+        "video_id": f"vid_{session_id[:8]}",    # Generated ID
+        "compliance_results": [],               # Will be populated by Auditor
+        "errors": []                            # Tracks any processing errors
+    }
+
+
+def cached_result(video_url: str, session_id: str) -> Optional[dict]:
+    """A previous verdict for the same video under the current rulebook/prompt, if cached."""
+    youtube_id = parse_video_id(video_url)
+    if result_cache is None or not youtube_id:
+        return None
+    cached = result_cache.get(make_cache_key(youtube_id, audit_fingerprint()))
+    if cached is None:
+        return None
+    logger.info(f"Cache hit for {youtube_id} (Session: {session_id})")
+    return {**cached, "session_id": session_id, "cached": True, "timings": None}
+
+
+# Completed audits keyed by canonical video ID + rulebook/prompt fingerprint
+result_cache = create_result_cache()
+
+# Running audits under the same key; identical requests share one run
+audit_flights = create_single_flight()
+
+
+job_queue = InMemoryJobQueue(
+    handler=run_audit_job,
+    max_workers=AUDIT_MAX_WORKERS,
+    max_queue_size=AUDIT_QUEUE_SIZE,
+)
+
+# Batches bypass the worker pool: all their videos run at once and the
+# per-stage limits (STAGE_LIMIT_*) decide how many are in each stage
+batch_runner = BatchRunner(
+    handler=run_batch_item,
+    on_job=job_queue.track,
+    max_videos=BATCH_MAX_VIDEOS,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts the audit workers on boot and stops them on shutdown."""
+    global checkpointer, compliance_graph
+    checkpointer = create_checkpointer()
+    compliance_graph = create_graph(checkpointer)
+    if os.getenv("WARM_UP_CLIENTS", "true").lower() == "true":
+        # Build the LLM/search clients before the first audit arrives
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, get_clients().warm_up)
+        except Exception as e:
+            logger.warning(f"Client warm-up failed, will retry lazily: {e}")
+    await job_queue.start()
+    try:
+        resumed = await resume_orphaned_audits()
+        if resumed:
+            logger.info(f"Resumed {resumed} interrupted audit(s) from checkpoints")
+    except Exception as e:
+        logger.warning(f"Checkpoint sweep failed: {e}")
+    yield
+    await batch_runner.shutdown()
+    await job_queue.shutdown()
+    if audit_flights is not None:
+        await audit_flights.shutdown()
+    await vi_poller.close()
+    if result_cache is not None:
+        result_cache.close()
+    if hasattr(checkpointer, "close"):
+        checkpointer.close()
+    checkpointer = None
+    compliance_graph = create_graph()
+    close_http_session()
+    await close_async_http_client()
+    await get_clients().aclose()
+
+
 app = FastAPI(
     title="Brand Guardian AI API",
     description="API for auditing video content against brand compliance rules.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 cors_origins = [
@@ -74,6 +351,7 @@ class ComplianceIssue(BaseModel):
     category: str
     severity: str
     description: str
+    timestamp: Optional[str] = None  # "m:ss" where it occurs in the video
 
 
 class AuditResponse(BaseModel):
@@ -105,17 +383,73 @@ class AuditResponse(BaseModel):
     status: str
     final_report: str
     compliance_results: List[ComplianceIssue]
+    cached: bool = False  # True when served from the result cache
+    # {"chunks", "prompt_tokens", "uncompacted_prompt_tokens"} for the audit's LLM prompt(s)
+    prompt_stats: Optional[Dict[str, int]] = None
+    # {"decision", "clean", "confidence", "matched_terms", "max_rule_score", ...} from the precheck
+    precheck: Optional[Dict[str, Any]] = None
+    # {"total_seconds", "nodes": {node: seconds}, "steps": {step: {"count", "seconds", ...}}} of this run
+    timings: Optional[Dict[str, Any]] = None
+    # Job ID of the identical audit this request joined instead of running its own
+    shared_with: Optional[str] = None
+
+
+class AuditJobResponse(BaseModel):
+    """
+    Returned by POST /audit: the id to poll and the initial job status.
+    """
+    job_id: str
+    status: str
+
+
+class AuditBatchResponse(BaseModel):
+    """
+    Returned by POST /audit/batch: one item (job_id, status, duplicate_urls)
+    per unique video.
+    """
+    batch_id: str
+    videos: int
+    duplicates: int
+    items: List[dict]
+
+
+class AuditBatchStatus(BaseModel):
+    """
+    Returned by GET /audit/batch/{batch_id}.
+    """
+    batch_id: str
+    done: bool
+    summary: dict
+    items: List[dict]
+
+
+class AuditJobStatus(BaseModel):
+    """
+    Returned by GET /audit/{job_id}.
+
+    `result` is filled once status is COMPLETED, `error` once it is FAILED.
+    """
+    job_id: str
+    status: str
+    result: Optional[AuditResponse] = None
+    error: Optional[str] = None
 
 
 @app.post("/check-duration")
 async def check_duration(request: AuditRequest):
-    """Check video duration before starting the full audit."""
+    """
+    Check video duration before starting the full audit.
+
+    yt-dlp runs on a bounded thread pool, not the event loop, and its result
+    is cached so the audit that follows doesn't extract the video again.
+    """
     try:
-        vi_service = VideoIndexerService()
-        duration = vi_service.get_video_duration(request.video_url)
+        info = await AsyncVideoIndexerService().extract_info(request.video_url)
+        duration = info.get("duration") or 0
         logger.info(f"Video duration: {duration}s (max: {MAX_VIDEO_DURATION}s)")
         return {
             "duration": duration,
+            "title": info.get("title"),
             "max_duration": MAX_VIDEO_DURATION,
             "allowed": duration <= MAX_VIDEO_DURATION,
         }
@@ -124,60 +458,281 @@ async def check_duration(request: AuditRequest):
         raise HTTPException(status_code=400, detail=f"Could not fetch video info: {str(e)}")
 
 
-@app.post("/audit", response_model=AuditResponse)
+@app.post("/audit", response_model=AuditJobResponse, status_code=202)
 async def audit_video(request: AuditRequest):
     """
-    Main API endpoint that triggers the compliance audit workflow.
-    
+    Queues a compliance audit and returns immediately.
+
     HTTP Method: POST
     URL: http://localhost:8000/audit
-    
+
     Request Body:
     {
         "video_url": "https://youtu.be/abc123"
     }
-    
-    Response: AuditResponse object (defined above)
-    
-    Process:
-    1. Generate unique session ID
-    2. Prepare input for LangGraph workflow
-    3. Invoke the graph (Indexer → Auditor)
-    4. Return formatted results
+
+    Response (202): {"job_id": "...", "status": "QUEUED"}
+    Poll GET /audit/{job_id} until status is COMPLETED or FAILED.
+
+    Returns 429 when the queue is full.
     """
 
     session_id = str(uuid.uuid4())  
 
-    video_id_short = f"vid_{session_id[:8]}"  
-
     logger.info(f"Received Audit Request: {request.video_url} (Session: {session_id})")
 
-    initial_inputs = {
-        "video_url": request.video_url,  # From the API request
-        "video_id": video_id_short,      # Generated ID
-        "compliance_results": [],        # Will be populated by Auditor
-        "errors": []                     # Tracks any processing errors
-    }
+    initial_inputs = build_initial_inputs(request.video_url, session_id)
+
+    # Serve repeat audits of the same video straight from the cache
+    cached = cached_result(request.video_url, session_id)
+    if cached is not None:
+        job = job_queue.complete(initial_inputs, cached, job_id=session_id)
+        return AuditJobResponse(job_id=job.job_id, status=job.status)
 
     try:
-        final_state = compliance_graph.invoke(initial_inputs)
-
-        return AuditResponse(
-            session_id=session_id,
-            video_id=final_state.get("video_id"),
-            status=final_state.get("final_status", "UNKNOWN"),
-            final_report=final_state.get("final_report", "No report generated."),
-            compliance_results=final_state.get("compliance_results", [])
-        )
-    except Exception as e:
-        logger.error(f"Audit Failed: {str(e)}")
+        job = await job_queue.submit(initial_inputs, job_id=session_id)
+    except QueueFullError as e:
+        logger.warning(f"Rejected Audit Request (queue full): {request.video_url}")
+        raise HTTPException(status_code=429, detail=str(e))
 
-        raise HTTPException(
-            status_code=500,
-            detail=f"Workflow Execution Failed: {str(e)}"
-        )
+    return AuditJobResponse(job_id=job.job_id, status=job.status)
+
+
+@app.get("/audit/{job_id}", response_model=AuditJobStatus)
+async def get_audit(job_id: str):
+    """
+    Returns the status of a queued audit, and its result once finished.
+
+    status is one of QUEUED | RUNNING | COMPLETED | FAILED.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Audit job {job_id} not found")
+
+    return AuditJobStatus(
+        job_id=job.job_id,
+        status=job.status,
+        result=job.result,
+        error=job.error
+    )
     
 
+@app.post("/audit/{job_id}/resume", response_model=AuditJobResponse, status_code=202)
+async def resume_audit(job_id: str):
+    """
+    Continues an interrupted audit from its last checkpoint, under the same
+    job_id. An audit interrupted while Video Indexer was processing goes
+    back to waiting on the same upload.
+
+    Response (202): {"job_id": "...", "status": "QUEUED"}
+
+    Returns 409 while the job is still queued or running, 404 if it has no
+    unfinished checkpoint, 429 when the queue is full.
+    """
+    job = job_queue.get(job_id)
+    if job is not None and not job.done:
+        raise HTTPException(status_code=409, detail=f"Audit job {job_id} is {job.status}")
+
+    payload = await resume_payload(job_id)
+    if payload is None:
+        raise HTTPException(status_code=404, detail=f"No unfinished checkpoint for audit job {job_id}")
+
+    try:
+        job = await job_queue.submit(payload, job_id=job_id)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    logger.info(f"Resuming Audit: {payload['video_url']} (Session: {job_id})")
+    return AuditJobResponse(job_id=job.job_id, status=job.status)
+
+
+@app.get("/audit/{job_id}/events")
+async def stream_audit_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of an audit's progress.
+
+    Events (each `data:` is JSON):
+    - status              QUEUED / RUNNING
+    - joined              the same video is already being audited; this job
+                          waits for that one ({"job_id"}, whose events show progress)
+    - download_started, download_progress, download_finished
+    - upload_started, upload_progress, upload_finished
+    - insights_reused     a previous indexing of this video was reused
+    - indexing_progress   Video Indexer state and percent
+    - retrieval_finished  rules retrieved for the prompt
+    - prompt_built        prompt token counts (compacted vs. uncompacted) and chunks
+    - llm_started, llm_token
+    - llm_repair          the verdict could not be parsed; the LLM is asked again
+    - node_finished       a workflow node completed
+    - result              final AuditResponse (stream ends)
+    - failed              error message (stream ends)
+
+    Past events are replayed first, so a client can connect at any time;
+    on reconnect the browser's Last-Event-ID resumes where it left off.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Audit job {job_id} not found")
+    return sse_response(job.events, request)
+
+
+def sse_response(events: ProgressLog, request: Request) -> StreamingResponse:
+    """Streams a ProgressLog as Server-Sent Events, resuming from Last-Event-ID."""
+    try:
+        last_event_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_event_id = 0
+
+    async def event_stream():
+        async for event in events.follow(last_event_id, heartbeat=SSE_HEARTBEAT_SECONDS):
+            if await request.is_disconnected():
+                break
+            # A comment line keeps proxies from timing out an idle stream
+            yield ": keep-alive\n\n" if event is None else event.to_sse()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/audit/batch", response_model=AuditBatchResponse, status_code=202)
+async def audit_batch(request: Request):
+    """
+    Audits many videos at once.
+
+    Body, by Content-Type:
+    - application/json                      {"video_urls": ["https://youtu.be/abc123", ...]}
+    - text/csv                              a video_url (or url) column, else the first column
+    - application/x-ndjson / application/jsonl
+                                            one URL or {"video_url": ...} per line
+
+    URLs are deduplicated by video ID; every unique video becomes an audit
+    job (also pollable through GET /audit/{job_id}). All of them start at
+    once and the per-stage limits keep Video Indexer, yt-dlp and the LLM
+    within capacity.
+
+    Response (202): {"batch_id": "...", "videos": N, "duplicates": M, "items": [...]}
+    Follow GET /audit/batch/{batch_id}/events for results as they finish.
+
+    Returns 400 for an unreadable body, 413 above BATCH_MAX_VIDEOS videos.
+    """
+    try:
+        video_urls = parse_video_urls(await request.body(), request.headers.get("content-type", ""))
+        batch = batch_runner.submit(video_urls, build_initial_inputs)
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:  # also JSON and UTF-8 decoding errors
+        raise HTTPException(status_code=400, detail=f"Invalid batch request: {e}")
+
+    return AuditBatchResponse(
+        batch_id=batch.batch_id,
+        videos=len(batch.items),
+        duplicates=batch.submitted_urls - len(batch.items),
+        items=[item.to_dict() for item in batch.items],
+    )
+
+
+@app.get("/audit/batch/{batch_id}", response_model=AuditBatchStatus)
+async def get_audit_batch(batch_id: str):
+    """
+    Status of every video in a batch plus the aggregate summary:
+    pass/fail totals, and per category the videos that failed on it and
+    the issues raised by severity.
+    """
+    batch = batch_runner.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Audit batch {batch_id} not found")
+
+    return AuditBatchStatus(
+        batch_id=batch.batch_id,
+        done=batch.done,
+        summary=batch.summary(),
+        items=[item.to_dict() for item in batch.items],
+    )
+
+
+@app.get("/audit/batch/{batch_id}/events")
+async def stream_batch_events(batch_id: str, request: Request):
+    """
+    Server-Sent Events stream of a batch, one event per video as it finishes:
+
+    - item_result   {video_url, job_id, status, duplicate_urls, result}
+    - item_failed   {video_url, job_id, status, duplicate_urls, error}
+    - summary       aggregate counts once every video is done (stream ends)
+
+    Per-video progress is on GET /audit/{job_id}/events.
+    """
+    batch = batch_runner.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Audit batch {batch_id} not found")
+    return sse_response(batch.events, request)
+
+
+@app.post("/vi-callback")
+async def video_indexer_callback(id: str, state: Optional[str] = None, token: Optional[str] = None):
+    """
+    Completion callback for Azure Video Indexer.
+
+    VI calls the callbackUrl given at upload time as
+    POST /vi-callback?id=<azure video id>&state=<Processed|Failed|...>.
+    The audit waiting on that video wakes up and fetches the result at once.
+    """
+    secret = os.getenv("VI_CALLBACK_SECRET")
+    if secret and token != secret:
+        raise HTTPException(status_code=403, detail="Invalid callback token")
+
+    completion_notifier.notify(id, state)
+    return {"received": True}
+
+
+@app.get("/stats")
+def get_stats():
+    """
+    Operational counters: audit queue depth, batches, audits in flight and
+    requests sharing them, per-stage queue depth / slots in use / latency,
+    videos waiting on Video Indexer, result / media info cache hit rates,
+    Azure OpenAI quota throttling and retries, and Video Indexer token
+    refreshes / HTTP connection reuse.
+    """
+    return {
+        "job_queue": job_queue.stats(),
+        "batches": batch_runner.stats(),
+        "stages": stage_limiter.stats(),
+        "vi_poller": vi_poller.stats(),
+        "openai": limiter_stats(),
+        "precheck": precheck_stats.stats(),
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "single_flight": audit_flights.stats() if audit_flights is not None else None,
+        "media_info_cache": get_media_info_cache().stats(),
+        "video_indexer": client_stats(),
+    }
+
+
+# Read at scrape time from the same counters /stats reports
+metrics.gauge("audit_jobs", "Audit jobs waiting or running.", ("state",),
+              lambda: {("queued",): job_queue.stats()["queued"], ("running",): job_queue.stats()["running"]})
+metrics.gauge("stage_slots", "Per-stage slots in use and callers waiting.", ("stage", "state"),
+              lambda: {(name, state): value[state] for name, value in stage_limiter.stats().items()
+                       for state in ("active", "waiting")})
+metrics.gauge("vi_tracked_videos", "Videos waiting on Video Indexer.", (),
+              lambda: {(): vi_poller.stats()["tracked_videos"]})
+metrics.gauge("audit_flights", "Distinct audits in flight and requests attached to them.", ("state",),
+              lambda: {("in_flight",): audit_flights.stats()["in_flight"],
+                       ("waiters",): audit_flights.stats()["waiters"]} if audit_flights is not None else {})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus text format: audit_step_seconds (per graph node and step),
+    step errors, bytes / tokens processed per step, audit results, queue
+    and stage depth. Needs no Azure and no extra package.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ========== STEP 8: HEALTH CHECK ENDPOINT ==========
 @app.get("/health")
 # ↑ GET request at http://localhost:8000/health
@@ -220,6 +775,10 @@ Access points:
 - API Docs:    http://localhost:8000/docs (interactive Swagger UI)
 - Health:      http://localhost:8000/health
 - Main API:    POST http://localhost:8000/audit
+- Job status:  GET  http://localhost:8000/audit/{job_id}
+- Progress:    GET  http://localhost:8000/audit/{job_id}/events (SSE)
+- Batch:       POST http://localhost:8000/audit/batch
+               GET  http://localhost:8000/audit/batch/{batch_id}[/events]
 '''
 
 '''
@@ -234,17 +793,20 @@ Access points:
    - Calls audit_video() function
    
 3. audit_video() executes:
-   - Generates session ID
+   - Generates session ID (also used as the job ID)
    - Prepares initial_inputs dict
-   - Calls compliance_graph.invoke()
+   - Enqueues an AuditJob and returns 202 {"job_id", "status"}
+     (429 if AUDIT_QUEUE_SIZE jobs are already waiting)
    
-4. LangGraph workflow runs:
+4. A queue worker picks the job up (at most AUDIT_MAX_WORKERS at once)
+   and runs the async LangGraph workflow (astream) on the event loop:
    START → Indexer → Auditor → END
    
-5. Function returns AuditResponse:
-   - FastAPI validates response matches model
-   - Converts Pydantic object to JSON
-   - Sends HTTP response to client
+5. Client follows GET /audit/{job_id}/events (SSE) for live progress,
+   ending with a "result" or "failed" event, or polls GET /audit/{job_id}:
+   - QUEUED / RUNNING while the workflow is in progress
+   - COMPLETED with the AuditResponse in "result"
+   - FAILED with the reason in "error"
    
 6. Azure Monitor captures:
    - Request duration
@@ -2,6 +2,10 @@
 import os
 import logging
 from azure.monitor.opentelemetry import configure_azure_monitor
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
 
 
 logger = logging.getLogger("brand-guardian-telemetry")
@@ -19,6 +23,10 @@ def setup_telemetry():
     - Once configured, it auto-captures every API request/response
     - No need to manuallu log each endpoint
     - Tracks response times, error rates, dependencies (like Azure Search calls)
+
+    Without a connection string nothing goes to Azure; OTEL_SPANS_FILE
+    still writes the audit spans to a local file, and GET /metrics serves
+    the audit metrics either way.
     """
 
     connection_string = os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
@@ -26,16 +34,47 @@ def setup_telemetry():
     if not connection_string:
         # If the environment variable is missing/empty, telemetry won't work
         # 
-        logger.warning("No Instrumentation Key found. Telemetry is DISABLED.")
-        return
-    
+        logger.warning("No Instrumentation Key found. Azure Monitor telemetry is DISABLED.")
+    else:
+        try:
+            configure_azure_monitor(
+                connection_string=connection_string,
+                logger_name = "brand-guardian-tracer"
+            )
+
+            logger.info("Azure Monitor Tracking Enabled & Connected!")
+
+        except Exception as e:
+            logger.error(f"Failed to initialize Azure Monitor: {e} ")
+
+    # ========== STEP 3: LOCAL SPANS (no Azure needed) ==========
+    spans_file = os.getenv("OTEL_SPANS_FILE")
+    if spans_file:
+        setup_local_spans(spans_file)
+
+
+def setup_local_spans(path: str):
+    """
+    Writes every span (audit nodes and steps, see services/instrumentation.py)
+    to `path` as one OpenTelemetry JSON object per line. Works alongside
+    Azure Monitor, or on its own when no connection string is set.
+    """
     try:
-        configure_azure_monitor(
-            connection_string=connection_string,
-            logger_name = "brand-guardian-tracer"
-        )
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
 
-        logger.info("Azure Monitor Tracking Enabled & Connected!")
+        provider = trace.get_tracer_provider()
+        if not isinstance(provider, TracerProvider):
+            # Azure Monitor not configured: install an SDK provider of our own
+            provider = TracerProvider(resource=Resource.create({"service.name": "brand-guardian"}))
+            trace.set_tracer_provider(provider)
+
+        exporter = ConsoleSpanExporter(
+            out=open(path, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        logger.info(f"Writing spans to {path}")
 
     except Exception as e:
-        logger.error(f"Failed to initialize Azure Monitor: {e} ")
\ No newline at end of file
+        logger.error(f"Failed to set up local span export: {e} ")
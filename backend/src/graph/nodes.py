@@ -1,12 +1,11 @@
 # nodes.py
-import json
 import os
 import logging
-import re
-from typing import Dict, Any, List
+import asyncio
+import hashlib
+from itertools import chain
+from typing import Dict, Any, List, Optional, Tuple
 
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-from langchain_community.vectorstores import AzureSearch
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 
@@ -14,43 +13,181 @@ from langchain_core.messages import SystemMessage, HumanMessage
 from backend.src.graph.state import VideoAuditState, ComplianceIssue
 
 #Import the Service
-from backend.src.services.video_indexer import VideoIndexerService
+from backend.src.services.video_indexer_async import AsyncVideoIndexerService
+from backend.src.services.youtube import parse_video_id
+from backend.src.services.clients import get_clients
+from backend.src.services.rulebook_index import RuleChunk, RulebookRetriever, rulebook_fingerprint
+from backend.src.services.retrieval import asearch_windows, reciprocal_rank_fusion
+from backend.src.services.progress import report_progress
+from backend.src.services.stage_limits import stage
+from backend.src.services.instrumentation import instrument_node, measure
+from backend.src.services.prompt_builder import (
+    PROMPT_FORMAT_VERSION,
+    AuditPrompt,
+    build_audit_prompts,
+    chunk_token_budget,
+    merge_findings,
+    segments_from_text,
+    timestamp_issues,
+)
+from backend.src.services.segments import SegmentTable, texts
+from backend.src.services.precheck import (
+    evaluate,
+    get_keyword_index,
+    max_rule_score,
+    precheck_fingerprint,
+    precheck_mode,
+    precheck_stats,
+    scan_keywords,
+)
+from backend.src.services.audit_output import (
+    VerdictParseError,
+    parse_verdict,
+    reject_response_format,
+    repair_attempts,
+    repair_messages,
+    response_format_for,
+    verdict_schema_fingerprint,
+)
+from backend.src.services.openai_limits import (
+    OpenAIRateLimiter,
+    get_chat_limiter,
+    get_cheap_chat_limiter,
+    get_embeddings_limiter,
+    estimate_tokens,
+    estimate_message_tokens,
+    completion_token_budget,
+    usage_tokens,
+)
 
 # Configure Logger
 logger = logging.getLogger("brand-guardian")
 logging.basicConfig(level=logging.INFO)
 
-# NODE 1: INDEXER
-def index_video_node(state: VideoAuditState) -> Dict[str, Any]:
+# --- Audit Prompt ---
+# Kept at module level so the result cache can fingerprint it: changing the
+# prompt invalidates every cached verdict.
+AUDIT_SYSTEM_PROMPT = """
+    You are a Senior Brand Compliance Auditor.
+
+    OFFICIAL REGULATORY RULES:
+    {retrieved_rules}
+
+    INSTRUCTIONS:
+    1. Analyze the Transcript and OCR text below. Each line starts with its
+       [m:ss] time in the video.
+    2. Identify ANY violations of the rules.
+    3. Return strictly JSON in the following format:
+    {{
+        "compliance_results": [
+            {{
+                "category": "Claim Validation",
+                "severity": "CRITICAL",
+                "description": "Explanation of the violation...",
+                "timestamp": "0:32"
+            }}
+        ],
+        "status": "FAIL",
+        "final_report": "Summary of findings..."
+    }}
+
+    If no violations are found, set "status" to "PASS" and "compliance_results" to [].
     """
-    Downloads YouTube video, uploads to Azure VI, and extract insights.
+
+
+def audit_fingerprint(rulebook_version: Optional[str] = None) -> str:
+    """
+    Short hash identifying "which rules + which prompt" an audit ran under.
+
+    Covers the rulebook (`rulebook_version`, the fingerprint of the index an
+    audit actually searched; by default the configured one: local index
+    content hash, or Azure index name + RULEBOOK_VERSION), how many rules are retrieved, the chat deployment,
+    the prompt text, the layout of the user message (PROMPT_FORMAT_VERSION),
+    the verdict schema the reply is parsed against, the window size long
+    videos are split into and the precheck settings (which decide whether
+    clean videos reach the LLM).
+    """
+    parts = [
+        rulebook_version or rulebook_fingerprint(),
+        os.getenv("RULEBOOK_TOP_K", "5"),
+        str(chunk_token_budget()),
+        precheck_fingerprint(),
+        os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT", ""),
+        AUDIT_SYSTEM_PROMPT,
+        PROMPT_FORMAT_VERSION,
+        verdict_schema_fingerprint(),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+# Nodes are coroutines: run the graph with ainvoke()/astream(). Waiting on
+# Video Indexer or the LLM then yields the event loop instead of a thread.
+
+# NODE 1: UPLOADER + INDEXER
+@instrument_node("uploader")
+async def upload_video_node(state: VideoAuditState) -> Dict[str, Any]:
+    """
+    Downloads YouTube video and uploads it to Azure VI, or reuses an
+    existing index of it. Returns the Azure video ID so the checkpoint
+    after this node can resume the wait without uploading again.
     """
     video_url = state.get("video_url")
     video_id_input = state.get("video_id", "vid_demo")
 
-    logger.info(f" --- [Node: Indexer] Processing: {video_url} ---")
-
-    local_filename = "temp_audit_video.mp4"
+    logger.info(f" --- [Node: Uploader] Processing: {video_url} ---")
 
     try:
-        vi_service = VideoIndexerService()
+        vi_service = AsyncVideoIndexerService()
+        source_video_id = parse_video_id(video_url)
+
+        # 0. Reuse: this YouTube video may already be indexed
+        raw_insights = await vi_service.find_existing_insights(source_video_id=source_video_id)
+        if raw_insights is not None:
+            clean_data = vi_service.extract_data(raw_insights)
+            logger.info("---[Node: Uploader] Reused existing index, extraction complete")
+            return clean_data
 
-        #1. Download
-        if "youtube.com" in video_url or "youtu.be" in video_url:
-            local_path = vi_service.download_youtube_video(video_url, output_path = local_filename)
-        else:
+        if source_video_id is None:
             raise Exception("Please provide a valid YouTube URL for this test.")
-        
-        #2. Upload
-        azure_video_id = vi_service.upload_video(local_path, video_name = video_id_input)
+
+        #1-3. Download + Upload (streamed; temp file only as a fallback)
+        azure_video_id = await vi_service.upload_youtube_video(
+            video_url, video_name = video_id_input, source_video_id = source_video_id
+        )
         logger.info(f"Upload Success. Azure ID: {azure_video_id}")
+        return {"azure_video_id": azure_video_id}
 
-        # 3. Cleanup
-        if os.path.exists(local_path):
-            os.remove(local_path)
+    except Exception as e:
+        logger.error(f"Video Indexer Failed: {e}")
+        return{
+            "errors": [str(e)],
+            "final_status": "FAIL",
+            "transcript": "",
+            "ocr_text": []
+        }
+
+
+def route_after_upload(state: VideoAuditState) -> str:
+    """Conditional edge: wait for indexing unless the uploader reused an index (or failed)."""
+    if state.get("azure_video_id") and state.get("transcript") is None:
+        return "indexer"
+    return "precheck"
+
+
+@instrument_node("indexer")
+async def index_video_node(state: VideoAuditState) -> Dict[str, Any]:
+    """
+    Waits for Azure VI to finish indexing the uploaded video, and extracts
+    insights. A resumed audit picks up here with the saved Azure video ID.
+    """
+    azure_video_id = state.get("azure_video_id")
+
+    logger.info(f" --- [Node: Indexer] Waiting for Azure ID: {azure_video_id} ---")
+
+    try:
+        vi_service = AsyncVideoIndexerService()
 
         # 4. Wait
-        raw_insights = vi_service.wait_for_processing(azure_video_id)
+        raw_insights = await vi_service.wait_for_processing(azure_video_id)
 
         # 5. Extract
         clean_data = vi_service.extract_data(raw_insights)
@@ -67,8 +204,83 @@ def index_video_node(state: VideoAuditState) -> Dict[str, Any]:
             "ocr_text": []
         }
     
-# ---NODE 2: The Compliance Auditor ---
-def audit_content_node(state: VideoAuditState) -> Dict[str, Any]:
+# --- NODE 2: Precheck ---
+@instrument_node("precheck")
+async def precheck_node(state: VideoAuditState) -> Dict[str, Any]:
+    """
+    Decides locally whether the video needs the LLM audit: trigger terms
+    in the transcript / OCR, then how close it comes to any rule in the
+    rulebook search (services/precheck.py). The rules it retrieves are
+    handed to the auditor.
+    """
+    mode = precheck_mode()
+    if mode == "off" or not state.get("transcript"):
+        # The auditor retrieves the rules itself / reports the missing transcript
+        return {}
+
+    logger.info("--- [Node: Precheck] Scanning for rule triggers ---")
+    clients = get_clients()
+    rulebook = clients.rulebook()
+    transcript_segments, ocr_segments = _segment_tables(state)
+
+    # Stage 1: trigger terms (in-process, sub-millisecond)
+    keywords = get_keyword_index(rulebook)
+    hits, keyword_ms = scan_keywords(keywords, chain(texts(transcript_segments), texts(ocr_segments)))
+
+    # Stage 2: rulebook similarity, from the search the auditor needs anyway
+    per_window = await _search_rulebook(rulebook, transcript_segments, ocr_segments)
+    rules = reciprocal_rank_fusion(per_window, top_k=int(os.getenv("RULEBOOK_TOP_K", "5")))
+    retrieved = {rule.text for rule in rules}
+    rules += [rule for rule in keywords.rule_chunks(hits) if rule.text not in retrieved]
+    report_progress("retrieval_finished", rules=len(rules),
+                    sources=sorted({rule.source for rule in rules if rule.source}))
+
+    result = evaluate(hits, max_rule_score(rulebook, per_window), mode, keyword_ms)
+    precheck_stats.record(result)
+    logger.info(f"Precheck: {result.decision} (confidence {result.confidence}; {result.reason}; "
+                f"keyword stage {result.keyword_ms} ms)")
+    report_progress("precheck_finished", **result.to_dict())
+    if mode == "shadow" and result.clean:
+        # Audited anyway; count what PRECHECK_MODE=pass would have saved
+        precheck_stats.avoidable(len(build_audit_prompts(transcript_segments, ocr_segments,
+                                                         state.get("video_metadata", {}))))
+
+    return {
+        "precheck": result.to_dict(),
+        "rules": [{"text": rule.text, "source": rule.source, "score": rule.score} for rule in rules],
+        "rulebook_version": rulebook.fingerprint(),
+    }
+
+
+def route_after_precheck(state: VideoAuditState) -> str:
+    """Conditional edge: clean videos skip the LLM when PRECHECK_MODE=pass."""
+    return "skip_audit" if (state.get("precheck") or {}).get("decision") == "pass" else "auditor"
+
+
+@instrument_node("skip_audit")
+async def skip_audit_node(state: VideoAuditState) -> Dict[str, Any]:
+    """PASS without an LLM call, for a video the precheck found clean."""
+    precheck = state.get("precheck") or {}
+    transcript_segments, ocr_segments = _segment_tables(state)
+    # The calls the auditor would have made: one per time window
+    avoided = len(build_audit_prompts(transcript_segments, ocr_segments, state.get("video_metadata", {})))
+    precheck_stats.avoided(avoided)
+    report_progress("audit_skipped", llm_calls_avoided=avoided, confidence=precheck.get("confidence"))
+    logger.info(f"--- [Node: Skip Audit] Clean video, {avoided} LLM call(s) avoided ---")
+
+    return {
+        "final_status": "PASS",
+        "final_report": (
+            "No rule-relevant content found by the precheck "
+            f"(confidence {precheck.get('confidence')}; {precheck.get('reason')}). LLM audit skipped."
+        ),
+        "prompt_stats": {"chunks": 0, "prompt_tokens": 0, "llm_calls_avoided": avoided},
+    }
+
+
+# --- NODE 3: The Compliance Auditor ---
+@instrument_node("auditor")
+async def audit_content_node(state: VideoAuditState) -> Dict[str, Any]:
     """
     Performs Retrieval-Augmented Generation (RAG) to audit the content.
     """
@@ -83,89 +295,154 @@ def audit_content_node(state: VideoAuditState) -> Dict[str, Any]:
             "final_report": "Audit skipped because video processing failed (No Transcript)."
         }
     
-    # Initialize Clients
-    llm = AzureChatOpenAI(
-        azure_deployment=os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT"),
-        openai_api_version= os.getenv("AZURE_OPENAI_API_VERSION"),
-        temperature=0.0
-    )
-
-    embeddings = AzureOpenAIEmbeddings(
-        azure_deployment="text-embedding-3-small",
-        openai_api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-    )
-
-    vector_store = AzureSearch(
-        azure_search_endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
-        azure_search_key=os.getenv("AZURE_SEARCH_API_KEY"),
-        index_name=os.getenv("AZURE_SEARCH_INDEX_NAME"),
-        embedding_function=embeddings.embed_query
-    )
-
-    # RAG Retrieval
-    ocr_text = state.get("ocr_text", [])
-    query_text = f"{transcript} {''.join(ocr_text)}"
-    docs = vector_store.similarity_search(query_text, k=3)
+    # Shared clients (built once per process, reused across audits).
+    # Videos the precheck found clean go to the cheaper deployment in PRECHECK_MODE=cheap.
+    clients = get_clients()
+    cheap = (state.get("precheck") or {}).get("decision") == "cheap"
+    llm = clients.cheap_llm() if cheap else clients.llm()
+    limiter = get_cheap_chat_limiter() if cheap else get_chat_limiter()
 
-    retrieved_rules = "\n\n".join([doc.page_content for doc in docs])
+    # Columnar transcript / OCR segments (text, start, end, confidence) from the indexer
+    ocr_text = state.get("ocr_text", [])
+    transcript_segments, ocr_segments = _segment_tables(state)
 
-    # --- UPDATED PROMPT WITH STRICT SCHEMA ---
-    system_prompt = f"""
-    You are a Senior Brand Compliance Auditor.
+    # RAG Retrieval: done by the precheck, else windowed multi-query search merged with rank fusion
+    rulebook_version = state.get("rulebook_version")
+    if state.get("rules") is not None:
+        rules = [RuleChunk(**rule) for rule in state["rules"]]
+    else:
+        rulebook = clients.rulebook()
+        rulebook_version = rulebook.fingerprint()
+        per_window = await _search_rulebook(rulebook, transcript_segments, ocr_segments)
+        rules = reciprocal_rank_fusion(per_window, top_k=int(os.getenv("RULEBOOK_TOP_K", "5")))
+        report_progress("retrieval_finished", rules=len(rules),
+                        sources=sorted({rule.source for rule in rules if rule.source}))
 
-    OFFICIAL REGULATORY RULES:
-    {retrieved_rules}
+    retrieved_rules = "\n\n".join([rule.text for rule in rules])
 
-    INSTRUCTIONS:
-    1. Analyze the Transcript and OCR text below.
-    2. Identify ANY violations of the rules.
-    3. Return strictly JSON in the following format:
-    {{
-        "compliance_results": [
-            {{
-                "category": "Claim Validation",
-                "severity": "CRITICAL",
-                "description": "Explanation of the violation..."
-            }}
-        ],
-        "status": "FAIL",
-        "final_report": "Summary of findings..."
-    }}
+    # --- UPDATED PROMPT WITH STRICT SCHEMA ---
+    system_prompt = AUDIT_SYSTEM_PROMPT.format(retrieved_rules=retrieved_rules)
 
-    If no violations are found, set "status" to "PASS" and "compliance_results" to [].
-    """
+    # Compacted, timestamped user message(s); long videos become several time windows
+    prompts = build_audit_prompts(transcript_segments, ocr_segments, state.get("video_metadata", {}))
 
-    user_message = f"""
-    VIDEO METADATA: {state.get('video_metadata', {})}
-    TRANSCRIPT: {transcript}
-    ON-SCREEN TEXT (OCR): {ocr_text}
-    """
+    system_tokens = estimate_tokens(system_prompt)
+    prompt_stats = {
+        "chunks": len(prompts),
+        "prompt_tokens": sum(system_tokens + prompt.tokens for prompt in prompts),
+        # What the single flat prompt used before compaction would have cost
+        "uncompacted_prompt_tokens": system_tokens + estimate_tokens(
+            f"VIDEO METADATA: {state.get('video_metadata', {})}\n"
+            f"TRANSCRIPT: {transcript}\nON-SCREEN TEXT (OCR): {ocr_text}"
+        ),
+    }
+    logger.info(f"Audit prompt: {prompt_stats['prompt_tokens']} tokens in {len(prompts)} chunk(s) "
+                f"(uncompacted: {prompt_stats['uncompacted_prompt_tokens']})")
+    report_progress("prompt_built", **prompt_stats)
 
     try:
-        response = llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_message)
-        ])
-
-        # --- FIX: Clean Markdown if present (```json ...```) ---
-        content = response.content
-        if "```" in content:
-            # Regex to find JSON inside code blocks
-            content = re.search(r"```(?:json)?(.*?)```", content, re.DOTALL).group(1)
-
-        audit_data = json.loads(content.strip())
+        # Tokens reach the progress stream via LangGraph's "messages" mode
+        report_progress("llm_started", chunks=len(prompts))
+        results = await asyncio.gather(*(
+            _audit_window(llm, limiter, system_prompt, prompt, len(prompts)) for prompt in prompts
+        ))
+        audit_data = merge_findings(results)
 
         return{
-            "compliance_results": audit_data.get("compliance_results", []),
+            "compliance_results": timestamp_issues(
+                audit_data.get("compliance_results", []), transcript_segments, ocr_segments
+            ),
             "final_status": audit_data.get("status", "FAIL"),
-            "final_report": audit_data.get("final_report", "No report generated.")
+            "final_report": audit_data.get("final_report", "No report generated."),
+            "prompt_stats": prompt_stats,
+            "rulebook_version": rulebook_version,
         }
     
     except Exception as e:
         logger.error(f"System Error in Auditor Node: {str(e)}")
-        # Log the raw response to see what went wrong
-        logger.error(f"Raw LLM Response: {response.content if 'response' in locals() else 'None'}")
         return {
             "errors": [str(e)],
-            "final_status": "FAIL"
+            "final_status": "FAIL",
+            "prompt_stats": prompt_stats,
         }
+
+
+def _segment_tables(state: VideoAuditState) -> Tuple[Optional[SegmentTable], Optional[SegmentTable]]:
+    """The indexer's transcript / OCR tables; untimed ones for state that has none."""
+    transcript_segments = state.get("transcript_segments")
+    ocr_segments = state.get("ocr_segments")
+    if not transcript_segments and not ocr_segments:
+        untimed = segments_from_text(state.get("transcript", ""), state.get("ocr_text", []))
+        transcript_segments, ocr_segments = untimed["transcript_segments"], untimed["ocr_segments"]
+    return transcript_segments, ocr_segments
+
+
+async def _search_rulebook(rulebook: RulebookRetriever, transcript_segments: Optional[SegmentTable],
+                           ocr_segments: Optional[SegmentTable]) -> List[List[RuleChunk]]:
+    """Per-time-window rulebook results: one batched embedding call, then a multi-vector search."""
+    embeddings = get_clients().embeddings()
+
+    async def embed_windows(windows: List[str]) -> List[List[float]]:
+        # Within the embedding deployment's RPM/TPM quota, retried on 429/5xx
+        with measure("embedding") as step:
+            step.add(texts=len(windows))
+            return await get_embeddings_limiter().call(
+                lambda: embeddings.aembed_documents(windows),
+                tokens=sum(estimate_tokens(window) for window in windows),
+            )
+
+    return await asearch_windows(rulebook, embed_windows, transcript_segments, ocr_segments, k_per_window=3)
+
+
+async def _audit_window(llm, limiter: OpenAIRateLimiter, system_prompt: str, prompt: AuditPrompt,
+                        windows: int) -> Dict[str, Any]:
+    """Audits one time window (or the whole video) and returns the validated verdict."""
+    messages = [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=prompt.user_message)
+    ]
+    response = await _ask_llm(llm, limiter, messages, prompt.label)
+
+    error: Optional[VerdictParseError] = None
+    for attempt in range(repair_attempts() + 1):
+        if attempt:
+            # Re-ask only this LLM step: same rules and transcript, plus what was wrong
+            logger.warning(f"Unusable LLM verdict ({prompt.label}), asking again: {error}")
+            report_progress("llm_repair", window=prompt.label, attempt=attempt, error=str(error))
+            response = await _ask_llm(llm, limiter, repair_messages(messages, response.content, error),
+                                      prompt.label, step="llm_repair")
+        try:
+            with measure("llm_parse") as step:
+                audit_data = parse_verdict(response.content)
+                step.add(repaired=int(audit_data.pop("repaired")))
+            break
+        except VerdictParseError as e:
+            error = e
+    else:
+        # Log the raw response to see what went wrong
+        logger.error(f"Raw LLM Response ({prompt.label}): {response.content}")
+        raise error
+
+    if windows > 1 and audit_data.get("final_report"):
+        audit_data["final_report"] = f"[{prompt.label}] {audit_data['final_report']}"
+    return audit_data
+
+
+async def _ask_llm(llm, limiter: OpenAIRateLimiter, messages: List[Any], label: str, step: str = "llm"):
+    """One chat call for the verdict, constrained to the verdict schema where the deployment allows it."""
+    fmt = response_format_for(llm)
+    model = llm.bind(response_format=fmt) if fmt is not None else llm
+    tokens = estimate_message_tokens(messages) + completion_token_budget()
+    async with stage("llm"):
+        with measure(step, window=label, limiter=limiter.name, response_format=fmt and fmt["type"]) as measured:
+            # Waits for chat RPM/TPM quota; 429s are retried, not reported as FAILs
+            try:
+                response = await limiter.call(lambda: model.ainvoke(messages), tokens=tokens, usage=usage_tokens)
+            except Exception as e:
+                if fmt is None or not reject_response_format(llm, e):
+                    raise
+                logger.warning(f"Deployment does not accept response_format={fmt['type']}; using plain replies: {e}")
+                response = await limiter.call(lambda: llm.ainvoke(messages), tokens=tokens, usage=usage_tokens)
+            usage = getattr(response, "usage_metadata", None) or {}
+            measured.add(prompt_tokens=usage.get("input_tokens"), completion_tokens=usage.get("output_tokens"))
+    return response
@@ -1,6 +1,8 @@
 import operator
 from typing import Annotated, List, Dict, Optional, Any, TypedDict
 
+from backend.src.services.segments import SegmentTable
+
 # define the schema for a single compliance result
 
 class ComplianceIssue(TypedDict):
@@ -22,9 +24,23 @@ class VideoAuditState(TypedDict):
     # --- Ingestion & Extraction Data ---
     # Optional because they are populated asynchronously by the Indexer Node.
     local_file_path : Optional[str]
+    # Set by the uploader; lets a resumed audit wait on the same VI upload
+    azure_video_id : Optional[str]
     video_metadata: Dict[str, Any] # e.g., {"duration": 15, "resolution": "1080p"}
     transcript: Optional[str]
     ocr_text: List[str]
+    # Columnar {"text", "start", "end", "confidence"} tables, times in seconds;
+    # transcript / ocr_text above are derived from them
+    transcript_segments: SegmentTable
+    ocr_segments: SegmentTable
+
+    # --- Precheck ---
+    # Decision, confidence and trigger terms (services/precheck.py)
+    precheck: Dict[str, Any]
+    # Rules selected for the auditor ({"text", "source", "score"}); the auditor retrieves them itself if absent
+    rules: List[Dict[str, Any]]
+    # Fingerprint of the rulebook the rules came from; the verdict is cached under it
+    rulebook_version: str
 
     # --- Analysis Output ---
     # annotated with operator.add to allow append-only updates from multiple nodes.
@@ -33,6 +49,7 @@ class VideoAuditState(TypedDict):
     # --- Final Deliverables ---
     final_status: str # "PASS" |"FAIL"
     final_report: str # Markdown summary for the frontend
+    prompt_stats: Dict[str, Any] # prompt tokens sent vs. the uncompacted prompt, chunks
 
     # ---System Observability ---
     # Appends system-level errors (e.g., API timeouts) without halting execution logic.
@@ -6,9 +6,22 @@ video compliance audit process. It connects the nodes (functional units)
 using the StateGraph primitive from LangGraph.
 
 Architecture:
-    [START] -> [index_video_node] -> [audit_content_node] -> [END]
+    [START] -> [upload_video_node] -+-> [index_video_node] -+-> [precheck_node] -+-> [audit_content_node] -> [END]
+                                    +-----------------------+                    +-> [skip_audit_node] ----> [END]
+
+The uploader skips the indexer when it reuses an existing index. The
+precheck routes videos it finds clean (no rule trigger terms, far from
+every rule) past the LLM audit when PRECHECK_MODE=pass.
+
+Uploading and waiting for Video Indexer are separate nodes so that, with a
+checkpointer (services/checkpoints.py), the state saved after the upload
+holds the Azure video ID: a resumed audit waits on that upload instead of
+starting over.
 """
 
+from typing import Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END
 
 # Import the State Schema
@@ -16,14 +29,23 @@ from backend.src.graph.state import VideoAuditState
 
 # Import the Functional Nodes
 from backend.src.graph.nodes import (
+    upload_video_node,
+    route_after_upload,
     index_video_node,
+    precheck_node,
+    route_after_precheck,
+    skip_audit_node,
     audit_content_node
 )
 
-def create_graph():
+def create_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
     """
     Constructs and compiles the LangGraph workflow.
 
+    Args:
+        checkpointer: Saves the state after every node, per thread_id in the
+            run config. None (the CLI) runs without checkpoints.
+
     Returns:
         CompiledGraph: A runnable graph object ready for execution.
     """
@@ -34,24 +56,44 @@ def create_graph():
     # 2. Add Nodes (The Workers)
     # The first argument is the unique name of the node in the graph.
     # The second argument is the function to execute.
+    workflow.add_node("uploader", upload_video_node)
     workflow.add_node("indexer", index_video_node)
+    workflow.add_node("precheck", precheck_node)
+    workflow.add_node("skip_audit", skip_audit_node)
     workflow.add_node("auditor", audit_content_node)
 
     # 3. Define Edges (The Logic Flow)
-    # Define the entry point: When the graph starts, go to 'indexer'.
-    workflow.set_entry_point("indexer")
+    # Define the entry point: When the graph starts, go to 'uploader'.
+    workflow.set_entry_point("uploader")
+
+    # Connect 'uploader' -> 'indexer' | 'precheck'
+    # A reused index is already extracted; a new upload waits for processing.
+    workflow.add_conditional_edges(
+        "uploader",
+        route_after_upload,
+        {"indexer": "indexer", "precheck": "precheck"},
+    )
+
+    # Connect 'indexer' -> 'precheck'
+    # Once the video is indexed (transcript extracted), check it for rule triggers locally.
+    workflow.add_edge("indexer", "precheck")
 
-    # Connect 'indexer' -> 'auditor'
-    # Once the video is indexed (transcript extracted), move to compliance auditing.
-    workflow.add_edge("indexer", "auditor")
+    # Connect 'precheck' -> 'auditor' | 'skip_audit'
+    # Clean videos skip the LLM audit; everything else is audited.
+    workflow.add_conditional_edges(
+        "precheck",
+        route_after_precheck,
+        {"auditor": "auditor", "skip_audit": "skip_audit"},
+    )
 
-    # Connect 'auditor' -> END
+    # Connect 'auditor' / 'skip_audit' -> END
     # Once the audit is complete, the workflow finishes.
     workflow.add_edge("auditor", END)
+    workflow.add_edge("skip_audit", END)
 
     # 4. Compile the Graph
     # This validates the connections and creates the executable runnable.
-    app = workflow.compile()
+    app = workflow.compile(checkpointer=checkpointer)
 
     return app
 
@@ -0,0 +1,259 @@
+"""
+Structured audit verdicts: schema, constrained output and repair.
+
+The auditor used to regex a ```json fence out of the reply and json.loads
+it. Any formatting noise (prose around the object, a trailing comma, a
+reply cut off at the token limit) raised, the audit ended as a FAIL with
+an error, and the only way out was re-running the whole pipeline,
+download and Video Indexer included. Now:
+
+1. the chat call asks for the AuditVerdict JSON schema as its response
+   format (AUDIT_RESPONSE_FORMAT=json_schema, the default), or plain JSON
+   mode (json_object), so well-formed output is the norm;
+2. parse_verdict() validates the reply against AuditVerdict, whose issues
+   mirror ComplianceIssue, and when it is not valid JSON first tries
+   repair_json(), a local fixer for the usual noise. A reply cut off
+   mid-object, or without an explicit PASS / FAIL status, is never
+   completed locally: a guessed verdict would be cached as a clean PASS;
+3. if that still fails, the auditor re-asks only the LLM step with
+   repair_messages(): the same system prompt (retrieved rules) and user
+   message (transcript / OCR), its broken reply and the parse error, at
+   most AUDIT_REPAIR_ATTEMPTS times.
+"""
+import os
+import re
+import json
+from typing import Any, Dict, List, Literal, Optional, Set
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+RESPONSE_FORMATS = ("json_schema", "json_object", "text")
+
+
+class VerdictParseError(Exception):
+    """The LLM's reply is not a valid audit verdict, even after local repair."""
+
+    def __init__(self, message: str, content: str):
+        super().__init__(message)
+        self.content = content
+
+
+class AuditIssue(BaseModel):
+    """One violation, as the LLM reports it (mirrors ComplianceIssue)."""
+    model_config = ConfigDict(extra="ignore")
+
+    category: str
+    severity: str
+    description: str
+    timestamp: Optional[str] = None  # "m:ss" where it occurs in the video
+
+    @field_validator("severity")
+    @classmethod
+    def _upper(cls, value: str) -> str:
+        return value.strip().upper()
+
+    @field_validator("timestamp", mode="before")
+    @classmethod
+    def _timestamp(cls, value: Any) -> Optional[str]:
+        return None if value in (None, "") else str(value)
+
+
+class AuditVerdict(BaseModel):
+    """The auditor's verdict for one time window (or the whole video)."""
+    model_config = ConfigDict(extra="ignore")
+
+    compliance_results: List[AuditIssue] = []
+    status: Literal["PASS", "FAIL"]  # required: never inferred from the issues
+    final_report: str = "No report generated."
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def _status(cls, value: Any) -> Any:
+        return value.strip().upper() if isinstance(value, str) else value
+
+
+def response_format_mode() -> str:
+    mode = os.getenv("AUDIT_RESPONSE_FORMAT", "json_schema").lower()
+    return mode if mode in RESPONSE_FORMATS else "json_schema"
+
+
+def repair_attempts() -> int:
+    """How many times a reply that can't be parsed is sent back to the LLM."""
+    return int(os.getenv("AUDIT_REPAIR_ATTEMPTS", "1"))
+
+
+def response_format(mode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """The chat completions `response_format` for the mode, None for plain text."""
+    mode = mode or response_format_mode()
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "audit_verdict", "strict": True, "schema": _strict(AuditVerdict.model_json_schema())},
+        }
+    return None
+
+
+def verdict_schema_fingerprint() -> str:
+    """The verdict's JSON schema and response format mode, for the audit fingerprint."""
+    return json.dumps([AuditVerdict.model_json_schema(), response_format_mode()], sort_keys=True)
+
+
+# Deployments that answered 400 to response_format (older API versions / models)
+_rejected: Set[str] = set()
+
+
+def _deployment(llm: Any) -> str:
+    return getattr(llm, "deployment_name", None) or type(llm).__name__
+
+
+def response_format_for(llm: Any) -> Optional[Dict[str, Any]]:
+    """response_format() for this chat client, None once its deployment rejected it."""
+    return None if _deployment(llm) in _rejected else response_format()
+
+
+def reject_response_format(llm: Any, error: Exception) -> bool:
+    """True, and remembered for the client's deployment, if `error` refuses response_format."""
+    if getattr(error, "status_code", None) != 400 or "response_format" not in str(error):
+        return False
+    _rejected.add(_deployment(llm))
+    return True
+
+
+def _strict(schema: Any) -> Any:
+    """
+    Adapts a Pydantic JSON schema to structured outputs' strict mode: every
+    property required (optional ones stay nullable), no extra properties,
+    no defaults.
+    """
+    if isinstance(schema, list):
+        return [_strict(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    strict = {key: _strict(value) for key, value in schema.items() if key != "default"}
+    if "properties" in strict:
+        strict["required"] = list(strict["properties"])
+        strict["additionalProperties"] = False
+    return strict
+
+
+def parse_verdict(content: str) -> Dict[str, Any]:
+    """
+    Validates a reply as an AuditVerdict and returns it as a dict, with
+    "repaired": True when repair_json() had to fix it. Raises
+    VerdictParseError when it can't.
+    """
+    text = (content or "").strip()
+    repaired = False
+    try:
+        data = json.loads(text)
+    except ValueError:
+        try:
+            data = json.loads(repair_json(text))
+        except ValueError as e:
+            raise VerdictParseError(f"Reply is not valid JSON: {e}", content)
+        repaired = True
+
+    if not isinstance(data, dict):
+        raise VerdictParseError(f"Expected a JSON object, got {type(data).__name__}", content)
+    try:
+        verdict = AuditVerdict.model_validate(data).model_dump()
+    except ValidationError as e:
+        raise VerdictParseError(f"Reply does not match the verdict schema: {_summarise(e)}", content)
+    verdict["repaired"] = repaired
+    return verdict
+
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort fix for the ways chat models break JSON: a markdown fence
+    or prose around the object, // comments, Python literals, raw newlines
+    in strings and trailing commas. Returns the text unchanged where it
+    finds nothing to fix; json.loads decides whether it worked.
+
+    Raises ValueError for a reply cut off mid-object: what is missing may
+    be an issue or the status, so it is re-asked rather than closed here.
+    """
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    if start == -1:
+        return text
+    text = text[start:]
+
+    out: List[str] = []
+    depth = 0
+    in_string = escaped = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                out[-1] = "\\n"  # raw newline inside a string
+            i += 1
+            continue
+        if char == '"':
+            in_string = True
+        elif char == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = len(text) if end == -1 else end
+            continue
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth = max(depth - 1, 0)
+            if not depth:
+                out.append(char)
+                break  # end of the top-level object: drop anything after it
+        else:
+            word = re.match(r"True|False|None", text[i:])
+            if word and not (out and (out[-1].isalnum() or out[-1] == "_")):
+                out.append(_LITERALS[word.group(0)])
+                i += len(word.group(0))
+                continue
+        out.append(char)
+        i += 1
+
+    if in_string or depth:
+        raise ValueError("reply is cut off before the end of the JSON object")
+    return _TRAILING_COMMA.sub(r"\1", "".join(out))
+
+
+def repair_messages(messages: List[BaseMessage], content: str, error: Exception) -> List[BaseMessage]:
+    """
+    The original conversation (system prompt with the retrieved rules, the
+    transcript / OCR message), the unusable reply and what was wrong with
+    it, asking for the verdict again.
+    """
+    return [
+        *messages,
+        AIMessage(content=content),
+        HumanMessage(content=(
+            f"Your previous reply could not be used: {error}\n"
+            "Reply again with only the JSON object in the required format "
+            '({"compliance_results": [...], "status": "PASS" | "FAIL", "final_report": "..."}), '
+            "with no markdown and no other text."
+        )),
+    ]
+
+
+def _summarise(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'verdict'}: {item['msg']}"
+        for item in error.errors()[:5]
+    )
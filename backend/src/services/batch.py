@@ -0,0 +1,270 @@
+"""
+Batch audits.
+
+Campaigns submit dozens of creator videos at once. POST /audit/batch takes
+them in one request:
+
+- URLs are deduplicated by canonical video ID, so the same video under
+  several URL forms is audited once;
+- every unique video becomes an AuditJob and all of them run concurrently,
+  so throughput is bounded by the per-stage limits (services/stage_limits.py),
+  in practice by Video Indexer, rather than by running videos one by one;
+- each result is appended to the batch's ProgressLog as soon as it is
+  ready, and GET /audit/batch/{batch_id}/events streams them back;
+- summary() aggregates pass/fail counts overall and per issue category.
+"""
+import io
+import csv
+import json
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.src.services.job_queue import AuditJob, JobHandler, COMPLETED, FAILED
+from backend.src.services.progress import ProgressLog
+from backend.src.services.youtube import parse_video_id
+
+logger = logging.getLogger("audit-batch")
+
+
+class BatchTooLargeError(Exception):
+    """Raised when a batch has more unique videos than the runner accepts."""
+
+
+@dataclass
+class BatchItem:
+    """One unique video in a batch, plus the other URLs that resolved to it."""
+    video_url: str
+    video_key: str
+    job: AuditJob
+    duplicate_urls: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "video_url": self.video_url,
+            "job_id": self.job.job_id,
+            "status": self.job.status,
+            "duplicate_urls": self.duplicate_urls,
+        }
+
+
+@dataclass
+class AuditBatch:
+    batch_id: str
+    items: List[BatchItem]
+    submitted_urls: int
+    events: ProgressLog = field(default_factory=ProgressLog, repr=False)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return all(item.job.done for item in self.items)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Pass/fail counts for the batch, and per issue category: how many
+        videos failed on it, how many issues were raised, by severity.
+        """
+        totals = {
+            "submitted_urls": self.submitted_urls,
+            "videos": len(self.items),
+            "completed": 0, "failed": 0, "pending": 0,
+            "pass": 0, "fail": 0, "cached": 0,
+            "precheck_skipped": 0,  # passed by the precheck without an LLM audit
+        }
+        categories: Dict[str, Dict[str, Any]] = {}
+
+        for item in self.items:
+            job = item.job
+            if job.status == FAILED:
+                totals["failed"] += 1
+                continue
+            if job.status != COMPLETED:
+                totals["pending"] += 1
+                continue
+
+            totals["completed"] += 1
+            result = job.result or {}
+            totals["cached"] += int(bool(result.get("cached")))
+            totals["precheck_skipped"] += int((result.get("precheck") or {}).get("decision") == "pass")
+            if result.get("status") == "PASS":
+                totals["pass"] += 1
+            else:
+                totals["fail"] += 1
+
+            failed_on = set()
+            for issue in result.get("compliance_results", []):
+                category = issue.get("category") or "Uncategorised"
+                entry = categories.setdefault(category, {"failed_videos": 0, "issues": 0, "by_severity": {}})
+                entry["issues"] += 1
+                severity = issue.get("severity") or "UNKNOWN"
+                entry["by_severity"][severity] = entry["by_severity"].get(severity, 0) + 1
+                if category not in failed_on:
+                    failed_on.add(category)
+                    entry["failed_videos"] += 1
+
+        for entry in categories.values():
+            entry["passed_videos"] = totals["completed"] - entry["failed_videos"]
+
+        return {"totals": totals, "categories": categories}
+
+
+class BatchRunner:
+    """
+    Runs batches of audits concurrently in the current event loop.
+
+    `handler` runs one audit (the same one the job queue uses); `on_job`
+    is called for every job created, so the API can make batch items
+    pollable through GET /audit/{job_id} as well.
+    """
+
+    def __init__(self, handler: JobHandler, on_job: Optional[Callable[[AuditJob], None]] = None,
+                 max_videos: int = 200, max_retained_batches: int = 50):
+        self.handler = handler
+        self.on_job = on_job
+        self.max_videos = max_videos
+        self.max_retained_batches = max_retained_batches
+        self._batches: "OrderedDict[str, AuditBatch]" = OrderedDict()
+        self._tasks: set = set()
+
+    def submit(self, video_urls: List[str], make_payload: Callable[[str, str], Dict[str, Any]]) -> AuditBatch:
+        """
+        Deduplicates the URLs and starts one audit per unique video.
+        `make_payload(video_url, job_id)` builds each workflow input.
+        """
+        items: "OrderedDict[str, BatchItem]" = OrderedDict()
+        for url in video_urls:
+            url = url.strip()
+            if not url:
+                continue
+            key = parse_video_id(url) or url
+            if key in items:
+                items[key].duplicate_urls.append(url)
+                continue
+            job_id = str(uuid.uuid4())
+            items[key] = BatchItem(video_url=url, video_key=key,
+                                   job=AuditJob(job_id=job_id, payload=make_payload(url, job_id)))
+
+        if not items:
+            raise ValueError("No video URLs given.")
+        if len(items) > self.max_videos:
+            raise BatchTooLargeError(f"Batch has {len(items)} videos; the limit is {self.max_videos}.")
+
+        batch = AuditBatch(batch_id=str(uuid.uuid4()), items=list(items.values()),
+                           submitted_urls=len([u for u in video_urls if u.strip()]))
+        self._remember(batch)
+
+        for item in batch.items:
+            if self.on_job is not None:
+                self.on_job(item.job)
+            task = asyncio.create_task(self._run(batch, item), name=f"batch-{batch.batch_id[:8]}-{item.video_key}")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        logger.info(f"Batch {batch.batch_id}: {len(batch.items)} videos "
+                    f"({batch.submitted_urls - len(batch.items)} duplicate URLs dropped)")
+        return batch
+
+    def get(self, batch_id: str) -> Optional[AuditBatch]:
+        return self._batches.get(batch_id)
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": len(self._batches), "running_videos": len(self._tasks)}
+
+    async def _run(self, batch: AuditBatch, item: BatchItem) -> None:
+        job = item.job
+        job.start()
+        try:
+            job.finish(result=await self.handler(job))
+        except asyncio.CancelledError:
+            job.finish(error="Job was cancelled.")
+            raise
+        except Exception as e:
+            logger.error(f"Batch {batch.batch_id}: {item.video_url} failed: {e}")
+            job.finish(error=str(e))
+        finally:
+            self._report(batch, item)
+
+    def _report(self, batch: AuditBatch, item: BatchItem) -> None:
+        job = item.job
+        if job.status == COMPLETED:
+            batch.events.append("item_result", {**item.to_dict(), "result": job.result})
+        else:
+            batch.events.append("item_failed", {**item.to_dict(), "error": job.error})
+
+        if batch.done and not batch.events.closed:
+            batch.finished_at = time.time()
+            batch.events.close("summary", batch.summary())
+            logger.info(f"Batch {batch.batch_id} finished in {batch.finished_at - batch.created_at:.1f}s")
+
+    def _remember(self, batch: AuditBatch) -> None:
+        self._batches[batch.batch_id] = batch
+        if len(self._batches) > self.max_retained_batches:
+            for old_id in [bid for bid, b in self._batches.items() if b.done]:
+                if len(self._batches) <= self.max_retained_batches:
+                    break
+                del self._batches[old_id]
+
+
+def parse_video_urls(body: bytes, content_type: str) -> List[str]:
+    """
+    Reads the URL list of a batch request. Accepted bodies:
+
+    - application/json:   {"video_urls": [...]} or a plain list
+    - text/csv:           a `video_url` / `url` column, else the first column
+    - application/x-ndjson, application/jsonl:
+                          one URL string or {"video_url": ...} object per line
+
+    Raises ValueError for anything it can't read.
+    """
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    text = body.decode("utf-8-sig")
+
+    if media_type in ("text/csv", "application/csv"):
+        try:
+            rows = [row for row in csv.reader(io.StringIO(text)) if row and any(cell.strip() for cell in row)]
+        except csv.Error as e:
+            raise ValueError(f"Malformed CSV: {e}") from e
+        if not rows:
+            return []
+        header = [cell.strip().lower() for cell in rows[0]]
+        for name in ("video_url", "url"):
+            if name in header:
+                column = header.index(name)
+                return [row[column] for row in rows[1:] if len(row) > column]
+        return [row[0] for row in rows]
+
+    if media_type in ("application/x-ndjson", "application/jsonl", "application/json-lines"):
+        urls = []
+        for line in text.splitlines():
+            if line.strip():
+                urls.append(_url_from_json(json.loads(line)))
+        return urls
+
+    if media_type == "application/json":
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("video_urls")
+        if not isinstance(data, list):
+            raise ValueError('Expected {"video_urls": [...]} or a JSON list of URLs.')
+        return [_url_from_json(entry) for entry in data]
+
+    raise ValueError(f"Unsupported content type '{media_type}'. Send JSON, CSV or JSONL.")
+
+
+def _url_from_json(entry: Any) -> str:
+    if isinstance(entry, str):
+        return entry
+    if isinstance(entry, dict) and isinstance(entry.get("video_url"), str):
+        return entry["video_url"]
+    raise ValueError(f"Can't read a video URL from {entry!r}")
@@ -0,0 +1,379 @@
+"""
+Durable LangGraph checkpoints for audits.
+
+The graph used to run without a checkpointer. If the container restarted in
+the middle of an audit, everything was lost, including the Azure video ID
+of an upload Video Indexer was already processing. The audit then started
+over with a fresh download, upload and full indexing run. The server now
+compiles the graph with a checkpointer:
+
+- State is saved after every node, keyed by the audit's job ID (the
+  LangGraph thread_id). The uploader's checkpoint holds the Azure video ID,
+  so a resumed audit goes straight back to waiting on Video Indexer.
+- POST /audit/{job_id}/resume continues an audit from its last checkpoint.
+  On startup the server resumes every audit whose checkpoint is unfinished
+  and younger than CHECKPOINT_RESUME_MAX_AGE_SECONDS, and drops older ones.
+  Checkpoints carry no owner, so that sweep would also requeue audits other
+  live replicas are running: it is single-replica only, and on by default
+  only for the local SQLite file.
+- A thread's checkpoints are deleted once its audit completes; the verdict
+  itself lives in the result cache.
+
+Backends (CHECKPOINT_BACKEND):
+
+    sqlite        SqliteCheckpointSaver at CHECKPOINT_PATH (default)
+    memory        LangGraph's InMemorySaver: no durability, same code path
+    none          no checkpointer (audits can't be resumed)
+    module:attr   any BaseCheckpointSaver factory, e.g. a Postgres saver for
+                  replicas that share one store
+
+SqliteCheckpointSaver needs only the standard library: the LangGraph SQLite
+saver package is not a dependency.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import sqlite3
+import importlib
+import threading
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+logger = logging.getLogger("checkpoints")
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer persisted to a SQLite file.
+
+    Checkpoints and metadata are stored with the saver's serializer, and
+    pending writes per task as in LangGraph's own savers. The async methods
+    run the sync ones on a worker thread.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                checkpoint_type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoint_writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                value_type TEXT NOT NULL,
+                value BLOB NOT NULL,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            )
+            """
+        )
+        self._conn.commit()
+
+    # --- sync API ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable.get("checkpoint_id")
+        with self._lock:
+            if checkpoint_id:
+                row = self._conn.execute(
+                    "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, "
+                    "checkpoint, metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, "
+                    "checkpoint, metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._tuple(row, self._writes(row[0], row[1], row[2]))
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, "
+                 "checkpoint, metadata_type, metadata FROM checkpoints")
+        where, params = [], []
+        if config is not None:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            checkpoint_id = config["configurable"].get("checkpoint_id")
+            if checkpoint_id:
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and before["configurable"].get("checkpoint_id"):
+            where.append("checkpoint_id < ?")
+            params.append(before["configurable"]["checkpoint_id"])
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+        if limit is not None and not filter:
+            # Metadata filters are applied in Python, so only then can't SQL stop early
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            tuples = []
+            # Iterate the cursor: with a filter, stop reading rows once `limit` match
+            for row in self._conn.execute(query, params):
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if filter and any(metadata.get(key) != value for key, value in filter.items()):
+                    continue
+                tuples.append(self._tuple(row, self._writes(row[0], row[1], row[2])))
+                if limit is not None and len(tuples) >= limit:
+                    break
+        return iter(tuples)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(
+            {**configurable_metadata(config), **(metadata or {})}
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                "checkpoint_type, checkpoint, metadata_type, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], configurable.get("checkpoint_id"),
+                 checkpoint_type, checkpoint_blob, metadata_type, metadata_blob, time.time()),
+            )
+            self._conn.commit()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        configurable = config["configurable"]
+        # Special channels (errors, interrupts...) replace; regular writes are kept once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append((configurable["thread_id"], configurable.get("checkpoint_ns", ""),
+                         configurable["checkpoint_id"], task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, value_type, value_blob, task_path))
+        with self._lock:
+            self._conn.executemany(
+                f"{verb} INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                "value_type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM checkpoint_writes WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def thread_ids(self) -> List[str]:
+        """Threads with a saved checkpoint, without deserialising any of them."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT thread_id FROM checkpoints").fetchall()
+        return [row[0] for row in rows]
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as LangGraph's own savers: zero-padded counter + random tiebreak
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- async API (LangGraph calls these from astream / ainvoke) ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in tuples:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def athread_ids(self) -> List[str]:
+        return await asyncio.to_thread(self.thread_ids)
+
+    # --- helpers ---
+
+    def _writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = self._conn.execute(
+            "SELECT task_id, channel, value_type, value FROM checkpoint_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in rows]
+
+    def _tuple(self, row: tuple, pending_writes: List[Tuple[str, str, Any]]) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id = row[0], row[1], row[2], row[3]
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((row[4], row[5])),
+            metadata=self.serde.loads_typed((row[6], row[7])),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                  "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=pending_writes,
+        )
+
+
+def configurable_metadata(config: RunnableConfig) -> Dict[str, Any]:
+    """Plain values from config["configurable"] worth keeping with a checkpoint (e.g. thread_id)."""
+    return {
+        key: value for key, value in (config.get("configurable") or {}).items()
+        if not key.startswith("__") and key not in ("checkpoint_id", "checkpoint_ns")
+        and isinstance(value, (str, int, float, bool))
+    }
+
+
+def thread_config(thread_id: str) -> RunnableConfig:
+    """Graph config for an audit's checkpoints."""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def age_seconds(ts: Optional[str]) -> float:
+    """Seconds since an ISO-8601 checkpoint timestamp (e.g. StateSnapshot.created_at)."""
+    try:
+        return max(time.time() - datetime.fromisoformat(ts).timestamp(), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def athread_ids(checkpointer: BaseCheckpointSaver) -> List[str]:
+    """
+    Every thread (audit) with a saved checkpoint.
+
+    Savers that can list thread IDs directly (SQLite, in-memory) are asked
+    for them; any other saver falls back to alist(None), which loads every
+    checkpoint.
+    """
+    if isinstance(checkpointer, SqliteCheckpointSaver):
+        return await checkpointer.athread_ids()
+    if isinstance(checkpointer, InMemorySaver):
+        return list(checkpointer.storage)
+    seen: Dict[str, None] = {}
+    async for item in checkpointer.alist(None):
+        seen.setdefault(item.config["configurable"]["thread_id"], None)
+    return list(seen)
+
+
+def resume_max_age_seconds() -> float:
+    return float(os.getenv("CHECKPOINT_RESUME_MAX_AGE_SECONDS", "21600"))
+
+
+def checkpoint_backend() -> str:
+    return os.getenv("CHECKPOINT_BACKEND", "sqlite")
+
+
+def resume_on_startup() -> bool:
+    """
+    Whether the server resumes unfinished audits on startup. Defaults to
+    true only for the local SQLite file: with a shared backend every
+    starting replica would requeue audits the others are still running.
+    """
+    default = "true" if checkpoint_backend().lower() == "sqlite" else "false"
+    return os.getenv("CHECKPOINT_RESUME_ON_STARTUP", default).lower() == "true"
+
+
+def create_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """
+    Builds the checkpointer configured through environment variables.
+
+    CHECKPOINT_BACKEND   sqlite (default) | memory | none | module:attr
+    CHECKPOINT_PATH      SQLite file (default .cache/checkpoints.sqlite3)
+    """
+    backend = checkpoint_backend()
+
+    if backend.lower() == "none":
+        logger.info("Audit checkpointing is DISABLED; interrupted audits start over.")
+        return None
+    if backend.lower() == "memory":
+        logger.info("Audit checkpoints: in memory (lost on restart)")
+        return InMemorySaver()
+    if ":" in backend:
+        # Pluggable: "package.module:factory" returning a BaseCheckpointSaver
+        module_name, attr = backend.split(":", 1)
+        factory = getattr(importlib.import_module(module_name), attr)
+        saver = factory() if callable(factory) else factory
+        logger.info(f"Audit checkpoints: {type(saver).__name__} from {backend}")
+        return saver
+    if backend.lower() != "sqlite":
+        logger.warning(f"Unknown CHECKPOINT_BACKEND '{backend}', falling back to sqlite")
+    path = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite3")
+    logger.info(f"Audit checkpoints: SQLite at {path}")
+    return SqliteCheckpointSaver(path)
@@ -0,0 +1,192 @@
+"""
+Process-wide registry of Azure OpenAI / Azure AI Search clients.
+
+audit_content_node used to build a new AzureChatOpenAI, AzureOpenAIEmbeddings
+and AzureSearch on every audit. That meant new HTTP clients (no connection
+reuse), config re-validation, and for AzureSearch a round-trip to fetch or
+create the index schema. The registry builds each client once, lazily or
+from the API's startup hook via warm_up(), and every audit reuses it. The
+OpenAI clients share one pooled httpx.Client (sync calls) and one
+httpx.AsyncClient (ainvoke / aembed_*, used by the async graph nodes);
+aclose() releases both on shutdown. Their built-in retries are off: audits
+call them through services/openai_limits.py, which owns quota and 429
+retries for the whole process.
+
+rulebook() is what the auditor queries: the local vector index when present,
+Azure AI Search otherwise (see services/rulebook_index.py). A local index
+rewritten by scripts/index_documents.py is reloaded on the next call, so
+audits run against the rules the result cache is keyed by.
+"""
+import os
+import logging
+import threading
+from typing import Optional
+
+import httpx
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from langchain_community.vectorstores import AzureSearch
+
+from backend.src.services.rulebook_index import (
+    RulebookRetriever,
+    LocalVectorIndex,
+    AzureSearchRetriever,
+    rulebook_backend,
+    local_index_dir,
+)
+
+logger = logging.getLogger("client-registry")
+
+
+class ClientRegistry:
+    """Lazily-built, thread-safe holder for the shared LLM / search clients."""
+
+    def __init__(self, max_connections: int = 50):
+        self.max_connections = max_connections
+        self._lock = threading.RLock()
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._llm: Optional[AzureChatOpenAI] = None
+        self._cheap_llm: Optional[AzureChatOpenAI] = None
+        self._embeddings: Optional[AzureOpenAIEmbeddings] = None
+        self._vector_store: Optional[AzureSearch] = None
+        self._rulebook: Optional[RulebookRetriever] = None
+
+    def http_client(self) -> httpx.Client:
+        """Pooled keep-alive HTTP client shared by the chat and embedding clients."""
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                    timeout=httpx.Timeout(120.0, connect=10.0),
+                )
+            return self._http_client
+
+    def async_http_client(self) -> httpx.AsyncClient:
+        """Pooled async client for the OpenAI clients' async methods."""
+        with self._lock:
+            if self._async_http_client is None:
+                self._async_http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    ),
+                    timeout=httpx.Timeout(120.0, connect=10.0),
+                )
+            return self._async_http_client
+
+    def llm(self) -> AzureChatOpenAI:
+        with self._lock:
+            if self._llm is None:
+                self._llm = AzureChatOpenAI(
+                    azure_deployment=os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT"),
+                    openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                    temperature=0.0,
+                    max_retries=0,
+                    http_client=self.http_client(),
+                    http_async_client=self.async_http_client(),
+                )
+            return self._llm
+
+    def cheap_llm(self) -> AzureChatOpenAI:
+        """Chat client for AZURE_OPENAI_CHEAP_CHAT_DEPLOYMENT (videos the precheck found clean)."""
+        with self._lock:
+            if self._cheap_llm is None:
+                self._cheap_llm = AzureChatOpenAI(
+                    azure_deployment=os.getenv("AZURE_OPENAI_CHEAP_CHAT_DEPLOYMENT"),
+                    openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                    temperature=0.0,
+                    max_retries=0,
+                    http_client=self.http_client(),
+                    http_async_client=self.async_http_client(),
+                )
+            return self._cheap_llm
+
+    def embeddings(self) -> AzureOpenAIEmbeddings:
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = AzureOpenAIEmbeddings(
+                    azure_deployment=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small"),
+                    openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                    max_retries=0,
+                    http_client=self.http_client(),
+                    http_async_client=self.async_http_client(),
+                )
+            return self._embeddings
+
+    def vector_store(self) -> AzureSearch:
+        with self._lock:
+            if self._vector_store is None:
+                self._vector_store = AzureSearch(
+                    azure_search_endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
+                    azure_search_key=os.getenv("AZURE_SEARCH_API_KEY"),
+                    index_name=os.getenv("AZURE_SEARCH_INDEX_NAME"),
+                    embedding_function=self.embeddings().embed_query,
+                )
+            return self._vector_store
+
+    def rulebook(self) -> RulebookRetriever:
+        """
+        Rulebook retriever: the local vector index when one exists (or
+        RULEBOOK_BACKEND=local), otherwise Azure AI Search.
+        """
+        with self._lock:
+            if isinstance(self._rulebook, LocalVectorIndex) and self._rulebook.changed_on_disk():
+                logger.info("Local rulebook index changed on disk; reloading it")
+                self._rulebook = LocalVectorIndex(self._rulebook.index_dir, self._rulebook.embed_fn)
+            if self._rulebook is None:
+                if rulebook_backend() == "local":
+                    self._rulebook = LocalVectorIndex(local_index_dir(), self.embeddings().embed_query)
+                else:
+                    self._rulebook = AzureSearchRetriever(self.vector_store())
+            return self._rulebook
+
+    def override(self, llm=None, cheap_llm=None, embeddings=None, rulebook: Optional[RulebookRetriever] = None) -> None:
+        """
+        Installs prebuilt clients in place of the Azure ones (benchmarks and
+        offline runs, e.g. scripts/benchmark_pipeline.py). Clients left as
+        None are built as usual; close() forgets the overrides too.
+        """
+        with self._lock:
+            self._llm = llm if llm is not None else self._llm
+            self._cheap_llm = cheap_llm if cheap_llm is not None else self._cheap_llm
+            self._embeddings = embeddings if embeddings is not None else self._embeddings
+            self._rulebook = rulebook if rulebook is not None else self._rulebook
+
+    def warm_up(self) -> None:
+        """Builds every client up front so the first audit doesn't pay for it."""
+        self.llm()
+        self.embeddings()
+        self.rulebook()
+        logger.info("LLM, embedding and rulebook clients initialised")
+
+    async def aclose(self) -> None:
+        """close(), plus the async client (must run on the loop that used it)."""
+        with self._lock:
+            async_client, self._async_http_client = self._async_http_client, None
+        if async_client is not None:
+            await async_client.aclose()
+        self.close()
+
+    def close(self) -> None:
+        """Closes pooled connections and forgets the clients."""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._async_http_client = None
+            self._llm = None
+            self._cheap_llm = None
+            self._embeddings = None
+            self._vector_store = None
+            self._rulebook = None
+
+
+_registry = ClientRegistry()
+
+
+def get_clients() -> ClientRegistry:
+    """Returns the process-wide client registry."""
+    return _registry
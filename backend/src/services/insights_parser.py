@@ -0,0 +1,150 @@
+"""
+Streaming parser for Video Indexer /Index documents.
+
+A processed video's /Index JSON runs to several MB (faces, labels, keyframes,
+per-frame OCR...) of which extract_data reads only the state, the duration
+and the transcript / OCR items. response.json() built the whole document in
+memory before any of it was used. parse_insights() and aparse_insights()
+read the body incrementally with ijson and keep only those parts. They
+return the same slim shape as segments.slim_insights(), so extract_data,
+polling (state, processingProgress) and the insights store take either.
+
+ijson is a project dependency (its C backend is used when available). If an
+environment lacks it anyway, the body is parsed with json and slimmed
+straight away, with a warning: same result and the retained memory is just
+as small, but the peak is the full document.
+
+backend/scripts/benchmark_insights_parser.py compares both against the old
+response.json() path.
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from backend.src.services.segments import slim_insights, slim_item
+
+logger = logging.getLogger("insights-parser")
+
+try:
+    import ijson
+except ImportError:  # safety net only: ijson is in pyproject.toml
+    ijson = None
+    logger.warning("ijson is not installed; Video Indexer documents will be parsed whole (uv sync to fix)")
+
+_ITEM_PREFIXES = {
+    "videos.item.insights.transcript.item": "transcript",
+    "videos.item.insights.ocr.item": "ocr",
+}
+_WANTED_PREFIXES = frozenset({
+    "state",
+    "durationInSeconds",
+    "summarizedInsights.duration.seconds",
+    "videos.item",
+    "videos.item.state",
+    "videos.item.processingProgress",
+    *_ITEM_PREFIXES,
+})
+
+
+def streaming_backend() -> str:
+    """Which parser is in use: "ijson/<backend>" or "json"."""
+    return f"ijson/{ijson.backend}" if ijson is not None else "json"
+
+
+class SlimInsightsBuilder:
+    """
+    Builds the slim document from ijson (prefix, event, value) events.
+    Only transcript / OCR items are materialised, one at a time; every
+    other event is dropped after one set lookup.
+    """
+
+    def __init__(self):
+        self._duration: Dict[str, Any] = {}
+        self._fallback_seconds: Optional[float] = None
+        self.doc: Dict[str, Any] = {"state": None, "summarizedInsights": {"duration": self._duration}, "videos": []}
+        self._item_target: Optional[List[Dict[str, Any]]] = None
+        self._item_prefix: Optional[str] = None
+        self._item_builder = None
+
+    def feed(self, events: Iterable[Tuple[str, str, Any]]) -> None:
+        for prefix, event, value in events:
+            if self._item_builder is not None or prefix in _WANTED_PREFIXES:
+                self.event(prefix, event, value)
+
+    async def afeed(self, events: AsyncIterator[Tuple[str, str, Any]]) -> None:
+        async for prefix, event, value in events:
+            if self._item_builder is not None or prefix in _WANTED_PREFIXES:
+                self.event(prefix, event, value)
+
+    def event(self, prefix: str, event: str, value: Any) -> None:
+        if self._item_builder is not None:
+            self._item_builder.event(event, value)
+            if event == "end_map" and prefix == self._item_prefix:
+                self._item_target.append(slim_item(self._item_builder.value))
+                self._item_builder = None
+            return
+
+        videos = self.doc["videos"]
+        if prefix in _ITEM_PREFIXES:
+            if event == "start_map":
+                self._item_target = videos[-1]["insights"][_ITEM_PREFIXES[prefix]]
+                self._item_prefix = prefix
+                self._item_builder = ijson.ObjectBuilder()
+                self._item_builder.event(event, value)
+        elif prefix == "state" and event == "string":
+            self.doc["state"] = value
+        elif prefix == "summarizedInsights.duration.seconds" and event == "number":
+            self._duration["seconds"] = value
+        elif prefix == "durationInSeconds" and event == "number":
+            self._fallback_seconds = value
+        elif prefix == "videos.item" and event == "start_map":
+            videos.append({"state": None, "processingProgress": None, "insights": {"transcript": [], "ocr": []}})
+        elif prefix == "videos.item.state" and event == "string":
+            videos[-1]["state"] = value
+        elif prefix == "videos.item.processingProgress" and event in ("string", "number"):
+            videos[-1]["processingProgress"] = value
+
+    def result(self) -> Dict[str, Any]:
+        if "seconds" not in self._duration and self._fallback_seconds is not None:
+            self._duration["seconds"] = self._fallback_seconds
+        return self.doc
+
+
+def parse_insights(fp: BinaryIO) -> Dict[str, Any]:
+    """Slim /Index document from a binary file-like object (e.g. a streamed response body)."""
+    if ijson is None:
+        return slim_insights(json.load(fp))
+    builder = SlimInsightsBuilder()
+    builder.feed(ijson.parse(fp, use_float=True))
+    return builder.result()
+
+
+async def aparse_insights(chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """parse_insights() for an async byte stream (httpx aiter_bytes())."""
+    if ijson is None:
+        body = b"".join([chunk async for chunk in chunks])
+        return slim_insights(json.loads(body))
+    builder = SlimInsightsBuilder()
+    await builder.afeed(ijson.parse_async(_AsyncChunkReader(chunks), use_float=True))
+    return builder.result()
+
+
+class _AsyncChunkReader:
+    """Async file-like read() over an async iterator of byte chunks, as ijson expects."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._buffer = b""
+        self._exhausted = False
+
+    async def read(self, size: int = -1) -> bytes:
+        while not self._exhausted and (size < 0 or len(self._buffer) < size):
+            try:
+                self._buffer += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._exhausted = True
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
@@ -0,0 +1,173 @@
+"""
+Local record of videos already indexed by Azure Video Indexer.
+
+Indexing is by far the slowest and most expensive step of an audit. This
+store remembers, for every upload:
+
+    source video ID (YouTube ID) + content hash (SHA-256 of the file)
+        -> Azure VI video ID
+
+and optionally keeps a copy of the raw insights JSON on disk. Before
+uploading, VideoIndexerService asks the store whether the same video was
+indexed already; on a hit it serves the local insights or fetches /Index
+for the existing Azure video instead of uploading a new copy. This lets us
+re-audit videos against an updated rulebook without paying for indexing again.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("insights-store")
+
+
+@dataclass
+class IndexedVideo:
+    """One upload to Video Indexer."""
+    source_video_id: Optional[str]
+    content_hash: Optional[str]
+    azure_video_id: str
+    created_at: float
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks so large videos don't load into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class InsightsStore:
+    """SQLite-backed mapping plus a directory of raw insights JSON files."""
+
+    def __init__(self, db_path: str, insights_dir: Optional[str] = None):
+        self.db_path = db_path
+        self.insights_dir = insights_dir
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        if insights_dir:
+            os.makedirs(insights_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS indexed_videos (
+                azure_video_id TEXT PRIMARY KEY,
+                source_video_id TEXT,
+                content_hash TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_indexed_source ON indexed_videos (source_video_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_indexed_hash ON indexed_videos (content_hash)")
+        self._conn.commit()
+
+    def lookup(self, source_video_id: Optional[str] = None, content_hash: Optional[str] = None) -> Optional[IndexedVideo]:
+        """
+        Finds the most recent upload matching the content hash (if given),
+        otherwise the source video ID. Returns None on a miss.
+        """
+        if content_hash:
+            column, value = "content_hash", content_hash
+        elif source_video_id:
+            column, value = "source_video_id", source_video_id
+        else:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT azure_video_id, source_video_id, content_hash, created_at FROM indexed_videos "
+                f"WHERE {column} = ? ORDER BY created_at DESC LIMIT 1",
+                (value,),
+            ).fetchone()
+        if row is None:
+            return None
+        return IndexedVideo(
+            azure_video_id=row[0], source_video_id=row[1], content_hash=row[2], created_at=row[3]
+        )
+
+    def record(self, azure_video_id: str, source_video_id: Optional[str], content_hash: Optional[str]) -> None:
+        """Remembers a new upload."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indexed_videos (azure_video_id, source_video_id, content_hash, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (azure_video_id, source_video_id, content_hash, time.time()),
+            )
+            self._conn.commit()
+
+    def forget(self, azure_video_id: str) -> None:
+        """Drops a mapping (e.g. the video was deleted from Video Indexer)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM indexed_videos WHERE azure_video_id = ?", (azure_video_id,))
+            self._conn.commit()
+        path = self._insights_path(azure_video_id)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def save_insights(self, azure_video_id: str, insights: Dict[str, Any]) -> None:
+        """Persists the raw /Index JSON for a processed video."""
+        path = self._insights_path(azure_video_id)
+        if not path:
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(insights, f)
+        os.replace(tmp_path, path)  # atomic, so readers never see half a file
+
+    def load_insights(self, azure_video_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the persisted /Index JSON, or None if there is no local copy."""
+        path = self._insights_path(azure_video_id)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable insights file {path}: {e}")
+            return None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _insights_path(self, azure_video_id: str) -> Optional[str]:
+        if not self.insights_dir:
+            return None
+        safe_id = "".join(c for c in azure_video_id if c.isalnum() or c in "-_")
+        return os.path.join(self.insights_dir, f"{safe_id}.json")
+
+
+_default_store: Optional[InsightsStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_insights_store() -> Optional[InsightsStore]:
+    """
+    Process-wide store configured through environment variables.
+
+    VI_INSIGHTS_STORE  on (default) | off
+    VI_INSIGHTS_DB     SQLite file (default .cache/vi_insights.sqlite3)
+    VI_INSIGHTS_DIR    raw insights JSON directory (default .cache/vi_insights,
+                       empty string = don't keep local copies)
+    """
+    global _default_store
+    if os.getenv("VI_INSIGHTS_STORE", "on").lower() == "off":
+        return None
+
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = InsightsStore(
+                db_path=os.getenv("VI_INSIGHTS_DB", ".cache/vi_insights.sqlite3"),
+                insights_dir=os.getenv("VI_INSIGHTS_DIR", ".cache/vi_insights") or None,
+            )
+        return _default_store
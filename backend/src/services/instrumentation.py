@@ -0,0 +1,289 @@
+"""
+Per-node and per-step timings, spans and Prometheus metrics for audits.
+
+setup_telemetry() only turns on Azure Monitor, and only with a connection
+string, so locally there was no way to see where an audit's minutes went.
+Each graph node and each step inside one now runs under measure(), which:
+
+- opens an OpenTelemetry span, exported by whichever tracer provider
+  api/telemetry.py set up (Azure Monitor, a local JSON-lines file via
+  OTEL_SPANS_FILE, or none),
+- observes the audit_step_seconds histogram and the unit counters that
+  GET /metrics serves in the Prometheus text format (no Azure needed),
+- adds the duration and counts to the running audit's AuditTimings, which
+  the API returns as the response's `timings` breakdown.
+
+Steps:
+
+    node:<name>      each graph node (uploader, indexer, precheck, ...)
+    ytdlp_extract    yt-dlp metadata extraction
+    download         temp-file download (bytes)
+    upload           media upload to VI (bytes; "stream" mode downloads as it uploads)
+    vi_token         ARM / VI account token fetch (cache misses only)
+    vi_wait          waiting for VI to finish indexing
+    vi_poll          one /Index status request
+    vi_index_parse   receiving and parsing an /Index document
+    embedding        rulebook query embeddings (texts)
+    search           rulebook vector search
+    llm              one audit LLM call (prompt_tokens, completion_tokens)
+    llm_parse        validating the LLM's JSON verdict (repaired: fixed locally)
+    llm_repair       re-asking the LLM for a verdict that could not be parsed
+
+Steps nest (vi_poll inside vi_wait inside node:indexer), and concurrent
+calls (LLM windows) add up, so steps can sum to more than the wall time.
+
+Usage:
+    with measure("upload", mode="file") as step:
+        ...
+        step.add(bytes=size)
+"""
+import math
+import time
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from opentelemetry import trace
+
+tracer = trace.get_tracer("brand-guardian")
+
+# Seconds; audits range from millisecond scans to half-hour indexing waits
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {_format_value(count)}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(round(series[-2], 6))}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {_format_value(series[-1])}")
+        return lines
+
+
+class Gauge:
+    """Gauge read at scrape time from a callback returning {label values: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], collect: Callable[[], Dict[LabelValues, float]]):
+        self.name, self.help, self.labels, self.collect = name, help, tuple(labels), collect
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                for key, value in sorted(self.collect().items())]
+
+
+class MetricsRegistry:
+    """The process's metrics, rendered in the Prometheus text exposition format (0.0.4)."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str],
+              collect: Callable[[], Dict[LabelValues, float]]) -> Gauge:
+        return self._register(Gauge(name, help, labels, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        # Re-registering a name (module reloads) replaces the old metric
+        self._metrics[metric.name] = metric
+        return metric
+
+
+metrics = MetricsRegistry()
+
+step_seconds = metrics.histogram("audit_step_seconds", "Duration of audit nodes and steps.", ("step",))
+step_errors = metrics.counter("audit_step_errors_total", "Audit nodes and steps that raised.", ("step",))
+step_units = metrics.counter("audit_step_units_total",
+                             "Units processed by audit steps (bytes, tokens, texts...).", ("step", "unit"))
+audit_results = metrics.counter("audit_results_total", "Finished audits by status.", ("status",))
+
+
+class AuditTimings:
+    """Summed durations and counts per step for one audit."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.steps: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, step: str, seconds: float, counts: Optional[Dict[str, float]] = None) -> None:
+        with self._lock:
+            entry = self.steps.setdefault(step, {"count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            for unit, value in (counts or {}).items():
+                entry[unit] = entry.get(unit, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """{"total_seconds", "nodes": {node: seconds}, "steps": {step: {"count", "seconds", units...}}}."""
+        with self._lock:
+            steps = {name: dict(entry) for name, entry in self.steps.items()}
+        nodes = {name[len("node:"):]: round(entry["seconds"], 3)
+                 for name, entry in steps.items() if name.startswith("node:")}
+        breakdown = {}
+        for name, entry in steps.items():
+            if name.startswith("node:"):
+                continue
+            if entry.get("bytes") and entry["seconds"] > 0:
+                entry["bytes_per_second"] = entry["bytes"] / entry["seconds"]
+            breakdown[name] = {unit: round(value, 3) for unit, value in entry.items()}
+        return {
+            "total_seconds": round(time.perf_counter() - self.started_at, 3),
+            "nodes": nodes,
+            "steps": breakdown,
+        }
+
+
+_current_timings: contextvars.ContextVar[Optional[AuditTimings]] = contextvars.ContextVar(
+    "audit_timings", default=None
+)
+
+
+@contextmanager
+def audit_timings() -> Iterator[AuditTimings]:
+    """Collects the timings of every step measured in this context (graph nodes inherit it)."""
+    timings = AuditTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+class Step:
+    """The step being measured: its span, plus unit counts reported with add()."""
+
+    def __init__(self, span: Any):
+        self.span = span
+        self.counts: Dict[str, float] = {}
+
+    def add(self, **counts: Optional[float]) -> None:
+        for unit, value in counts.items():
+            if value is None:
+                continue
+            self.counts[unit] = self.counts.get(unit, 0) + value
+            self.span.set_attribute(unit, self.counts[unit])
+
+    def set(self, **attributes: Any) -> None:
+        for key, value in attributes.items():
+            if value is not None:
+                self.span.set_attribute(key, value)
+
+
+@contextmanager
+def measure(step: str, **attributes: Any) -> Iterator[Step]:
+    """Times the block as `step`: span, metrics and the current audit's timings."""
+    timings = _current_timings.get()
+    attributes = {key: value for key, value in attributes.items() if value is not None}
+    with tracer.start_as_current_span(f"audit.{step}", attributes=attributes) as span:
+        measured = Step(span)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield measured
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            step_seconds.observe(seconds, step=step)
+            if failed:
+                step_errors.inc(step=step)
+            for unit, value in measured.counts.items():
+                step_units.inc(value, step=step, unit=unit)
+            if timings is not None:
+                timings.add(step, seconds, measured.counts)
+
+
+def instrument_node(name: str):
+    """Decorator: measures an async graph node as "node:<name>"."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(state):
+            with measure(f"node:{name}"):
+                return await fn(state)
+        return wrapper
+    return decorate
@@ -0,0 +1,223 @@
+"""
+Background job queue for compliance audits.
+
+An audit (download -> Video Indexer -> LLM) takes minutes, so the API no
+longer runs it inside the HTTP request. POST /audit enqueues an AuditJob and
+returns its id immediately; a bounded pool of workers drains the queue and
+clients poll GET /audit/{job_id} for the result, or follow the job's
+progress events (see services/progress.py).
+
+The queue is pluggable: anything implementing JobQueue can back the API.
+InMemoryJobQueue runs inside the current event loop and is what the server
+and local tests use.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.src.services.progress import ProgressLog
+
+logger = logging.getLogger("job-queue")
+
+# Job lifecycle states
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class AuditJob:
+    """A single audit request and its outcome."""
+    job_id: str
+    payload: Dict[str, Any]
+    status: str = QUEUED
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Status changes, progress reported by the workflow, and the final result/error
+    events: ProgressLog = field(default_factory=ProgressLog, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def start(self) -> None:
+        self.status = RUNNING
+        self.started_at = time.time()
+        self.events.append("status", {"status": RUNNING})
+
+    def finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """Marks the job COMPLETED with `result`, or FAILED if `error` is given."""
+        self.finished_at = time.time()
+        if error is not None:
+            self.status = FAILED
+            self.error = error
+            self.events.close("failed", {"status": FAILED, "error": error})
+        else:
+            self.status = COMPLETED
+            self.result = result
+            self.events.close("result", {"status": COMPLETED, "result": result})
+
+
+# A handler receives the job and returns the result dict stored on it.
+JobHandler = Callable[[AuditJob], Awaitable[Dict[str, Any]]]
+
+
+class JobQueue(ABC):
+    """Interface every queue backend must implement."""
+
+    @abstractmethod
+    async def start(self) -> None:
+        """Start the workers. Called once from the application's startup hook."""
+
+    @abstractmethod
+    async def shutdown(self) -> None:
+        """Stop the workers. Jobs still queued are marked FAILED."""
+
+    @abstractmethod
+    async def submit(self, payload: Dict[str, Any], job_id: Optional[str] = None) -> AuditJob:
+        """Enqueue a job. Raises QueueFullError when there is no capacity left."""
+
+    @abstractmethod
+    def complete(self, payload: Dict[str, Any], result: Dict[str, Any], job_id: Optional[str] = None) -> AuditJob:
+        """Records a job that is already finished (e.g. served from cache) without queueing it."""
+
+    @abstractmethod
+    def track(self, job: AuditJob) -> None:
+        """Makes a job run elsewhere (e.g. by a batch) visible to get()."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[AuditJob]:
+        """Return the job with this id, or None if it is unknown or expired."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Return queue depth and worker occupancy."""
+
+
+class InMemoryJobQueue(JobQueue):
+    """
+    asyncio-based queue with a fixed number of worker tasks.
+
+    - `max_workers` caps how many audits run at the same time.
+    - `max_queue_size` caps how many audits may wait; beyond that submit()
+      raises QueueFullError so the API can answer 429 (backpressure).
+    - `max_retained_jobs` caps how many finished jobs are kept for polling.
+    """
+
+    def __init__(
+        self,
+        handler: JobHandler,
+        max_workers: int = 2,
+        max_queue_size: int = 20,
+        max_retained_jobs: int = 500,
+    ):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.handler = handler
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_retained_jobs = max_retained_jobs
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, AuditJob]" = OrderedDict()
+        self._running = 0
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"audit-worker-{i}")
+            for i in range(self.max_workers)
+        ]
+        logger.info(f"Job queue started ({self.max_workers} workers, queue size {self.max_queue_size})")
+
+    async def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        # Anything still waiting will never run in this process
+        if self._queue is not None:
+            while not self._queue.empty():
+                job = self._queue.get_nowait()
+                job.finish(error="Server shut down before the job started.")
+        logger.info("Job queue stopped")
+
+    async def submit(self, payload: Dict[str, Any], job_id: Optional[str] = None) -> AuditJob:
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started.")
+
+        job = AuditJob(job_id=job_id or str(uuid.uuid4()), payload=payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(
+                f"Audit queue is full ({self.max_queue_size} jobs waiting). Try again later."
+            )
+        job.events.append("status", {"status": QUEUED})
+        self._remember(job)
+        return job
+
+    def complete(self, payload: Dict[str, Any], result: Dict[str, Any], job_id: Optional[str] = None) -> AuditJob:
+        job = AuditJob(job_id=job_id or str(uuid.uuid4()), payload=payload)
+        job.started_at = job.created_at
+        job.finish(result=result)
+        self._remember(job)
+        return job
+
+    def track(self, job: AuditJob) -> None:
+        self._remember(job)
+
+    def get(self, job_id: str) -> Optional[AuditJob]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+        }
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+            job.start()
+            try:
+                result = await self.handler(job)
+                job.finish(result=result)
+            except asyncio.CancelledError:
+                job.finish(error="Job was cancelled.")
+                raise
+            except Exception as e:
+                logger.error(f"[worker-{index}] Job {job.job_id} failed: {e}")
+                job.finish(error=str(e))
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    def _remember(self, job: AuditJob) -> None:
+        self._jobs[job.job_id] = job
+        # Drop the oldest finished jobs; never forget a job that is still pending
+        if len(self._jobs) > self.max_retained_jobs:
+            for old_id in [jid for jid, j in self._jobs.items() if j.done]:
+                if len(self._jobs) <= self.max_retained_jobs:
+                    break
+                del self._jobs[old_id]
@@ -0,0 +1,50 @@
+"""
+Cache of yt-dlp metadata per video.
+
+The frontend calls /check-duration before every audit, and the audit then
+resolves the media URL (or downloads) for the same video: two yt-dlp
+extractions of several seconds each. The extracted info dict (duration,
+title, formats, selected direct media URL) is cached here by canonical
+YouTube video ID, so the audit reuses what /check-duration fetched.
+
+Direct media URLs are signed and expire after a few hours, so the TTL is
+kept well below that (MEDIA_INFO_TTL_SECONDS, default 30 minutes).
+"""
+import os
+from typing import Optional
+
+from backend.src.services.result_cache import InMemoryResultCache
+from backend.src.services.youtube import parse_video_id
+
+
+def media_info_key(url: str) -> str:
+    """Canonical video ID for YouTube URLs, the URL itself otherwise."""
+    return parse_video_id(url) or url
+
+
+class MediaInfoCache(InMemoryResultCache):
+    """LRU + TTL cache of yt-dlp info dicts."""
+
+    def invalidate(self, key: str) -> None:
+        """Drops an entry, e.g. when its media URL turned out to be stale."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_media_info_cache: Optional[MediaInfoCache] = None
+
+
+def get_media_info_cache() -> MediaInfoCache:
+    """
+    Process-wide cache configured through environment variables.
+
+    MEDIA_INFO_TTL_SECONDS   seconds an info dict is reused (default 1800)
+    MEDIA_INFO_MAX_ENTRIES   videos kept (default 256)
+    """
+    global _media_info_cache
+    if _media_info_cache is None:
+        _media_info_cache = MediaInfoCache(
+            ttl_seconds=float(os.getenv("MEDIA_INFO_TTL_SECONDS", "1800")),
+            max_entries=int(os.getenv("MEDIA_INFO_MAX_ENTRIES", "256")),
+        )
+    return _media_info_cache
@@ -0,0 +1,95 @@
+"""
+Streaming multipart bodies for Video Indexer uploads.
+
+Instead of downloading a video to disk and reading the whole file back into
+a multipart request, the upload body is generated on the fly from the
+source media stream: multipart header, the media bytes chunk by chunk,
+multipart trailer. Memory stays at one chunk regardless of video length.
+
+When the media size is known up front the body advertises a Content-Length
+(some servers reject chunked uploads); otherwise requests falls back to
+chunked transfer encoding.
+
+The same body works with httpx's AsyncClient when the chunks come from an
+async iterator (`async for` over the stream instead of `for`).
+"""
+import uuid
+import hashlib
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Optional, Union
+
+
+class MultipartStream:
+    """
+    Iterable multipart/form-data body with a single file field.
+
+    Pass an instance as `data=` to requests. Bytes sent and a SHA-256 of the
+    media are tracked while streaming, so callers get the content hash for
+    free once the upload finishes. `on_progress`, if given, is called with
+    the running byte count after every chunk.
+    """
+
+    def __init__(self, chunks: Union[Iterable[bytes], AsyncIterable[bytes]], filename: str, field_name: str = "file",
+                 content_type: str = "video/mp4", on_progress: Optional[Callable[[int], None]] = None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self._chunks = chunks
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._hasher = hashlib.sha256()
+        self._on_progress = on_progress
+        self.bytes_sent = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        for chunk in self._chunks:
+            if chunk:
+                yield self._track(chunk)
+        yield self._tail
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._head
+        async for chunk in self._chunks:
+            if chunk:
+                yield self._track(chunk)
+        yield self._tail
+
+    def _track(self, chunk: bytes) -> bytes:
+        self._hasher.update(chunk)
+        self.bytes_sent += len(chunk)
+        if self._on_progress is not None:
+            self._on_progress(self.bytes_sent)
+        return chunk
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the media bytes streamed so far (complete after iteration)."""
+        return self._hasher.hexdigest()
+
+    def overhead(self) -> int:
+        """Bytes added around the media by the multipart framing."""
+        return len(self._head) + len(self._tail)
+
+
+class SizedMultipartStream(MultipartStream):
+    """MultipartStream whose total length is known, so requests sends Content-Length."""
+
+    def __init__(self, chunks: Union[Iterable[bytes], AsyncIterable[bytes]], filename: str, media_size: int,
+                 **kwargs):
+        super().__init__(chunks, filename, **kwargs)
+        self.media_size = media_size
+
+    def __len__(self) -> int:
+        return self.overhead() + self.media_size
+
+
+def build_multipart_stream(chunks: Union[Iterable[bytes], AsyncIterable[bytes]], filename: str,
+                           media_size: Optional[int] = None,
+                           on_progress: Optional[Callable[[int], None]] = None) -> MultipartStream:
+    """Returns a sized stream when the media size is known, else a chunked one."""
+    if media_size:
+        return SizedMultipartStream(chunks, filename, media_size=media_size, on_progress=on_progress)
+    return MultipartStream(chunks, filename, on_progress=on_progress)
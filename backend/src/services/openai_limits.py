@@ -0,0 +1,283 @@
+"""
+Client-side rate limiting for Azure OpenAI.
+
+Every Azure OpenAI deployment has a requests-per-minute (RPM) and a
+tokens-per-minute (TPM) quota. Under load, concurrent audits used to send
+LLM and embedding calls unthrottled. They got 429s, which surfaced as
+generic audit FAILs. The limiter keeps the process just under quota instead:
+
+- Each deployment has two token buckets, one for requests and one for
+  tokens. Each holds a minute of quota scaled by OPENAI_QUOTA_HEADROOM
+  (default 0.9) and refills continuously. A call waits until both buckets
+  cover it.
+- The token cost is estimated before sending: tiktoken when its encoding is
+  available, about 4 characters per token otherwise. The completion budget
+  is added too, because Azure counts it against TPM when admitting a
+  request. The usage the response reports corrects the bucket afterwards.
+- Waiters are served first come, first served. A large prompt isn't starved
+  by a stream of small ones, and no audit jumps the queue.
+- 429 and 5xx responses are retried with backoff. A 429's Retry-After
+  pauses the whole deployment, because every caller shares its quota.
+
+Time comes from an injectable clock (now() / sleep()), so the limiter can be
+driven by a fake clock and a stub LLM.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import functools
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, TypeVar
+
+logger = logging.getLogger("openai-limits")
+
+T = TypeVar("T")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Chat completion tokens reserved per call until the response reports real usage
+DEFAULT_COMPLETION_TOKENS = 1000
+
+
+class Clock:
+    """Real time. A fake clock only needs the same two methods."""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+class _Bucket:
+    """One minute of quota, refilled continuously."""
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # A call bigger than the whole bucket waits for a full bucket, not forever
+        deficit = min(amount, self.capacity) - self.level
+        return deficit / self.rate if deficit > 0 else 0.0
+
+
+class OpenAIRateLimiter:
+    """
+    RPM/TPM limiter for one deployment; rpm or tpm <= 0 means no limit on
+    that dimension (retries still apply).
+
+        result = await limiter.call(lambda: llm.ainvoke(messages), tokens=estimate)
+    """
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0, headroom: float = 0.9,
+                 max_retries: int = 5, backoff: float = 1.0, max_backoff: float = 60.0,
+                 clock: Optional[Clock] = None):
+        self.name = name
+        self.clock = clock or Clock()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        now = self.clock.now()
+        self._requests = _Bucket(rpm * headroom, now) if rpm > 0 else None
+        self._tokens = _Bucket(tpm * headroom, now) if tpm > 0 else None
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.waiting = 0
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+
+    async def call(self, fn: Callable[[], Awaitable[T]], tokens: int,
+                   usage: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """
+        Waits for quota, runs fn(), and retries it on 429/5xx. `usage`
+        reads the tokens actually used from the result, if reported.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            try:
+                result = await fn()
+            except Exception as e:
+                status = _status_code(e)
+                if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.backoff * (2 ** attempt), self.max_backoff) * random.uniform(0.5, 1.0)
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"{self.name}: HTTP {status}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                if status == 429:
+                    # The quota is shared: hold back every caller, not just this one
+                    self.rate_limited += 1
+                    self.pause(delay)
+                else:
+                    await self.clock.sleep(delay)
+                continue
+
+            self.calls += 1
+            actual = usage(result) if usage is not None else None
+            if actual is not None:
+                self.reconcile(tokens, actual)
+            return result
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Waits, in arrival order, until the deployment has room for one request of `tokens`."""
+        self.waiting += 1
+        try:
+            async with self._get_lock():
+                while True:
+                    now = self.clock.now()
+                    wait = self._paused_until - now
+                    if wait <= 0:
+                        wait = 0.0
+                        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                            if bucket is not None:
+                                bucket.refill(now)
+                                wait = max(wait, bucket.wait_time(amount))
+                        if wait <= 0:
+                            if self._requests is not None:
+                                self._requests.level -= 1
+                            if self._tokens is not None:
+                                self._tokens.level -= tokens
+                            return
+                    self.throttled_seconds += wait
+                    await self.clock.sleep(wait)
+        finally:
+            self.waiting -= 1
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """Corrects the token bucket once the real usage is known (may go into debt)."""
+        if self._tokens is not None:
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + estimated - actual)
+
+    def pause(self, seconds: float) -> None:
+        """Admits no new calls for `seconds` (a 429's Retry-After)."""
+        self._paused_until = max(self._paused_until, self.clock.now() + seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm_limit": round(self._requests.capacity) if self._requests else None,
+            "tpm_limit": round(self._tokens.capacity) if self._tokens else None,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "throttled_seconds": round(self.throttled_seconds, 1),
+        }
+
+    def _get_lock(self) -> asyncio.Lock:
+        # asyncio.Lock is FIFO; a new one per event loop (scripts may call asyncio.run twice)
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return min(float(headers["retry-after-ms"]) / 1000.0, 60.0)
+        if headers.get("retry-after") is not None:
+            return min(float(headers["retry-after"]), 60.0)
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+# --- Token estimates ---
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    name = os.getenv("OPENAI_TOKENIZER", "o200k_base")
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:  # not installed, or the encoding file can't be fetched offline
+        logger.warning(f"tiktoken encoding '{name}' unavailable, estimating 4 characters per token: {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_message_tokens(messages: Sequence[Any]) -> int:
+    """Prompt tokens of a chat request, including per-message overhead."""
+    total = 3  # reply priming
+    for message in messages:
+        content = getattr(message, "content", message)
+        total += 4 + estimate_tokens(content if isinstance(content, str) else str(content))
+    return total
+
+
+def usage_tokens(message: Any) -> Optional[int]:
+    """Total tokens a LangChain AIMessage reports, if any."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+# --- Process-wide limiters ---
+
+_limiters: Dict[str, OpenAIRateLimiter] = {}
+
+
+def _limiter(name: str, prefix: str) -> OpenAIRateLimiter:
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = _limiters[name] = OpenAIRateLimiter(
+            name,
+            rpm=float(os.getenv(f"{prefix}_RPM", "0")),
+            tpm=float(os.getenv(f"{prefix}_TPM", "0")),
+            headroom=float(os.getenv("OPENAI_QUOTA_HEADROOM", "0.9")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "5")),
+        )
+    return limiter
+
+
+def get_chat_limiter() -> OpenAIRateLimiter:
+    """Limiter for the chat deployment (AZURE_OPENAI_CHAT_RPM / _TPM)."""
+    return _limiter("chat", "AZURE_OPENAI_CHAT")
+
+
+def get_cheap_chat_limiter() -> OpenAIRateLimiter:
+    """Limiter for the precheck's cheaper chat deployment (AZURE_OPENAI_CHEAP_CHAT_RPM / _TPM)."""
+    return _limiter("chat_cheap", "AZURE_OPENAI_CHEAP_CHAT")
+
+
+def get_embeddings_limiter() -> OpenAIRateLimiter:
+    """Limiter for the embedding deployment (AZURE_OPENAI_EMBEDDING_RPM / _TPM)."""
+    return _limiter("embeddings", "AZURE_OPENAI_EMBEDDING")
+
+
+def completion_token_budget() -> int:
+    return int(os.getenv("AZURE_OPENAI_CHAT_COMPLETION_TOKENS", str(DEFAULT_COMPLETION_TOKENS)))
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
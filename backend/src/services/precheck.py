@@ -0,0 +1,277 @@
+"""
+Local rule-hit precheck before the LLM audit.
+
+Every video used to pay for a full GPT audit, even one with nothing in it
+that any rule is about (a cooking tutorial, a vlog without a sponsor).
+The precheck node runs between the indexer and the auditor and decides
+whether the LLM is needed, in two stages:
+
+1. Keyword stage (sub-millisecond): the transcript and on-screen text are
+   scanned for trigger terms - disclosure and claim phrases ("#ad",
+   "sponsored", "use code", "guaranteed", "clinically proven"...), plus the
+   hashtags and short quoted phrases found in the rulebook chunks. All
+   terms are compiled into one regex whose alternation is factored as a
+   trie, so the scan is a single pass that shares common prefixes, the way
+   an Aho-Corasick automaton does. Each term maps to the rule chunks that
+   mention it; those rules are passed to the auditor along with the
+   retrieved ones.
+2. Vector stage: the rulebook search the auditor needs anyway (one batched
+   embedding call, services/retrieval.py) runs here. Its per-window scores
+   show how close the video comes to any rule. Only the local index gives
+   cosine similarities; with Azure AI Search this stage is unavailable and
+   the video is always audited.
+
+A video with no trigger terms and a best rule similarity well under
+PRECHECK_RULE_SCORE is "clean" (`confidence` >= PRECHECK_MIN_CONFIDENCE).
+What happens then depends on PRECHECK_MODE:
+
+    shadow   every video is audited; the decision is only recorded (default)
+    pass     clean videos PASS without an LLM call
+    cheap    clean videos are audited by AZURE_OPENAI_CHEAP_CHAT_DEPLOYMENT
+    off      no precheck; the auditor retrieves rules itself
+
+precheck_stats counts decisions and the LLM calls avoided (or, in shadow
+mode, that would have been avoided) for /stats.
+"""
+import os
+import re
+import time
+import logging
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.src.services.rulebook_index import RuleChunk, RulebookRetriever, LocalVectorIndex
+from backend.src.services.stage_limits import LatencyWindow
+
+logger = logging.getLogger("precheck")
+
+PRECHECK_MODES = ("off", "shadow", "pass", "cheap")
+
+# Disclosure, endorsement and claim language the rulebook (FTC endorsement
+# guides, YouTube ad policies) is about. Matched case-insensitively on word
+# boundaries.
+DEFAULT_TRIGGER_TERMS = (
+    "#ad", "#ads", "#sponsored", "#partner", "#paidpartnership", "#collab", "#gifted", "#affiliate",
+    "ad", "advert", "advertisement", "sponsor", "sponsored", "sponsorship", "paid partnership",
+    "paid promotion", "partnered with", "in partnership with", "brand ambassador", "ambassador",
+    "affiliate", "affiliate link", "commission", "gifted", "free product", "sent me", "kindly sent",
+    "thanks to", "brought to you by", "use code", "use my code", "discount code", "promo code",
+    "coupon", "discount", "link in bio", "link below", "link in the description", "swipe up",
+    "guarantee", "guaranteed", "100%", "clinically proven", "scientifically proven",
+    "doctor recommended", "dermatologist recommended", "cure", "cures", "miracle", "risk free",
+    "money back", "lose weight", "weight loss", "results in", "before and after", "limited time",
+    "act now", "best in the world", "number one", "#1", "free trial", "review", "honest review",
+)
+
+# Rulebook phrases worth matching: hashtags, and quoted examples of 1-4 words
+_RULEBOOK_HASHTAG = re.compile(r"(?<![\w#])#\w{2,30}")
+_RULEBOOK_QUOTED = re.compile(r"[\"“]([^\"”\n]{2,40})[\"”]")
+
+
+def precheck_mode() -> str:
+    mode = os.getenv("PRECHECK_MODE", "shadow").lower()
+    return mode if mode in PRECHECK_MODES else "shadow"
+
+
+def rule_score_threshold() -> float:
+    """Cosine similarity to a rule chunk at which a video counts as touching that rule."""
+    return float(os.getenv("PRECHECK_RULE_SCORE", "0.4"))
+
+
+def min_confidence() -> float:
+    return float(os.getenv("PRECHECK_MIN_CONFIDENCE", "0.6"))
+
+
+def cheap_deployment() -> Optional[str]:
+    return os.getenv("AZURE_OPENAI_CHEAP_CHAT_DEPLOYMENT") or None
+
+
+def precheck_fingerprint() -> str:
+    """The settings that can change a verdict; part of the audit result cache key."""
+    mode = precheck_mode()
+    if mode in ("off", "shadow"):
+        return mode
+    parts = [mode, str(rule_score_threshold()), str(min_confidence()), os.getenv("PRECHECK_EXTRA_TERMS", "")]
+    if mode == "cheap":
+        parts.append(cheap_deployment() or "")
+    return ":".join(parts)
+
+
+def _trie_pattern(terms: Iterable[str]) -> re.Pattern:
+    """One regex matching any of `terms`, its alternation factored as a trie."""
+    trie: Dict[str, Any] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return re.compile(rf"(?<![\w#])(?:{build(trie)})(?!\w)")
+
+
+class KeywordIndex:
+    """Trigger terms compiled into one pattern, each mapped to the rule chunks that mention it."""
+
+    def __init__(self, terms: Iterable[str], chunks: Sequence[Dict[str, Any]] = ()):
+        self.terms = sorted({term.strip().lower() for term in terms if term and term.strip()})
+        self.pattern = _trie_pattern(self.terms)
+        self.chunks = list(chunks)
+        chunk_texts = [(chunk.get("text") or "").lower() for chunk in self.chunks]
+        self.rules_for_term: Dict[str, List[int]] = {}
+        for term in self.terms:
+            term_pattern = re.compile(rf"(?<![\w#]){re.escape(term)}(?!\w)")
+            self.rules_for_term[term] = [i for i, text in enumerate(chunk_texts) if term_pattern.search(text)]
+
+    @classmethod
+    def from_rulebook(cls, chunks: Sequence[Dict[str, Any]] = ()) -> "KeywordIndex":
+        """Default triggers + PRECHECK_EXTRA_TERMS + hashtags / quoted phrases in the rulebook."""
+        terms = list(DEFAULT_TRIGGER_TERMS)
+        terms += [term for term in os.getenv("PRECHECK_EXTRA_TERMS", "").split(",") if term.strip()]
+        for chunk in chunks:
+            text = chunk.get("text") or ""
+            terms += _RULEBOOK_HASHTAG.findall(text)
+            terms += [quote for quote in _RULEBOOK_QUOTED.findall(text) if len(quote.split()) <= 4]
+        return cls(terms, chunks)
+
+    def scan(self, texts: Iterable[str]) -> Dict[str, int]:
+        """Hits per trigger term across `texts`."""
+        hits: Dict[str, int] = {}
+        # One pass over all lines; newlines keep terms from matching across them
+        for term in self.pattern.findall("\n".join(texts).lower()):
+            hits[term] = hits.get(term, 0) + 1
+        return hits
+
+    def rule_chunks(self, hits: Dict[str, int], limit: int = 3) -> List[RuleChunk]:
+        """The rule chunks mentioning the most-hit terms, up to `limit`."""
+        votes: Dict[int, int] = {}
+        for term, count in hits.items():
+            for i in self.rules_for_term.get(term, ()):
+                votes[i] = votes.get(i, 0) + count
+        ranked = sorted(votes, key=lambda i: (-votes[i], i))[:limit]
+        return [
+            RuleChunk(text=self.chunks[i]["text"], source=self.chunks[i].get("source"),
+                      metadata=self.chunks[i].get("metadata", {}))
+            for i in ranked
+        ]
+
+
+_keyword_index: Dict[str, KeywordIndex] = {}
+
+
+def get_keyword_index(rulebook: RulebookRetriever) -> KeywordIndex:
+    """The keyword index for the rulebook, rebuilt when its fingerprint changes."""
+    key = f"{rulebook.fingerprint()}\x1f{os.getenv('PRECHECK_EXTRA_TERMS', '')}"
+    index = _keyword_index.get(key)
+    if index is None:
+        chunks = rulebook.chunks if isinstance(rulebook, LocalVectorIndex) else ()
+        index = KeywordIndex.from_rulebook(chunks)
+        _keyword_index.clear()
+        _keyword_index[key] = index
+        logger.info(f"Precheck keyword index: {len(index.terms)} terms over {len(index.chunks)} rule chunks")
+    return index
+
+
+@dataclass
+class PrecheckResult:
+    """What the precheck found and decided for one video."""
+    decision: str                            # "audit" | "pass" | "cheap"
+    clean: bool                              # no trigger terms, far from every rule
+    confidence: float                        # 0..1 that the video needs no audit
+    matched_terms: Dict[str, int] = field(default_factory=dict)
+    max_rule_score: Optional[float] = None   # best cosine similarity to a rule chunk
+    keyword_ms: float = 0.0
+    reason: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def evaluate(hits: Dict[str, int], max_rule_score: Optional[float], mode: str,
+             keyword_ms: float = 0.0) -> PrecheckResult:
+    """
+    Combines both stages. Keyword hits always mean an audit. Otherwise the
+    confidence rises from 0.5 (no hits) towards 1.0 the further the closest
+    rule is below PRECHECK_RULE_SCORE; without vector scores it stays 0.5.
+    """
+    threshold = rule_score_threshold()
+    if hits:
+        confidence = 0.0
+        reason = f"{sum(hits.values())} trigger term hit(s): {', '.join(sorted(hits)[:5])}"
+    elif max_rule_score is None:
+        confidence = 0.5
+        reason = "no trigger terms; no vector scores (local rulebook index required)"
+    else:
+        confidence = 0.5 + 0.5 * min(max(1.0 - max_rule_score / threshold, 0.0), 1.0)
+        reason = f"no trigger terms; closest rule scores {max_rule_score:.2f} (threshold {threshold:.2f})"
+
+    clean = not hits and max_rule_score is not None and confidence >= min_confidence()
+    decision = "audit"
+    if clean and mode == "pass":
+        decision = "pass"
+    elif clean and mode == "cheap":
+        decision = "cheap" if cheap_deployment() else "audit"
+
+    return PrecheckResult(decision=decision, clean=clean, confidence=round(confidence, 3),
+                          matched_terms=hits, max_rule_score=max_rule_score,
+                          keyword_ms=round(keyword_ms, 3), reason=reason)
+
+
+def scan_keywords(index: KeywordIndex, texts: Iterable[str]) -> Tuple[Dict[str, int], float]:
+    """(hits, milliseconds) of the keyword stage."""
+    start = time.perf_counter()
+    hits = index.scan(texts)
+    return hits, (time.perf_counter() - start) * 1000
+
+
+def max_rule_score(rulebook: RulebookRetriever, per_window: Sequence[Sequence[RuleChunk]]) -> Optional[float]:
+    """Best cosine similarity over the per-window results; None unless the backend gives cosines."""
+    if not isinstance(rulebook, LocalVectorIndex):
+        return None
+    scores = [chunk.score for results in per_window for chunk in results if chunk.score is not None]
+    return max(scores) if scores else 0.0
+
+
+class PrecheckStats:
+    """Decision counts, LLM calls avoided and keyword stage latency, for /stats."""
+
+    def __init__(self):
+        self.videos = 0
+        self.clean = 0
+        self.decisions: Dict[str, int] = {"audit": 0, "pass": 0, "cheap": 0}
+        self.llm_calls_avoided = 0
+        # PRECHECK_MODE=shadow: calls clean videos would have avoided under "pass"
+        self.llm_calls_avoidable = 0
+        self.keyword_latency = LatencyWindow()
+
+    def record(self, result: PrecheckResult) -> None:
+        self.videos += 1
+        self.clean += int(result.clean)
+        self.decisions[result.decision] = self.decisions.get(result.decision, 0) + 1
+        self.keyword_latency.add(result.keyword_ms)
+
+    def avoided(self, llm_calls: int) -> None:
+        self.llm_calls_avoided += llm_calls
+
+    def avoidable(self, llm_calls: int) -> None:
+        self.llm_calls_avoidable += llm_calls
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": precheck_mode(),
+            "videos": self.videos,
+            "clean": self.clean,
+            "decisions": dict(self.decisions),
+            "llm_calls_avoided": self.llm_calls_avoided,
+            "llm_calls_avoidable": self.llm_calls_avoidable,
+            "keyword_ms": self.keyword_latency.summary(),
+        }
+
+
+precheck_stats = PrecheckStats()
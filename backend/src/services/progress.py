@@ -0,0 +1,146 @@
+"""
+Progress events for running audits.
+
+An audit takes minutes, and polling GET /audit/{job_id} only ever says
+RUNNING. GET /audit/{job_id}/events streams what is actually happening
+(download, upload bytes, Video Indexer progress, retrieval, LLM tokens, the
+final result) as Server-Sent Events.
+
+Producers: graph nodes and the services they call report progress with
+report_progress(event, **data). Inside a LangGraph run that writes to the
+run's "custom" stream (get_stream_writer); outside one (scripts, CLI) it is
+a no-op, so services don't need to know whether anyone is listening.
+
+Consumers: the API drives the graph with stream() instead of invoke() and
+appends every event to the job's ProgressLog. The SSE endpoint replays the
+log (from Last-Event-ID on reconnect) and then follows it live.
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from langgraph.config import get_stream_writer
+
+logger = logging.getLogger("audit-progress")
+
+
+def report_progress(event: str, **data: Any) -> None:
+    """Emits a progress event to the current graph run, if there is one."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return  # not running inside a graph
+    writer({"event": event, **data})
+
+
+def throttled_reporter(event: str, min_interval: float = 1.0) -> Callable[..., None]:
+    """
+    report_progress for high-frequency sources (bytes uploaded, download
+    hooks): forwards at most one event per `min_interval` seconds, plus any
+    call made with final=True.
+    """
+    last = [0.0]
+
+    def report(final: bool = False, **data: Any) -> None:
+        now = time.monotonic()
+        if final or now - last[0] >= min_interval:
+            last[0] = now
+            report_progress(event, **data)
+
+    return report
+
+
+@dataclass
+class ProgressEvent:
+    id: int
+    event: str
+    data: Dict[str, Any] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+    def to_sse(self) -> str:
+        """Formats the event as one Server-Sent Events message."""
+        payload = json.dumps(self.data, default=str)
+        return f"id: {self.id}\nevent: {self.event}\ndata: {payload}\n\n"
+
+
+class ProgressLog:
+    """
+    Append-only, bounded event log for one audit.
+
+    Written from the audit thread, read from the event loop: append() is
+    thread-safe and wakes every follower through its loop. Once close()d
+    followers drain the remaining events and stop.
+    """
+
+    def __init__(self, max_events: int = 5000):
+        self._events: "deque[ProgressEvent]" = deque(maxlen=max_events)
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._followers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self.closed = False
+
+    def append(self, event: str, data: Optional[Dict[str, Any]] = None) -> Optional[ProgressEvent]:
+        with self._lock:
+            if self.closed:
+                return None
+            entry = ProgressEvent(id=self._next_id, event=event, data=data or {})
+            self._next_id += 1
+            self._events.append(entry)
+            followers = list(self._followers)
+        self._wake(followers)
+        return entry
+
+    def close(self, event: Optional[str] = None, data: Optional[Dict[str, Any]] = None) -> None:
+        """Appends a final event (if given) and marks the log complete."""
+        if event is not None:
+            self.append(event, data)
+        with self._lock:
+            self.closed = True
+            followers = list(self._followers)
+        self._wake(followers)
+
+    def since(self, last_id: int = 0) -> List[ProgressEvent]:
+        """Events with an id greater than last_id (older ones may have been dropped)."""
+        with self._lock:
+            return [e for e in self._events if e.id > last_id]
+
+    async def follow(self, last_id: int = 0, heartbeat: float = 15.0) -> AsyncIterator[Optional[ProgressEvent]]:
+        """
+        Yields events after last_id as they arrive, until the log is closed.
+        Yields None every `heartbeat` seconds of silence so the caller can
+        keep the connection alive.
+        """
+        follower = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._followers.append(follower)
+        try:
+            while True:
+                follower[1].clear()
+                for entry in self.since(last_id):
+                    last_id = entry.id
+                    yield entry
+                if self.closed:
+                    # Catch anything appended between since() and the check
+                    for entry in self.since(last_id):
+                        yield entry
+                    return
+                try:
+                    await asyncio.wait_for(follower[1].wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._followers.remove(follower)
+
+    @staticmethod
+    def _wake(followers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]) -> None:
+        for loop, wake in followers:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass  # follower's loop already closed
@@ -0,0 +1,289 @@
+"""
+Compact, timestamped audit prompts, split into time windows for long videos.
+
+The auditor used to send the whole transcript, the Python repr of the OCR
+list and the retrieved rules as one prompt. Video Indexer reports the same
+on-screen text once per frame it appears in, and speech repeats itself
+("use code X", "link in bio"), so cost and latency grew with the video, and
+long videos could overflow the context. This module:
+
+1. collapses repeated transcript lines into their first occurrence, with
+   the times of the repeats appended, and merges OCR frames of the same
+   text into time spans,
+2. renders every line with its [m:ss] timestamp, so the LLM can say where
+   a violation occurs,
+3. above AUDIT_CHUNK_TOKENS, splits the video into consecutive time
+   windows of about that many tokens (at most AUDIT_MAX_CHUNKS), which the
+   auditor audits in parallel, and
+4. merges the per-window findings deterministically: in time order, with
+   duplicates (same category + timestamp) folded into the most severe one,
+   and gives issues the LLM left without a timestamp the time of the
+   segment they quote.
+
+Input is the columnar transcript / OCR SegmentTables from
+VideoIndexerService.extract_data (services/segments.py).
+"""
+import os
+import re
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.src.services.openai_limits import estimate_tokens
+from backend.src.services.segments import SegmentTable, rows, table_from_rows, locate
+
+# Bump whenever the layout of the user message built here changes: it is
+# part of the audit fingerprint, so cached verdicts from the old layout stop
+# being reused
+PROMPT_FORMAT_VERSION = "1"
+
+# OCR appearances less than this many seconds apart are one span
+OCR_MERGE_GAP_SECONDS = 1.0
+# Shown for "(repeated ...)" before summarising the rest as a count
+MAX_REPEAT_TIMES = 5
+
+SEVERITY_RANK = {"CRITICAL": 0, "HIGH": 1, "WARNING": 2, "MEDIUM": 3, "LOW": 4}
+
+
+def chunk_token_budget() -> int:
+    return int(os.getenv("AUDIT_CHUNK_TOKENS", "6000"))
+
+
+def max_chunks() -> int:
+    return int(os.getenv("AUDIT_MAX_CHUNKS", "8"))
+
+
+@dataclass
+class PromptLine:
+    """One compacted transcript or OCR line."""
+    kind: str                      # "transcript" | "ocr"
+    text: str
+    start: Optional[float] = None
+    end: Optional[float] = None
+    repeats: List[Optional[float]] = field(default_factory=list)
+
+    def render(self) -> str:
+        if self.start is None:
+            stamp = ""
+        elif self.kind == "ocr" and self.end is not None and self.end - self.start >= 1:
+            stamp = f"[{format_timestamp(self.start)}-{format_timestamp(self.end)}] "
+        else:
+            stamp = f"[{format_timestamp(self.start)}] "
+
+        suffix = ""
+        if self.repeats:
+            times = [format_timestamp(t) for t in self.repeats[:MAX_REPEAT_TIMES] if t is not None]
+            more = len(self.repeats) - MAX_REPEAT_TIMES
+            listed = ", ".join(times) + (f" +{more} more" if more > 0 else "")
+            suffix = f" (repeated {len(self.repeats)}x{' at ' + listed if listed else ''})"
+        return f"{stamp}{self.text}{suffix}"
+
+
+@dataclass
+class AuditPrompt:
+    """The user message for one time window, and its token estimate."""
+    user_message: str
+    tokens: int
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+    @property
+    def label(self) -> str:
+        if self.start is None:
+            return "full video"
+        return f"{format_timestamp(self.start)}-{format_timestamp(self.end or self.start)}"
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Seconds from "m:ss" / "h:mm:ss(.f)"; None if it isn't one."""
+    if not value:
+        return None
+    match = re.search(r"(\d+(?::\d{1,2}){1,2}(?:\.\d+)?)", str(value))
+    if not match:
+        return None
+    seconds = 0.0
+    for part in match.group(1).split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _normalise(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s#@%$]", " ", text.lower())).strip()
+
+
+def compact_transcript(table: Optional[SegmentTable]) -> List[PromptLine]:
+    """Drops repeated lines, noting the repeat times on the first occurrence."""
+    lines: List[PromptLine] = []
+    seen: Dict[str, PromptLine] = {}
+    for text, start, end, _ in rows(table):
+        text = (text or "").strip()
+        key = _normalise(text)
+        if not key:
+            continue
+        if key in seen:
+            seen[key].repeats.append(start)
+            continue
+        line = PromptLine("transcript", text, start, end)
+        seen[key] = line
+        lines.append(line)
+    return lines
+
+
+def compact_ocr(table: Optional[SegmentTable]) -> List[PromptLine]:
+    """
+    One line per distinct on-screen text: consecutive appearances become
+    one span, later reappearances are listed as repeats.
+    """
+    lines: List[PromptLine] = []
+    seen: Dict[str, PromptLine] = {}
+    last_end: Dict[str, Optional[float]] = {}
+    for text, start, end, _ in sorted(rows(table), key=lambda row: (row[1] is None, row[1] or 0.0)):
+        text = (text or "").strip()
+        key = _normalise(text)
+        if not key:
+            continue
+        end = end if end is not None else start
+        line = seen.get(key)
+        if line is None:
+            seen[key] = line = PromptLine("ocr", text, start, end)
+            lines.append(line)
+        elif start is not None and last_end[key] is not None and start - last_end[key] <= OCR_MERGE_GAP_SECONDS:
+            if not line.repeats:  # still the first span: extend it
+                line.end = max(line.end, end)
+        else:
+            line.repeats.append(start)
+        if end is not None:
+            last_end[key] = max(end, last_end.get(key) or end)
+        else:
+            last_end.setdefault(key, None)
+    return lines
+
+
+def segments_from_text(transcript: str, ocr_text: Sequence[str]) -> Dict[str, SegmentTable]:
+    """Untimed tables for state that carries no segments (sentences / OCR lines)."""
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", transcript or "") if s.strip()]
+    return {
+        "transcript_segments": table_from_rows([(s, None, None, None) for s in sentences]),
+        "ocr_segments": table_from_rows([(t, None, None, None) for t in ocr_text or [] if t]),
+    }
+
+
+def build_audit_prompts(transcript_segments: Optional[SegmentTable],
+                        ocr_segments: Optional[SegmentTable],
+                        metadata: Dict[str, Any],
+                        budget: Optional[int] = None,
+                        limit: Optional[int] = None) -> List[AuditPrompt]:
+    """
+    Compacts the segments into one user message, or one per time window
+    when the compacted text is over `budget` tokens.
+    """
+    budget = budget or chunk_token_budget()
+    limit = limit or max_chunks()
+
+    timeline = compact_transcript(transcript_segments) + compact_ocr(ocr_segments)
+    # Stable sort: untimed lines keep their order after the timed ones
+    timeline.sort(key=lambda line: (line.start is None, line.start or 0.0))
+    costs = [estimate_tokens(line.render()) + 1 for line in timeline]
+    total = sum(costs)
+
+    if total <= budget or len(timeline) < 2:
+        return [_prompt(timeline, metadata, None)]
+
+    # Widen the windows rather than exceed the chunk limit
+    budget = max(budget, -(-total // limit) + max(costs))
+    windows: List[List[PromptLine]] = [[]]
+    used = 0
+    for line, cost in zip(timeline, costs):
+        if windows[-1] and used + cost > budget:
+            windows.append([])
+            used = 0
+        windows[-1].append(line)
+        used += cost
+
+    return [_prompt(window, metadata, (index, len(windows))) for index, window in enumerate(windows)]
+
+
+def _prompt(lines: List[PromptLine], metadata: Dict[str, Any], part: Optional[tuple]) -> AuditPrompt:
+    transcript = [line.render() for line in lines if line.kind == "transcript"]
+    ocr = [line.render() for line in lines if line.kind == "ocr"]
+    starts = [line.start for line in lines if line.start is not None]
+    ends = [line.end if line.end is not None else line.start for line in lines if line.start is not None]
+    start, end = (min(starts), max(ends)) if starts else (None, None)
+
+    parts = [f"VIDEO METADATA: {json.dumps(metadata or {}, default=str)}"]
+    if part is not None and start is not None:
+        parts.append(f"VIDEO SEGMENT {part[0] + 1} of {part[1]}: "
+                     f"{format_timestamp(start)}-{format_timestamp(end)}. Only audit this segment.")
+    elif part is not None:
+        parts.append(f"VIDEO SEGMENT {part[0] + 1} of {part[1]}. Only audit this segment.")
+    parts.append("TRANSCRIPT ([m:ss] = time from the start of the video):")
+    parts.append("\n".join(transcript) or "(none)")
+    parts.append("ON-SCREEN TEXT (OCR):")
+    parts.append("\n".join(ocr) or "(none)")
+
+    message = "\n".join(parts)
+    return AuditPrompt(user_message=message, tokens=estimate_tokens(message),
+                       start=start if part is not None else None, end=end if part is not None else None)
+
+
+def merge_findings(results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combines per-window audit results ({"compliance_results", "status",
+    "final_report"}, in time order) into one.
+
+    Issues with the same category and timestamp (or, without a timestamp,
+    the same category and description) are reported once, at their most
+    severe. The verdict is FAIL if any window failed or any issue remains.
+    """
+    if len(results) == 1:
+        return results[0]
+
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for result in results:
+        for issue in result.get("compliance_results", []) or []:
+            category = _normalise(issue.get("category") or "")
+            seconds = parse_timestamp(issue.get("timestamp"))
+            key = (category, int(seconds)) if seconds is not None else (category, _normalise(issue.get("description") or ""))
+            kept = merged.get(key)
+            if kept is None:
+                merged[key] = dict(issue)
+            elif _severity_rank(issue) < _severity_rank(kept):
+                merged[key] = {**issue, "description": kept.get("description") or issue.get("description")}
+
+    issues = list(merged.values())
+    failed = bool(issues) or any(result.get("status") == "FAIL" for result in results)
+    reports = [result.get("final_report") for result in results if result.get("final_report")]
+    return {
+        "compliance_results": issues,
+        "status": "FAIL" if failed else "PASS",
+        "final_report": "\n\n".join(reports) or "No report generated.",
+    }
+
+
+def timestamp_issues(issues: List[Dict[str, Any]], transcript_segments: Optional[SegmentTable],
+                     ocr_segments: Optional[SegmentTable]) -> List[Dict[str, Any]]:
+    """
+    Fills in missing / unparseable issue timestamps with the start of the
+    transcript (else OCR) segment the description quotes most closely.
+    """
+    stamped = []
+    for issue in issues:
+        if parse_timestamp(issue.get("timestamp")) is None:
+            description = issue.get("description") or ""
+            seconds = locate(transcript_segments, description)
+            if seconds is None:
+                seconds = locate(ocr_segments, description)
+            issue = {**issue, "timestamp": format_timestamp(seconds) if seconds is not None else None}
+        stamped.append(issue)
+    return stamped
+
+
+def _severity_rank(issue: Dict[str, Any]) -> int:
+    return SEVERITY_RANK.get(str(issue.get("severity", "")).upper(), len(SEVERITY_RANK))
@@ -0,0 +1,194 @@
+"""
+Audit result cache.
+
+Auditing the same video twice repeats the download, Video Indexer upload,
+polling and LLM call. Results are cached under
+
+    <canonical YouTube video ID>:<audit fingerprint>
+
+where the fingerprint changes whenever the rulebook index or the audit
+prompt changes, so stale verdicts are never served against new rules.
+
+Two backends:
+- InMemoryResultCache: per-process LRU with TTL.
+- SqliteResultCache:   on-disk, survives restarts, same TTL/LRU semantics.
+
+Pick one with AUDIT_CACHE_BACKEND=memory|sqlite|none (see create_result_cache).
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("result-cache")
+
+
+def make_cache_key(video_id: str, fingerprint: str) -> str:
+    """Builds the cache key for a video audited under a given fingerprint."""
+    return f"{video_id}:{fingerprint}"
+
+
+class ResultCache(ABC):
+    """Interface for audit result caches."""
+
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached result, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Stores a result, evicting the least recently used entries if full."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Removes every entry."""
+
+    def close(self) -> None:
+        """Releases any resources held by the backend."""
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+
+class InMemoryResultCache(ResultCache):
+    """LRU + TTL cache held in process memory."""
+
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 1000):
+        super().__init__(ttl_seconds, max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[0]):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteResultCache(ResultCache):
+    """LRU + TTL cache persisted to a SQLite file."""
+
+    def __init__(self, path: str, ttl_seconds: float = 86400, max_entries: int = 1000):
+        super().__init__(ttl_seconds, max_entries)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audit_results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_audit_results_accessed ON audit_results (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM audit_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1]):
+                if row is not None:
+                    self._conn.execute("DELETE FROM audit_results WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE audit_results SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO audit_results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            # Evict least recently used rows beyond the size limit
+            self._conn.execute(
+                """
+                DELETE FROM audit_results WHERE key IN (
+                    SELECT key FROM audit_results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM audit_results")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_result_cache() -> Optional[ResultCache]:
+    """
+    Builds the result cache configured through environment variables.
+
+    AUDIT_CACHE_BACKEND      memory (default) | sqlite | none
+    AUDIT_CACHE_TTL_SECONDS  entry lifetime, 0 = never expire (default 86400)
+    AUDIT_CACHE_MAX_ENTRIES  LRU size limit (default 1000)
+    AUDIT_CACHE_PATH         SQLite file (default .cache/audit_results.sqlite3)
+    """
+    backend = os.getenv("AUDIT_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("AUDIT_CACHE_TTL_SECONDS", "86400"))
+    max_entries = int(os.getenv("AUDIT_CACHE_MAX_ENTRIES", "1000"))
+
+    if backend == "none":
+        logger.info("Audit result cache is DISABLED.")
+        return None
+    if backend == "sqlite":
+        path = os.getenv("AUDIT_CACHE_PATH", ".cache/audit_results.sqlite3")
+        logger.info(f"Audit result cache: SQLite at {path}")
+        return SqliteResultCache(path, ttl_seconds=ttl, max_entries=max_entries)
+    if backend != "memory":
+        logger.warning(f"Unknown AUDIT_CACHE_BACKEND '{backend}', falling back to memory")
+    return InMemoryResultCache(ttl_seconds=ttl, max_entries=max_entries)
@@ -0,0 +1,169 @@
+"""
+Multi-query rulebook retrieval for long videos.
+
+Embedding the whole transcript + OCR as one query dilutes the vector (a
+single sponsored-claim sentence drowns in minutes of chatter) and can exceed
+the embedding model's input limit. Instead:
+
+1. split transcript and OCR into overlapping time windows, using the
+   segments' start / end times (word windows for untimed text),
+2. embed every window in ONE batched embeddings call,
+3. search the rulebook with all window vectors at once (a single matmul for
+   the local index, parallel queries for Azure AI Search),
+4. merge the per-window top-k lists with deduplication and reciprocal-rank
+   fusion (RRF), so rules that rank well for several windows come first.
+
+Latency grows with the number of embedding batches, not with one serial
+round-trip per window. asearch_windows() runs steps 1-3 for the async graph
+nodes, whose embedding call goes through the Azure OpenAI rate limiter; the
+precheck scores the per-window lists, then fuses them with
+reciprocal_rank_fusion().
+"""
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from backend.src.services.rulebook_index import RuleChunk, RulebookRetriever
+from backend.src.services.instrumentation import measure
+from backend.src.services.segments import Row, SegmentTable, rows
+
+# A few sentences of speech; well below the embedding input limit
+DEFAULT_WINDOW_SECONDS = 30.0
+DEFAULT_WINDOW_OVERLAP_SECONDS = 5.0
+# Windows for text without times (state from before segments were kept)
+DEFAULT_WINDOW_WORDS = 120
+DEFAULT_WINDOW_OVERLAP = 20
+# Upper bound on windows per audit: long videos get wider windows instead
+MAX_WINDOWS = 32
+# Constant from the original RRF paper (Cormack et al.); dampens top-rank dominance
+RRF_K = 60
+
+
+def build_query_windows(transcript_segments: Optional[SegmentTable],
+                        ocr_segments: Optional[SegmentTable],
+                        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                        overlap_seconds: float = DEFAULT_WINDOW_OVERLAP_SECONDS,
+                        max_windows: int = MAX_WINDOWS) -> List[str]:
+    """
+    Splits the transcript and OCR segments into overlapping time windows.
+
+    Each transcript window holds the segments playing during that stretch
+    of the video. Distinct OCR lines are grouped into their own windows by
+    the time they first appear, so on-screen claims are searched on their
+    own. Untimed segments fall back to word windows.
+    """
+    windows = _time_windows(rows(transcript_segments), window_seconds, overlap_seconds, max_windows)
+
+    first_seen: Dict[str, Row] = {}
+    for row in rows(ocr_segments):
+        key = (row[0] or "").strip().lower()
+        if key and key not in first_seen:
+            first_seen[key] = row
+    windows += _time_windows(first_seen.values(), window_seconds, overlap_seconds, max_windows)
+
+    return windows
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[Sequence[RuleChunk]], top_k: int = 5,
+                           rrf_k: int = RRF_K) -> List[RuleChunk]:
+    """
+    Merges several ranked lists into one, deduplicating identical chunks.
+
+    Each chunk scores sum(1 / (rrf_k + rank)) over the lists it appears in.
+    Ties keep first-seen order, so the result is deterministic.
+    """
+    scores: Dict[str, float] = {}
+    chunks: Dict[str, RuleChunk] = {}
+    for results in result_lists:
+        for rank, chunk in enumerate(results, start=1):
+            key = _chunk_key(chunk)
+            if key not in chunks:
+                chunks[key] = chunk
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+
+    ordered = sorted(chunks, key=lambda key: scores[key], reverse=True)
+    fused = []
+    for key in ordered[:top_k]:
+        chunk = chunks[key]
+        fused.append(RuleChunk(text=chunk.text, source=chunk.source, score=scores[key], metadata=chunk.metadata))
+    return fused
+
+
+async def asearch_windows(rulebook: RulebookRetriever,
+                          aembed_documents: Callable[[List[str]], Awaitable[List[List[float]]]],
+                          transcript_segments: Optional[SegmentTable],
+                          ocr_segments: Optional[SegmentTable],
+                          k_per_window: int = 3) -> List[List[RuleChunk]]:
+    """
+    The per-window top-k lists before fusion, with the backend's scores
+    (cosine similarity for the local index). The precheck reads them.
+    """
+    windows = build_query_windows(transcript_segments, ocr_segments)
+    if not windows:
+        return []
+
+    vectors = await aembed_documents(windows)
+    with measure("search", backend=type(rulebook).__name__):
+        return await asyncio.to_thread(rulebook.search_by_vectors, vectors, k_per_window)
+
+
+def _time_windows(table_rows: Iterable[Row], window_seconds: float, overlap_seconds: float,
+                  max_windows: int) -> List[str]:
+    timed, untimed = [], []
+    for text, start, end, _ in table_rows:
+        text = (text or "").strip()
+        if not text:
+            continue
+        if start is None:
+            untimed.append(text)
+        else:
+            timed.append((start, end if end is not None else start, text))
+
+    windows = _word_windows(" ".join(untimed).split(), DEFAULT_WINDOW_WORDS, DEFAULT_WINDOW_OVERLAP, max_windows)
+    if not timed:
+        return windows
+
+    timed.sort(key=lambda segment: segment[0])
+    first, last = timed[0][0], max(end for _, end, _ in timed)
+    step = max(window_seconds - overlap_seconds, 1.0)
+    # Widen the windows rather than exceed max_windows on very long videos
+    needed = -(-max(last - first - overlap_seconds, 1.0) // step)
+    if needed > max_windows:
+        window_seconds = window_seconds * needed / max_windows + 1.0
+        step = max(window_seconds - overlap_seconds, 1.0)
+
+    window_start = first
+    while True:
+        window_end = window_start + window_seconds
+        # Segments playing during the window, including ones that started before it
+        texts = [text for start, end, text in timed if start < window_end and end >= window_start]
+        if texts:
+            windows.append(" ".join(texts))
+        if window_end >= last:
+            break
+        window_start += step
+    return windows
+
+
+def _word_windows(words: List[str], window_words: int, overlap: int, max_windows: int) -> List[str]:
+    if not words:
+        return []
+
+    step = max(window_words - overlap, 1)
+    # Widen the windows rather than exceed max_windows on very long videos
+    needed = -(-max(len(words) - overlap, 1) // step)
+    if needed > max_windows:
+        scale = needed / max_windows
+        window_words = int(window_words * scale) + 1
+        step = max(window_words - overlap, 1)
+
+    windows = []
+    for start in range(0, len(words), step):
+        windows.append(" ".join(words[start:start + window_words]))
+        if start + window_words >= len(words):
+            break
+    return windows
+
+
+def _chunk_key(chunk: RuleChunk) -> str:
+    return hashlib.sha1(f"{chunk.source}\x1f{chunk.text}".encode("utf-8")).hexdigest()
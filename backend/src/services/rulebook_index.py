@@ -0,0 +1,281 @@
+"""
+Rulebook retrieval backends.
+
+The rulebook (the PDFs in backend/data) is small and rarely changes, yet
+every audit paid a network round-trip to Azure AI Search to find the rules
+relevant to a video. scripts/index_documents.py now also writes the chunks
+and their embeddings to a local index directory:
+
+    <RULEBOOK_INDEX_DIR>/embeddings.npy   float32 matrix, one L2-normalised row per chunk
+                                          (memory-mapped on load)
+    <RULEBOOK_INDEX_DIR>/chunks.json      chunk text + source metadata + fingerprint
+
+LocalVectorIndex answers a query with a single vectorised cosine top-k over
+that matrix, in process. AzureSearchRetriever keeps Azure AI Search
+available behind the same interface. Both only need an embedding function,
+so retrieval can run fully offline with a fake embedder.
+"""
+import os
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from azure.search.documents.models import VectorizedQuery
+
+logger = logging.getLogger("rulebook-index")
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.json"
+
+EmbedFn = Callable[[str], List[float]]
+
+
+@dataclass
+class RuleChunk:
+    """One retrieved rulebook passage."""
+    text: str
+    source: Optional[str] = None
+    score: Optional[float] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class RulebookRetriever(ABC):
+    """Interface for rulebook search backends."""
+
+    @abstractmethod
+    def search(self, query: str, k: int = 3) -> List[RuleChunk]:
+        """Returns the k rule chunks most relevant to the query text."""
+
+    @abstractmethod
+    def search_by_vectors(self, vectors: Sequence[Sequence[float]], k: int = 3) -> List[List[RuleChunk]]:
+        """Top-k chunks for each of several pre-computed query embeddings."""
+
+    @abstractmethod
+    def fingerprint(self) -> str:
+        """Identifies the rulebook version this backend serves."""
+
+
+class LocalVectorIndex(RulebookRetriever):
+    """In-process cosine top-k over a memory-mapped embedding matrix."""
+
+    def __init__(self, index_dir: str, embed_fn: EmbedFn, mmap: bool = True):
+        self.index_dir = index_dir
+        self.embed_fn = embed_fn
+
+        chunks_path = os.path.join(index_dir, CHUNKS_FILE)
+        self._mtime = os.path.getmtime(chunks_path)
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.chunks: List[Dict[str, Any]] = meta["chunks"]
+        self._fingerprint: str = meta["fingerprint"]
+
+        self.matrix = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r" if mmap else None)
+        if self.matrix.shape[0] != len(self.chunks):
+            raise ValueError(
+                f"Local rulebook index is inconsistent: {self.matrix.shape[0]} vectors, {len(self.chunks)} chunks"
+            )
+        logger.info(f"Loaded local rulebook index: {len(self.chunks)} chunks, dim {self.matrix.shape[1]}")
+
+    def search(self, query: str, k: int = 3) -> List[RuleChunk]:
+        return self.search_by_vector(self.embed_fn(query), k)
+
+    def search_by_vector(self, vector: Sequence[float], k: int = 3) -> List[RuleChunk]:
+        return self.search_by_vectors([vector], k)[0]
+
+    def search_by_vectors(self, vectors: Sequence[Sequence[float]], k: int = 3) -> List[List[RuleChunk]]:
+        if len(vectors) == 0:
+            return []
+        queries = np.asarray(vectors, dtype=np.float32)
+        queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        # Rows are already normalised, so one matmul gives the cosine
+        # similarity of every chunk to every query: shape (chunks, queries)
+        scores = self.matrix @ queries.T
+        return [
+            [self._chunk(i, scores[i, q]) for i in _top_k(scores[:, q], k)]
+            for q in range(scores.shape[1])
+        ]
+
+    def fingerprint(self) -> str:
+        return f"local:{self._fingerprint}"
+
+    def changed_on_disk(self) -> bool:
+        """True once scripts/index_documents.py has rewritten the index this one was loaded from."""
+        try:
+            return os.path.getmtime(os.path.join(self.index_dir, CHUNKS_FILE)) != self._mtime
+        except OSError:
+            return False  # removed: keep serving what is loaded
+
+    def _chunk(self, i: int, score: float) -> RuleChunk:
+        chunk = self.chunks[i]
+        return RuleChunk(
+            text=chunk["text"],
+            source=chunk.get("source"),
+            score=float(score),
+            metadata=chunk.get("metadata", {}),
+        )
+
+
+class AzureSearchRetriever(RulebookRetriever):
+    """Azure AI Search vector store behind the RulebookRetriever interface."""
+
+    def __init__(self, vector_store, index_name: Optional[str] = None, max_parallel: int = 8):
+        self.vector_store = vector_store
+        self.index_name = index_name or os.getenv("AZURE_SEARCH_INDEX_NAME", "")
+        self.max_parallel = max_parallel
+        # Field names used by langchain's AzureSearch (same env overrides)
+        self.content_field = os.getenv("AZURESEARCH_FIELDS_CONTENT", "content")
+        self.vector_field = os.getenv("AZURESEARCH_FIELDS_CONTENT_VECTOR", "content_vector")
+        self.metadata_field = os.getenv("AZURESEARCH_FIELDS_TAG", "metadata")
+
+    def search(self, query: str, k: int = 3) -> List[RuleChunk]:
+        docs = self.vector_store.similarity_search(query, k=k)
+        return [
+            RuleChunk(text=doc.page_content, source=doc.metadata.get("source"), metadata=doc.metadata)
+            for doc in docs
+        ]
+
+    def search_by_vectors(self, vectors: Sequence[Sequence[float]], k: int = 3) -> List[List[RuleChunk]]:
+        """One vector query per embedding, issued in parallel."""
+        if len(vectors) == 0:
+            return []
+        if len(vectors) == 1:
+            return [self._vector_query(vectors[0], k)]
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(vectors))) as pool:
+            return list(pool.map(lambda vector: self._vector_query(vector, k), vectors))
+
+    def fingerprint(self) -> str:
+        return f"azure:{self.index_name}:{os.getenv('RULEBOOK_VERSION', '')}"
+
+    def _vector_query(self, vector: Sequence[float], k: int) -> List[RuleChunk]:
+        results = self.vector_store.client.search(
+            search_text=None,
+            vector_queries=[VectorizedQuery(vector=list(vector), k_nearest_neighbors=k, fields=self.vector_field)],
+            select=[self.content_field, self.metadata_field],
+            top=k,
+        )
+        chunks = []
+        for result in results:
+            metadata = result.get(self.metadata_field) or {}
+            if isinstance(metadata, str):
+                try:
+                    metadata = json.loads(metadata)
+                except ValueError:
+                    metadata = {}
+            chunks.append(RuleChunk(
+                text=result.get(self.content_field, ""),
+                source=metadata.get("source"),
+                score=result.get("@search.score"),
+                metadata=metadata,
+            ))
+        return chunks
+
+
+def save_local_index(index_dir: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]],
+                     metadatas: Optional[Sequence[Dict[str, Any]]] = None, model: Optional[str] = None) -> str:
+    """
+    Writes a local index and returns its fingerprint.
+
+    Files are written to temporary names and swapped in, so a running
+    server never loads a half-written index.
+    """
+    if len(texts) != len(embeddings):
+        raise ValueError("texts and embeddings must have the same length")
+    os.makedirs(index_dir, exist_ok=True)
+    metadatas = metadatas or [{} for _ in texts]
+
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2:
+        raise ValueError("embeddings must be a 2-D matrix")
+    matrix = matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+    digest = hashlib.sha256(matrix.tobytes())
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+    fingerprint = digest.hexdigest()[:16]
+
+    chunks = [
+        {"text": text, "source": meta.get("source"), "metadata": meta}
+        for text, meta in zip(texts, metadatas)
+    ]
+
+    embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+    chunks_path = os.path.join(index_dir, CHUNKS_FILE)
+    with open(f"{embeddings_path}.tmp", "wb") as f:
+        np.save(f, matrix)
+    with open(f"{chunks_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "model": model, "chunks": chunks}, f)
+    os.replace(f"{embeddings_path}.tmp", embeddings_path)
+    os.replace(f"{chunks_path}.tmp", chunks_path)
+
+    logger.info(f"Saved local rulebook index ({len(chunks)} chunks) to {index_dir}")
+    return fingerprint
+
+
+def load_local_index(index_dir: str) -> List[Tuple[Dict[str, Any], List[float]]]:
+    """
+    Reads back (chunk, vector) pairs from a local index, or [] if there is
+    none. Used by the ingestion script to reuse embeddings across runs.
+    """
+    if not local_index_exists(index_dir):
+        return []
+    with open(os.path.join(index_dir, CHUNKS_FILE), "r", encoding="utf-8") as f:
+        chunks = json.load(f)["chunks"]
+    matrix = np.load(os.path.join(index_dir, EMBEDDINGS_FILE))
+    if matrix.shape[0] != len(chunks):
+        logger.warning(f"Ignoring inconsistent local index at {index_dir}")
+        return []
+    return list(zip(chunks, matrix.tolist()))
+
+
+def local_index_dir() -> str:
+    return os.getenv("RULEBOOK_INDEX_DIR", ".cache/rulebook_index")
+
+
+def local_index_exists(index_dir: Optional[str] = None) -> bool:
+    index_dir = index_dir or local_index_dir()
+    return (os.path.exists(os.path.join(index_dir, EMBEDDINGS_FILE))
+            and os.path.exists(os.path.join(index_dir, CHUNKS_FILE)))
+
+
+def rulebook_backend() -> str:
+    """
+    RULEBOOK_BACKEND = local | azure. Defaults to local when a local index
+    exists, otherwise azure.
+    """
+    backend = os.getenv("RULEBOOK_BACKEND", "").lower()
+    if backend in ("local", "azure"):
+        return backend
+    return "local" if local_index_exists() else "azure"
+
+
+_fingerprint_cache: Dict[str, Any] = {}
+
+
+def rulebook_fingerprint() -> str:
+    """
+    Fingerprint of the configured rulebook, read cheaply (no clients built).
+    Used to key cached audit results.
+    """
+    if rulebook_backend() == "local" and local_index_exists():
+        chunks_path = os.path.join(local_index_dir(), CHUNKS_FILE)
+        mtime = os.path.getmtime(chunks_path)
+        if _fingerprint_cache.get("key") != (chunks_path, mtime):
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                _fingerprint_cache["value"] = f"local:{json.load(f)['fingerprint']}"
+            _fingerprint_cache["key"] = (chunks_path, mtime)
+        return _fingerprint_cache["value"]
+    return f"azure:{os.getenv('AZURE_SEARCH_INDEX_NAME', '')}:{os.getenv('RULEBOOK_VERSION', '')}"
+
+
+def _top_k(scores: np.ndarray, k: int) -> List[int]:
+    """Indices of the k highest scores, best first (O(n) partition + O(k log k) sort)."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return []
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])].tolist()
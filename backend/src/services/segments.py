@@ -0,0 +1,192 @@
+"""
+Columnar transcript / OCR segments.
+
+extract_data used to flatten Video Indexer's insights into one transcript
+string and a list of OCR strings, dropping every item's time ranges
+(`instances`) and confidence. A SegmentTable keeps them, one row per
+appearance, as parallel columns:
+
+    {"text": [...], "start": [...], "end": [...], "confidence": [...]}
+
+Times are seconds from the start of the video, and None when unknown.
+Columns of plain lists stay small: no per-row dicts or VI ids, language
+tags and the like. They also serialise as-is into graph state and
+checkpoints.
+
+OCR frames of the same text that follow each other are merged into one row
+at extraction, so a caption that stays on screen for 20 s is one row rather
+than one per frame. Retrieval windows, prompt compaction and issue
+timestamping all read the tables. After extraction, the only copy of the raw
+insights that is kept is slim_insights(), which holds just what
+extract_data reads.
+"""
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, TypedDict
+
+# OCR appearances of the same text less than this many seconds apart are one row
+OCR_MERGE_GAP_SECONDS = 1.0
+
+Row = Tuple[str, Optional[float], Optional[float], Optional[float]]
+
+
+class SegmentTable(TypedDict):
+    text: List[str]
+    start: List[Optional[float]]
+    end: List[Optional[float]]
+    confidence: List[Optional[float]]
+
+
+def empty_table() -> SegmentTable:
+    return {"text": [], "start": [], "end": [], "confidence": []}
+
+
+def append_row(table: SegmentTable, text: str, start: Optional[float] = None,
+               end: Optional[float] = None, confidence: Optional[float] = None) -> None:
+    table["text"].append(text)
+    table["start"].append(start)
+    table["end"].append(end)
+    table["confidence"].append(confidence)
+
+
+def rows(table: Optional[SegmentTable]) -> Iterator[Row]:
+    """(text, start, end, confidence) per row."""
+    if not table:
+        return iter(())
+    return zip(table["text"], table["start"], table["end"], table["confidence"])
+
+
+def texts(table: Optional[SegmentTable]) -> List[str]:
+    return list(table["text"]) if table else []
+
+
+def table_from_rows(table_rows: Sequence[Row]) -> SegmentTable:
+    table = empty_table()
+    for row in table_rows:
+        append_row(table, *row)
+    return table
+
+
+def parse_vi_time(value: Optional[str]) -> Optional[float]:
+    """Seconds from a VI time ("0:00:05.3"), or None."""
+    if not value:
+        return None
+    try:
+        seconds = 0.0
+        for part in str(value).split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def table_from_insights(items: Sequence[Dict[str, Any]], merge_frames: bool = False) -> SegmentTable:
+    """
+    One row per instance of each VI transcript / OCR item.
+
+    With merge_frames (OCR), appearances of the same text that touch or
+    overlap become one row with the highest confidence, and rows are put
+    in time order.
+    """
+    table_rows: List[List[Any]] = []
+    last_row_for_text: Dict[str, List[Any]] = {}
+    for item in items:
+        text = (item.get("text") or "").strip()
+        if not text:
+            continue
+        confidence = item.get("confidence")
+        for instance in item.get("instances") or [{}]:
+            start = parse_vi_time(instance.get("adjustedStart") or instance.get("start"))
+            end = parse_vi_time(instance.get("adjustedEnd") or instance.get("end"))
+            if merge_frames:
+                key = text.lower()
+                last = last_row_for_text.get(key)
+                if last is not None and _touches(last, start):
+                    if end is not None:
+                        last[2] = end if last[2] is None else max(last[2], end)
+                    last[3] = _max_optional(last[3], confidence)
+                    continue
+                row = [text, start, end, confidence]
+                last_row_for_text[key] = row
+            else:
+                row = [text, start, end, confidence]
+            table_rows.append(row)
+
+    if merge_frames:
+        table_rows.sort(key=lambda row: (row[1] is None, row[1] or 0.0))
+    return table_from_rows([tuple(row) for row in table_rows])
+
+
+def locate(table: Optional[SegmentTable], text: str, min_overlap: int = 2) -> Optional[float]:
+    """
+    Start time of the row sharing the most words with `text` (e.g. an
+    issue's description quoting the video), or None below `min_overlap`.
+    """
+    wanted = set(_words(text))
+    best_start, best_score = None, min_overlap - 1
+    for row_text, start, _, _ in rows(table):
+        if start is None:
+            continue
+        score = len(wanted.intersection(_words(row_text)))
+        if score > best_score:
+            best_start, best_score = start, score
+    return best_start
+
+
+def slim_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """A transcript / OCR item reduced to text, confidence and instance times."""
+    return {
+        "text": item.get("text"),
+        "confidence": item.get("confidence"),
+        "instances": [
+            {key: instance[key] for key in ("adjustedStart", "adjustedEnd", "start", "end") if key in instance}
+            for instance in item.get("instances") or []
+        ],
+    }
+
+
+def slim_insights(vi_json: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The parts of an /Index document extract_data and polling read: state,
+    duration, and per video the state, processing progress and the
+    transcript / OCR items' text, confidence and times. Everything else
+    (faces, labels, thumbnails, keyframes...) is dropped.
+
+    insights_parser.parse_insights() builds the same shape from a stream.
+    """
+    # Views without summarizedInsights still carry the top-level duration
+    seconds = ((vi_json.get("summarizedInsights") or {}).get("duration") or {}).get("seconds")
+    if seconds is None:
+        seconds = vi_json.get("durationInSeconds")
+    duration = {"seconds": seconds} if seconds is not None else {}
+
+    return {
+        "state": vi_json.get("state"),
+        "summarizedInsights": {"duration": duration},
+        "videos": [
+            {
+                "state": video.get("state"),
+                "processingProgress": video.get("processingProgress"),
+                "insights": {
+                    "transcript": [slim_item(item) for item in (video.get("insights") or {}).get("transcript") or []],
+                    "ocr": [slim_item(item) for item in (video.get("insights") or {}).get("ocr") or []],
+                },
+            }
+            for video in vi_json.get("videos", []) or []
+        ],
+    }
+
+
+def _touches(row: List[Any], start: Optional[float]) -> bool:
+    return start is not None and row[2] is not None and start - row[2] <= OCR_MERGE_GAP_SECONDS
+
+
+def _max_optional(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in re.findall(r"[\w#@%$]+", (text or "").lower()) if len(word) > 2]
@@ -0,0 +1,294 @@
+"""
+Single-flight deduplication of concurrent audits.
+
+When a campaign link goes out, several reviewers often POST /audit with the
+same URL within seconds. The result cache only helps once the first audit
+has finished, so each of those requests used to start its own download,
+upload and Video Indexer run. Audits now go through a SingleFlight registry
+keyed like the result cache (canonical video ID + audit fingerprint):
+
+- the first request for a key leads: its audit runs as a task owned by the
+  registry, not by the request, so cancelling any one waiter (a cancelled
+  job, a worker shut down) never kills the shared audit;
+- identical requests arriving while it runs join the flight and all get
+  its result (or its error);
+- flights live behind a threading lock and complete a concurrent.futures
+  Future, so callers on other threads / event loops join them too.
+
+With several replicas, an optional FlightLock shares the lead across
+processes. RedisFlightLock holds a per-key lock in Redis (SET NX with a
+TTL the leader keeps refreshing) and publishes the leader's result there
+before releasing it; a replica that finds the key locked waits for the
+lock to go and picks up the result. If the leader died (its lock expired
+with no result) the next replica takes over.
+
+Pick one with SINGLE_FLIGHT_BACKEND=local|redis|none (see create_single_flight).
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger("single-flight")
+
+Work = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class FlightLock(ABC):
+    """Cross-process lock + result hand-off for one flight key."""
+
+    # The holder refreshes its lock every lease_seconds / 3
+    lease_seconds: float = 60.0
+
+    @abstractmethod
+    async def acquire(self, key: str, owner: str) -> Optional[str]:
+        """Takes the lock for `owner`; returns None when held, else a release token."""
+
+    @abstractmethod
+    async def holder(self, key: str) -> Optional[str]:
+        """Owner currently holding the lock, or None when it is free."""
+
+    @abstractmethod
+    async def refresh(self, key: str, token: str) -> bool:
+        """Extends the lock's lease; False if it was lost."""
+
+    @abstractmethod
+    async def release(self, key: str, token: str, result: Optional[Dict[str, Any]]) -> None:
+        """Publishes the result (None when the work failed) and frees the lock."""
+
+    @abstractmethod
+    async def result(self, key: str) -> Optional[Dict[str, Any]]:
+        """The result the last holder published, if it is still there."""
+
+    async def aclose(self) -> None:
+        """Releases any connections held by the backend."""
+
+
+class RedisFlightLock(FlightLock):
+    """FlightLock in Redis: `<prefix>lock:<key>` holds the owner, `<prefix>result:<key>` the result."""
+
+    # Only the holder may extend or delete its lock
+    _REFRESH = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, prefix: str = "audit-flight:", lock_ttl_seconds: float = 60,
+                 result_ttl_seconds: float = 600):
+        import redis.asyncio as aioredis
+
+        self.prefix = prefix
+        self.lease_seconds = lock_ttl_seconds
+        self.result_ttl_seconds = int(result_ttl_seconds)
+        self._redis = aioredis.from_url(url, decode_responses=True)
+
+    async def acquire(self, key: str, owner: str) -> Optional[str]:
+        token = f"{owner}|{uuid.uuid4().hex}"
+        if await self._redis.set(self._lock(key), token, nx=True, px=int(self.lease_seconds * 1000)):
+            return token
+        return None
+
+    async def holder(self, key: str) -> Optional[str]:
+        token = await self._redis.get(self._lock(key))
+        return token.split("|", 1)[0] if token else None
+
+    async def refresh(self, key: str, token: str) -> bool:
+        return bool(await self._redis.eval(self._REFRESH, 1, self._lock(key), token,
+                                         int(self.lease_seconds * 1000)))
+
+    async def release(self, key: str, token: str, result: Optional[Dict[str, Any]]) -> None:
+        # Result first: a waiter that sees the lock gone must find it
+        if result is not None:
+            await self._redis.set(self._result(key), json.dumps(result), ex=self.result_ttl_seconds)
+        await self._redis.eval(self._RELEASE, 1, self._lock(key), token)
+
+    async def result(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self._redis.get(self._result(key))
+        return json.loads(value) if value else None
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+    def _lock(self, key: str) -> str:
+        return f"{self.prefix}lock:{key}"
+
+    def _result(self, key: str) -> str:
+        return f"{self.prefix}result:{key}"
+
+
+class Flight:
+    """One running piece of work and everyone waiting for it."""
+
+    def __init__(self, key: str, owner: str):
+        self.key = key
+        self.owner = owner  # caller that started the flight in this process
+        self.leader = owner  # owner (job ID) whose work is running, possibly on another replica
+        self.future: "concurrent.futures.Future[Dict[str, Any]]" = concurrent.futures.Future()
+        self.started_at = time.time()
+        self.waiters = 1  # callers awaiting it right now
+
+
+class SingleFlight:
+    """
+    Runs at most one `work` per key at a time; concurrent callers with the
+    same key share its outcome. `lock` extends that across processes.
+    """
+
+    def __init__(self, lock: Optional[FlightLock] = None, poll_seconds: float = 1.0):
+        self.lock = lock
+        self.poll_seconds = poll_seconds
+        self._flights: Dict[str, Flight] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self.started = 0
+        self.joined = 0
+        self.remote = 0  # flights that waited on another replica's leader
+
+    async def run(self, key: str, owner: str, work: Work,
+                  on_join: Optional[Callable[[str], None]] = None) -> Tuple[Dict[str, Any], str]:
+        """
+        Runs work() for `key` unless a flight for it is already in the air,
+        and returns (result, leader): leader is `owner` when this call ran
+        the work, else the owner of the flight it joined. on_join(leader)
+        is called as soon as the call attaches to someone else's flight.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leading = flight is None
+            if leading:
+                flight = self._flights[key] = Flight(key, owner)
+                self.started += 1
+            else:
+                flight.waiters += 1
+                self.joined += 1
+
+        if leading:
+            task = asyncio.create_task(self._lead(flight, work), name=f"flight-{key}")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            logger.info(f"{owner} joined the running audit {flight.leader} ({key})")
+            if on_join is not None:
+                on_join(flight.leader)
+
+        try:
+            # shield: cancelling this waiter must not cancel the shared future
+            result = await asyncio.shield(asyncio.wrap_future(flight.future))
+        finally:
+            with self._lock:
+                flight.waiters -= 1
+        return result, flight.leader
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._flights)
+            waiters = sum(flight.waiters for flight in self._flights.values())
+        return {
+            "backend": type(self.lock).__name__ if self.lock is not None else "local",
+            "in_flight": in_flight,
+            "waiters": waiters,
+            "started": self.started,
+            "joined": self.joined,
+            "remote": self.remote,
+        }
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.lock is not None:
+            await self.lock.aclose()
+
+    async def _lead(self, flight: Flight, work: Work) -> None:
+        try:
+            result = await (self._run_locked(flight, work) if self.lock is not None else work())
+        except BaseException as e:
+            self._land(flight)
+            if isinstance(e, asyncio.CancelledError):
+                flight.future.cancel()
+                raise
+            flight.future.set_exception(e)
+        else:
+            self._land(flight)
+            flight.future.set_result(result)
+
+    def _land(self, flight: Flight) -> None:
+        # Later requests start a new flight (or hit the result cache)
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    async def _run_locked(self, flight: Flight, work: Work) -> Dict[str, Any]:
+        """work() under the shared lock, or the result of the replica holding it."""
+        while True:
+            token = await self.lock.acquire(flight.key, flight.owner)
+            if token is not None:
+                flight.leader = flight.owner
+                return await self._run_holding(flight, work, token)
+
+            holder = await self.lock.holder(flight.key)
+            if holder is None:
+                continue  # released between the two calls
+            self.remote += 1
+            flight.leader = holder
+            logger.info(f"Audit {flight.key} is running on another replica ({holder}); waiting for it")
+            while await self.lock.holder(flight.key) is not None:
+                await asyncio.sleep(self.poll_seconds)
+            result = await self.lock.result(flight.key)
+            if result is not None:
+                return result
+            logger.warning(f"Audit {holder} ({flight.key}) ended without a result; taking over")
+
+    async def _run_holding(self, flight: Flight, work: Work, token: str) -> Dict[str, Any]:
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(max(self.lock.lease_seconds / 3, 0.1))
+                if not await self.lock.refresh(flight.key, token):
+                    logger.warning(f"Lost the single-flight lock on {flight.key}")
+                    return
+
+        refresher = asyncio.create_task(keep_alive())
+        result = None
+        try:
+            result = await work()
+            return result
+        finally:
+            refresher.cancel()
+            try:
+                await asyncio.shield(self.lock.release(flight.key, token, result))
+            except Exception as e:
+                logger.warning(f"Could not release the single-flight lock on {flight.key}: {e}")
+
+
+def create_single_flight() -> Optional[SingleFlight]:
+    """
+    Builds the audit single-flight registry configured through environment variables.
+
+    SINGLE_FLIGHT_BACKEND             local (default) | redis | none
+    SINGLE_FLIGHT_REDIS_URL           Redis for the shared lock (default redis://localhost:6379/0)
+    SINGLE_FLIGHT_LOCK_TTL_SECONDS    lease of a leader's lock, refreshed while it runs (default 60)
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS  how long a published result waits for other replicas (default 600)
+    SINGLE_FLIGHT_POLL_SECONDS        how often other replicas check the lock (default 1)
+    """
+    backend = os.getenv("SINGLE_FLIGHT_BACKEND", "local").lower()
+    poll_seconds = float(os.getenv("SINGLE_FLIGHT_POLL_SECONDS", "1"))
+
+    if backend == "none":
+        logger.info("Audit single-flight deduplication is DISABLED.")
+        return None
+    if backend == "redis":
+        url = os.getenv("SINGLE_FLIGHT_REDIS_URL", "redis://localhost:6379/0")
+        logger.info(f"Audit single-flight: shared lock in Redis at {url.split('@')[-1]}")
+        lock = RedisFlightLock(
+            url,
+            lock_ttl_seconds=float(os.getenv("SINGLE_FLIGHT_LOCK_TTL_SECONDS", "60")),
+            result_ttl_seconds=float(os.getenv("SINGLE_FLIGHT_RESULT_TTL_SECONDS", "600")),
+        )
+        return SingleFlight(lock, poll_seconds=poll_seconds)
+    if backend != "local":
+        logger.warning(f"Unknown SINGLE_FLIGHT_BACKEND '{backend}', falling back to local")
+    return SingleFlight(poll_seconds=poll_seconds)
@@ -0,0 +1,125 @@
+"""
+Per-stage concurrency limits for audits.
+
+With async nodes many audits run at once, but the stages they go through
+have very different capacities: yt-dlp extraction/download is CPU- and
+YouTube-bound, VI uploads are bandwidth-bound, VI polling is cheap, and the
+LLM has its own rate limits. One global "audits at once" knob either
+starves VI or floods the rest. Each stage therefore has its own semaphore:
+
+    download   yt-dlp extraction and temp-file downloads   STAGE_LIMIT_DOWNLOAD (4)
+    upload     media uploads to Video Indexer               STAGE_LIMIT_UPLOAD   (8)
+    poll       Video Indexer /Index status requests         STAGE_LIMIT_POLL     (16)
+    llm        audit LLM calls                              STAGE_LIMIT_LLM      (8)
+
+Waiting for Video Indexer to finish is not a stage slot: the shared poller
+(vi_polling.VIPoller) tracks every video being indexed in one loop, and
+each of its status requests takes a "poll" slot.
+
+Each stage is a queue (callers waiting for a slot) in front of a pool (the
+slots); stats() reports both depths plus recent queue and run latencies,
+which is where /stats gets its per-stage view.
+
+Usage:
+    async with stage("upload"):
+        ...
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+logger = logging.getLogger("stage-limits")
+
+DEFAULT_LIMITS = {"download": 4, "upload": 8, "poll": 16, "llm": 8}
+
+
+class LatencyWindow:
+    """The last `size` durations of something, summarised as count / p50 / p95 / max."""
+
+    def __init__(self, size: int = 500):
+        self.count = 0
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self._samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {"count": self.count, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": self.count,
+            "p50": round(ordered[len(ordered) // 2], 3),
+            "p95": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3),
+            "max": round(ordered[-1], 3),
+        }
+
+
+class StageLimiter:
+    """Named asyncio semaphores plus depth and latency counters for /stats."""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.active: Dict[str, int] = {name: 0 for name in self.limits}
+        self.waiting: Dict[str, int] = {name: 0 for name in self.limits}
+        self.queue_latency = {name: LatencyWindow() for name in self.limits}
+        self.run_latency = {name: LatencyWindow() for name in self.limits}
+
+    @classmethod
+    def from_env(cls) -> "StageLimiter":
+        return cls({
+            name: int(os.getenv(f"STAGE_LIMIT_{name.upper()}", str(default)))
+            for name, default in DEFAULT_LIMITS.items()
+        })
+
+    @asynccontextmanager
+    async def slot(self, stage: str) -> AsyncIterator[None]:
+        """Holds one of the stage's slots for the duration of the block."""
+        if stage not in self.limits:
+            raise ValueError(f"Unknown stage '{stage}'")
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            semaphore = self._semaphores[stage] = asyncio.Semaphore(max(1, self.limits[stage]))
+
+        queued_at = time.monotonic()
+        self.waiting[stage] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting[stage] -= 1
+        started_at = time.monotonic()
+        self.queue_latency[stage].add(started_at - queued_at)
+        self.active[stage] += 1
+        try:
+            yield
+        finally:
+            self.active[stage] -= 1
+            self.run_latency[stage].add(time.monotonic() - started_at)
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return {
+            name: {
+                "limit": self.limits[name],
+                "active": self.active[name],
+                "waiting": self.waiting[name],
+                "queue_seconds": self.queue_latency[name].summary(),
+                "run_seconds": self.run_latency[name].summary(),
+            }
+            for name in self.limits
+        }
+
+
+# Shared by every audit in the process (single and batch)
+stage_limiter = StageLimiter.from_env()
+
+
+def stage(name: str):
+    """Shorthand for stage_limiter.slot(name)."""
+    return stage_limiter.slot(name)
@@ -0,0 +1,351 @@
+"""
+Shared HTTP plumbing for Azure Video Indexer.
+
+Polling a single video used to cost two token round-trips (ARM token, then
+VI account token) plus a fresh TCP/TLS handshake on every iteration. This
+module provides, process-wide and thread-safe:
+
+- TokenCache: expiry-aware cache for the ARM and VI account tokens, shared by
+  every VideoIndexerService instance. A token is refreshed only when it is
+  within `refresh_margin` seconds of expiring.
+- get_http_session(): one pooled requests.Session with keep-alive and
+  retry/backoff on transient errors (429/5xx, honouring Retry-After).
+- get_async_http_client() / async_request() / async_stream(): the same for
+  the async service (one pooled httpx.AsyncClient, same retry rules).
+- client_stats(): counters for token refreshes and connection reuse, over
+  both the requests session and the httpx client.
+"""
+import json
+import time
+import random
+import asyncio
+import base64
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+import requests
+from azure.identity import DefaultAzureCredential
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("vi-http")
+
+# VI account tokens are valid for one hour; used when the JWT can't be read
+DEFAULT_TOKEN_LIFETIME = 3600
+
+
+class TokenCache:
+    """
+    Thread-safe cache of bearer tokens keyed by name.
+
+    `fetch` callables return (token, expires_at_epoch_seconds). Concurrent
+    callers asking for the same expired token wait for a single refresh
+    instead of all hitting the token endpoint.
+    """
+
+    def __init__(self, refresh_margin: float = 300):
+        self.refresh_margin = refresh_margin
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._async_key_locks: Dict[str, asyncio.Lock] = {}
+        self._lock = threading.Lock()
+        self.refreshes: Dict[str, int] = {}
+        self.hits = 0
+
+    def get(self, key: str, fetch: Callable[[], Tuple[str, float]]) -> str:
+        cached = self._valid(key)
+        if cached is not None:
+            self._count_hit()
+            return cached
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have refreshed while we waited for the lock
+            cached = self._valid(key)
+            if cached is not None:
+                self._count_hit()
+                return cached
+
+            token, expires_at = fetch()
+            with self._lock:
+                self._tokens[key] = (token, expires_at)
+                self.refreshes[key] = self.refreshes.get(key, 0) + 1
+            logger.info(f"Refreshed token '{key}' (valid for {int(expires_at - time.time())}s)")
+            return token
+
+    async def aget(self, key: str, fetch: Callable[[], Awaitable[Tuple[str, float]]]) -> str:
+        """
+        Async get(): `fetch` is a coroutine function. Shares the cached tokens
+        with get(), and concurrent coroutines wait for a single refresh.
+        """
+        cached = self._valid(key)
+        if cached is not None:
+            self._count_hit()
+            return cached
+
+        key_lock = self._async_key_locks.setdefault(key, asyncio.Lock())
+        async with key_lock:
+            cached = self._valid(key)
+            if cached is not None:
+                self._count_hit()
+                return cached
+
+            token, expires_at = await fetch()
+            with self._lock:
+                self._tokens[key] = (token, expires_at)
+                self.refreshes[key] = self.refreshes.get(key, 0) + 1
+            logger.info(f"Refreshed token '{key}' (valid for {int(expires_at - time.time())}s)")
+            return token
+
+    def invalidate(self, key: str) -> None:
+        """Drops a token, e.g. after the API rejected it with 401."""
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+
+    def _valid(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._tokens.get(key)
+        if entry and entry[1] - self.refresh_margin > time.time():
+            return entry[0]
+        return None
+
+    def _count_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+
+def jwt_expiry(token: str, default_lifetime: float = DEFAULT_TOKEN_LIFETIME) -> float:
+    """
+    Reads the `exp` claim of a JWT without verifying it. Falls back to
+    now + default_lifetime if the token is not a readable JWT.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + default_lifetime
+
+
+# Shared by every VideoIndexerService instance in the process
+token_cache = TokenCache()
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+_async_client: Optional[httpx.AsyncClient] = None
+_async_requests = 0
+_async_connections = 0
+
+_credential: Optional[DefaultAzureCredential] = None
+_credential_lock = threading.Lock()
+
+
+def get_default_credential() -> DefaultAzureCredential:
+    """Process-wide DefaultAzureCredential (building one probes several auth sources)."""
+    global _credential
+    if _credential is None:
+        with _credential_lock:
+            if _credential is None:
+                _credential = DefaultAzureCredential()
+    return _credential
+
+
+def _build_session(pool_maxsize: int = 32) -> requests.Session:
+    session = requests.Session()
+
+    # GETs and the token POST are idempotent and safe to retry. The upload
+    # POST streams a file body and must not be replayed automatically, so
+    # POST is only retried on the ARM adapter, which serves the token exchange.
+    read_retry = Retry(
+        total=4,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    token_retry = Retry(
+        total=4,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+    session.mount("https://management.azure.com/", HTTPAdapter(
+        pool_connections=4, pool_maxsize=pool_maxsize, max_retries=token_retry))
+    default_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=read_retry)
+    session.mount("https://", default_adapter)
+    session.mount("http://", default_adapter)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """Returns the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def close_http_session() -> None:
+    """Closes pooled connections. Called from the API shutdown hook."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# Same policy as the requests adapters above
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 4
+RETRY_BACKOFF = 0.5
+
+
+def get_async_http_client(max_connections: int = 100) -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled httpx.AsyncClient, creating it on first
+    use. Must be used from a single event loop (the API's).
+    """
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            transport=httpx.AsyncHTTPTransport(retries=2),  # connect errors only
+            event_hooks={"request": [_count_async_request]},
+        )
+    return _async_client
+
+
+async def _count_async_request(request: httpx.Request) -> None:
+    """Counts every request the async client sends, and (via httpcore's trace) the connections it opens."""
+    global _async_requests
+    _async_requests += 1
+    request.extensions["trace"] = _trace_async_connection
+
+
+async def _trace_async_connection(event_name: str, info: Dict) -> None:
+    global _async_connections
+    if event_name == "connection.connect_tcp.complete":
+        _async_connections += 1
+
+
+async def close_async_http_client() -> None:
+    """Closes the async client's pooled connections. Called from the API shutdown hook."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def async_request(method: str, url: str, retry: bool = True, **kwargs) -> httpx.Response:
+    """
+    Sends a request with the shared async client.
+
+    With retry=True, 429/5xx answers are retried with exponential backoff,
+    honouring Retry-After. Pass retry=False for requests whose body can't be
+    replayed (streamed uploads).
+    """
+    client = get_async_http_client()
+    attempt = 0
+    while True:
+        response = await client.request(method, url, **kwargs)
+        if not retry or response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+            return response
+        delay = _retry_after(response)
+        if delay is None:
+            delay = RETRY_BACKOFF * (2 ** attempt) * (1 + random.uniform(0, 0.1))
+        attempt += 1
+        logger.info(f"{method} {response.url.path} -> HTTP {response.status_code}, retry {attempt} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+@asynccontextmanager
+async def async_stream(method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """
+    async_request() for large bodies: yields the response with its body
+    unread (response.aiter_bytes()), closing it on exit. 429/5xx answers
+    are retried like async_request() before anything is yielded.
+    """
+    client = get_async_http_client()
+    attempt = 0
+    while True:
+        response = await client.send(client.build_request(method, url, **kwargs), stream=True)
+        if response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+            break
+        await response.aclose()
+        delay = _retry_after(response)
+        if delay is None:
+            delay = RETRY_BACKOFF * (2 ** attempt) * (1 + random.uniform(0, 0.1))
+        attempt += 1
+        logger.info(f"{method} {response.url.path} -> HTTP {response.status_code}, retry {attempt} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+    try:
+        yield response
+    finally:
+        await response.aclose()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return min(float(value), 60.0) if value is not None else None
+    except ValueError:
+        return None
+
+
+def client_stats() -> Dict[str, int]:
+    """
+    Token and connection counters.
+
+    http_connections_reused = requests that went over an already-open
+    keep-alive connection instead of a new TCP/TLS handshake, counted over
+    the requests session (sync service) and the httpx client (async
+    service, the one the API uses).
+    """
+    requests_sent = 0
+    connections_opened = 0
+
+    session = _session
+    if session is not None:
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+
+    refreshes = dict(token_cache.refreshes)
+    return {
+        "arm_token_refreshes": refreshes.get("arm", 0),
+        "vi_token_refreshes": sum(v for k, v in refreshes.items() if k.startswith("vi:")),
+        "token_cache_hits": token_cache.hits,
+        "http_requests": requests_sent + _async_requests,
+        "http_connections_opened": connections_opened + _async_connections,
+        "http_connections_reused": max(requests_sent - connections_opened, 0)
+                                   + max(_async_requests - _async_connections, 0),
+        "async_http_requests": _async_requests,
+        "async_http_connections_opened": _async_connections,
+    }
@@ -0,0 +1,377 @@
+"""
+Completion detection for Azure Video Indexer jobs.
+
+wait_for_processing used to sleep a flat 30 s between polls and had no
+deadline. Two mechanisms replace that:
+
+- PollingPolicy: adaptive polling that starts fast, backs off exponentially
+  with jitter, uses VI's `processingProgress` to estimate when the job will
+  finish, and gives up after a deadline.
+- CompletionNotifier: in-process registry of waiting videos. When VI is given
+  a callbackUrl (VI_CALLBACK_URL), it calls POST /vi-callback on completion;
+  the endpoint notifies the registry and the waiting audit wakes up at once
+  instead of sleeping out its poll interval. Polling stays on as a safety
+  net (e.g. when the callback lands on another replica).
+- VIPoller: for async audits, ONE loop tracks every video being indexed and
+  polls each one when its PollingPolicy interval is due, instead of one
+  sleeping waiter per audit. Waiting on VI is then a dict entry per video,
+  so it scales to as many videos as VI will index at once; only the status
+  requests themselves are limited (the "poll" stage).
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from backend.src.services.progress import report_progress
+from backend.src.services.stage_limits import stage, LatencyWindow
+from backend.src.services.instrumentation import measure
+
+logger = logging.getLogger("vi-polling")
+
+
+@dataclass
+class PollingPolicy:
+    """
+    initial_interval  first wait between polls (seconds)
+    max_interval      upper bound for the backoff (seconds)
+    multiplier        backoff growth factor per poll
+    jitter            +/- fraction of randomness, so concurrent audits don't poll in lockstep
+    timeout           overall deadline for one video (seconds); None = wait forever
+    """
+    initial_interval: float = 2.0
+    max_interval: float = 30.0
+    multiplier: float = 1.6
+    jitter: float = 0.2
+    timeout: Optional[float] = 1800.0
+
+    @classmethod
+    def from_env(cls) -> "PollingPolicy":
+        timeout = float(os.getenv("VI_POLL_TIMEOUT_SECONDS", "1800"))
+        return cls(
+            initial_interval=float(os.getenv("VI_POLL_INITIAL_SECONDS", "2")),
+            max_interval=float(os.getenv("VI_POLL_MAX_SECONDS", "30")),
+            multiplier=float(os.getenv("VI_POLL_MULTIPLIER", "1.6")),
+            jitter=float(os.getenv("VI_POLL_JITTER", "0.2")),
+            timeout=timeout if timeout > 0 else None,
+        )
+
+    def next_interval(self, attempt: int, elapsed: float, progress: Optional[float] = None) -> float:
+        """
+        Seconds to wait before poll number `attempt + 1`.
+
+        Exponential backoff, shortened when VI's progress suggests the job is
+        about to finish: at p% after `elapsed` seconds, roughly
+        elapsed * (100 - p) / p seconds remain.
+        """
+        interval = min(self.initial_interval * (self.multiplier ** attempt), self.max_interval)
+
+        if progress is not None and 0 < progress < 100 and elapsed > 0:
+            remaining = elapsed * (100 - progress) / progress
+            interval = min(interval, max(remaining, self.initial_interval))
+
+        if self.jitter:
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(interval, 0.1)
+
+    def remaining(self, elapsed: float) -> Optional[float]:
+        """Seconds left before the deadline, or None if there is no deadline."""
+        if self.timeout is None:
+            return None
+        return self.timeout - elapsed
+
+
+def parse_progress(vi_json: Dict[str, Any]) -> Optional[float]:
+    """Reads `processingProgress` ("45%") from an /Index response as a float."""
+    for video in vi_json.get("videos", []) or []:
+        value = video.get("processingProgress")
+        if value:
+            try:
+                return float(str(value).rstrip("%"))
+            except ValueError:
+                return None
+    return None
+
+
+class CompletionNotifier:
+    """
+    Maps Azure video IDs to events set by the VI callback endpoint.
+
+    A callback may arrive before the waiter registers (VI can be fast), so
+    notify() creates the event if needed; the registry is bounded so stray
+    callbacks can't grow it forever.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._events: "OrderedDict[str, threading.Event]" = OrderedDict()
+        self._listeners: List[Callable[[str, Optional[str]], None]] = []
+        self._states: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, video_id: str) -> threading.Event:
+        with self._lock:
+            return self._event(video_id)
+
+    def add_listener(self, listener: Callable[[str, Optional[str]], None]) -> None:
+        """Calls listener(video_id, state) on every callback (used by VIPoller)."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def notify(self, video_id: str, state: Optional[str] = None) -> None:
+        with self._lock:
+            if state:
+                self._states[video_id] = state
+            self._event(video_id).set()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(video_id, state)
+        logger.info(f"VI callback: video {video_id} is {state}")
+
+    def state(self, video_id: str) -> Optional[str]:
+        with self._lock:
+            return self._states.get(video_id)
+
+    def unregister(self, video_id: str) -> None:
+        with self._lock:
+            self._events.pop(video_id, None)
+            self._states.pop(video_id, None)
+
+    def _event(self, video_id: str) -> threading.Event:
+        event = self._events.get(video_id)
+        if event is None:
+            event = threading.Event()
+            self._events[video_id] = event
+            while len(self._events) > self.max_entries:
+                old_id, _ = self._events.popitem(last=False)
+                self._states.pop(old_id, None)
+        return event
+
+
+# Shared between the VI service (waiters) and the API callback endpoint
+completion_notifier = CompletionNotifier()
+
+
+class _TrackedVideo:
+    """A video the poller is waiting on, and the audits waiting for it."""
+
+    def __init__(self, video_id: str, service: Any, policy: PollingPolicy,
+                 future: "asyncio.Future[Dict[str, Any]]"):
+        self.video_id = video_id
+        self.service = service
+        self.policy = policy
+        self.future = future
+        # The first waiter's context: progress events reach its graph stream
+        self.context = contextvars.copy_context()
+        self.started_at = time.monotonic()
+        self.next_poll_at = self.started_at  # first poll right away
+        self.attempt = 0
+        self.waiters = 0
+        self.polling = False
+
+
+class VIPoller:
+    """
+    Waits on many Video Indexer videos from one loop.
+
+    wait() registers a video and awaits its future. The loop polls each
+    tracked video's state (service.get_video_state, one "poll" stage slot
+    per request) when its adaptive interval is due. Once the video is
+    Processed it fetches the transcript / OCR document once
+    (service.get_video_index) and resolves the future with it; it fails the
+    future on Failed / Quarantined / deadline. A VI callback moves the video's next poll to now.
+
+    Audits waiting on the same Azure video share one entry.
+    """
+
+    def __init__(self, notifier: CompletionNotifier = completion_notifier):
+        self._notifier = notifier
+        self._videos: Dict[str, _TrackedVideo] = {}
+        self._polls: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.polls = 0
+        self.wait_latency = LatencyWindow()
+        notifier.add_listener(self._on_callback)
+
+    async def wait(self, service: Any, video_id: str, policy: PollingPolicy) -> Dict[str, Any]:
+        """Returns the /Index document once the video is Processed; raises otherwise."""
+        self._ensure_running()
+        tracked = self._videos.get(video_id)
+        if tracked is None:
+            tracked = _TrackedVideo(video_id, service, policy, self._loop.create_future())
+            self._videos[video_id] = tracked
+            self._wake.set()
+
+        tracked.waiters += 1
+        try:
+            return await asyncio.shield(tracked.future)
+        finally:
+            tracked.waiters -= 1
+            if tracked.waiters == 0 and not tracked.future.done():
+                # Every audit waiting on it was cancelled: stop polling
+                self._videos.pop(video_id, None)
+                tracked.future.cancel()
+
+    async def close(self) -> None:
+        for task in [self._task, *self._polls]:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in [self._task, *self._polls] if t is not None), return_exceptions=True)
+        for tracked in self._videos.values():
+            tracked.future.cancel()
+        self._videos.clear()
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked_videos": len(self._videos),
+            "polls_in_flight": len(self._polls),
+            "polls": self.polls,
+            "wait_seconds": self.wait_latency.summary(),
+        }
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (scripts calling asyncio.run twice)
+            self._loop = loop
+            self._videos = {}
+            self._polls = set()
+            self._wake = asyncio.Event()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run(), name="vi-poller")
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            next_at = None
+            for tracked in list(self._videos.values()):
+                if tracked.polling:
+                    continue
+                if tracked.next_poll_at <= now:
+                    tracked.polling = True
+                    task = asyncio.create_task(self._poll(tracked), context=tracked.context.copy())
+                    self._polls.add(task)
+                    task.add_done_callback(self._polls.discard)
+                elif next_at is None or tracked.next_poll_at < next_at:
+                    next_at = tracked.next_poll_at
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), None if next_at is None else next_at - now)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, tracked: _TrackedVideo) -> None:
+        try:
+            async with stage("poll"):
+                with measure("vi_poll", azure_video_id=tracked.video_id, attempt=tracked.attempt) as step:
+                    data = await tracked.service.get_video_state(tracked.video_id)
+                    step.set(state=(data or {}).get("state"))
+            self.polls += 1
+            if self._check(tracked, data):
+                async with stage("poll"):
+                    with measure("vi_index_fetch", azure_video_id=tracked.video_id):
+                        data = await tracked.service.get_video_index(tracked.video_id)
+                if data is None:
+                    raise Exception(f"Video {tracked.video_id} not found in Azure Video Indexer.")
+                self._resolve(tracked, result=data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._resolve(tracked, error=e)
+        finally:
+            tracked.polling = False
+            self._wake.set()
+
+    def _check(self, tracked: _TrackedVideo, data: Optional[Dict[str, Any]]) -> bool:
+        """True once the video is Processed; schedules the next poll otherwise."""
+        video_id = tracked.video_id
+        if data is None:
+            raise Exception(f"Video {video_id} not found in Azure Video Indexer.")
+
+        state = data.get("state")
+        if state == "Processed":
+            report_progress("indexing_progress", state=state, percent=100)
+            return True
+        elif state == "Failed":
+            raise Exception("Video Indexing Failed in Azure.")
+        elif state == "Quarantined":
+            raise Exception("Video Quarantined (Copyright/Content Policy Violation).")
+
+        elapsed = time.monotonic() - tracked.started_at
+        progress = parse_progress(data)
+        report_progress("indexing_progress", state=state, percent=progress)
+        interval = tracked.policy.next_interval(tracked.attempt, elapsed, progress)
+
+        remaining = tracked.policy.remaining(elapsed)
+        if remaining is not None:
+            if remaining <= 0:
+                raise Exception(
+                    f"Timed out after {int(elapsed)}s waiting for video {video_id} (last state: {state})."
+                )
+            interval = min(interval, remaining)
+
+        logger.info(f"Video {video_id}: {state} ({progress if progress is not None else '?'}%)... "
+                    f"next poll in {interval:.1f}s")
+        tracked.attempt += 1
+        tracked.next_poll_at = time.monotonic() + interval
+        return False
+
+    def _resolve(self, tracked: _TrackedVideo, result: Optional[Dict[str, Any]] = None,
+                 error: Optional[Exception] = None) -> None:
+        if self._videos.get(tracked.video_id) is tracked:
+            del self._videos[tracked.video_id]
+        self._notifier.unregister(tracked.video_id)
+        self.wait_latency.add(time.monotonic() - tracked.started_at)
+        if tracked.future.done():
+            return
+        if error is not None:
+            tracked.future.set_exception(error)
+        else:
+            tracked.future.set_result(result)
+
+    def _on_callback(self, video_id: str, state: Optional[str]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._poll_now, video_id)
+        except RuntimeError:
+            pass  # loop is shutting down
+
+    def _poll_now(self, video_id: str) -> None:
+        tracked = self._videos.get(video_id)
+        if tracked is not None:
+            tracked.next_poll_at = 0.0
+            self._wake.set()
+
+
+# One poller for every async audit in the process
+vi_poller = VIPoller()
+
+
+def callback_url() -> Optional[str]:
+    """
+    Public URL VI should call on completion, or None if callback mode is off.
+
+    Built from VI_CALLBACK_URL (e.g. https://backend.example.com/vi-callback);
+    VI_CALLBACK_SECRET, if set, is appended as ?token= and checked by the endpoint.
+    """
+    base = os.getenv("VI_CALLBACK_URL")
+    if not base:
+        return None
+    secret = os.getenv("VI_CALLBACK_SECRET")
+    if secret:
+        separator = "&" if "?" in base else "?"
+        return f"{base}{separator}token={secret}"
+    return base
@@ -1,153 +1,539 @@
 import os
 import time
 import logging
-import requests
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
 import yt_dlp  
-from azure.identity import DefaultAzureCredential
+from backend.src.services.insights_store import InsightsStore, IndexedVideo, get_insights_store, file_sha256
+from backend.src.services.media_stream import build_multipart_stream
+from backend.src.services.vi_http import token_cache, jwt_expiry, get_http_session, get_default_credential
+from backend.src.services.vi_polling import PollingPolicy, parse_progress, completion_notifier, callback_url
+from backend.src.services.progress import report_progress, throttled_reporter
+from backend.src.services.media_info import get_media_info_cache, media_info_key
+from backend.src.services.segments import table_from_insights, texts, slim_insights
+from backend.src.services.insights_parser import parse_insights
 
 logger = logging.getLogger("video-indexer")
 
+# Overridable so the service can run against a local fake Video Indexer
+DEFAULT_VI_API_BASE = "https://api.videoindexer.ai"
+DEFAULT_ARM_BASE = "https://management.azure.com"
+
+COOKIE_PATH = '/app/cookies.txt'
+# Progressive (single-file) MP4, so there is one direct URL to stream from
+YOUTUBE_FORMAT = 'best[ext=mp4]/best'
+
+# How YouTube media gets to Video Indexer (VI_UPLOAD_MODE):
+#   stream - pipe the media URL straight into a chunked multipart upload (default)
+#   url    - hand VI the direct media URL and let it fetch the video itself
+#   file   - download to a unique temp file, then upload it (also the fallback)
+UPLOAD_MODES = ("stream", "url", "file")
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# /Index view for the one fetch after the video is Processed: only the
+# insights extract_data reads. The body is streamed through parse_insights(),
+# which keeps the state, duration and transcript / OCR items and skips the rest.
+INDEX_VIEW_PARAMS = {
+    "includedInsights": "Transcript,Ocr",
+    "includeSummarizedInsights": "false",
+    "includeStreamingUrls": "false",
+}
+# /Index view for status polls: the state and processingProgress, with one
+# small insight instead of the transcript / OCR (VI has no state-only view)
+INDEX_STATE_PARAMS = {
+    "includedInsights": "Statistics",
+    "includeSummarizedInsights": "false",
+    "includeStreamingUrls": "false",
+}
+
 class VideoIndexerService:
-    def __init__(self):
+    def __init__(self, credential=None, insights_store: Optional[InsightsStore] = None,
+                 api_base: Optional[str] = None, arm_base: Optional[str] = None):
         self.account_id = os.getenv("AZURE_VI_ACCOUNT_ID")
         self.location = os.getenv("AZURE_VI_LOCATION")
         self.subscription_id = os.getenv("AZURE_SUBSCRIPTION_ID")
         self.resource_group = os.getenv("AZURE_RESOURCE_GROUP")
         self.vi_name = os.getenv("AZURE_VI_NAME", "brand-yt-video-indexer")
-        self.credential = DefaultAzureCredential()
+        self.api_base = (api_base or os.getenv("AZURE_VI_API_BASE", DEFAULT_VI_API_BASE)).rstrip("/")
+        self.arm_base = (arm_base or os.getenv("AZURE_ARM_BASE", DEFAULT_ARM_BASE)).rstrip("/")
+        self.credential = credential or get_default_credential()
+        self.insights_store = insights_store if insights_store is not None else get_insights_store()
+        # Pooled keep-alive session shared by every instance in the process
+        self.session = get_http_session()
 
     def get_access_token(self):
-        """Generates an ARM Access Token."""
+        """Returns an ARM Access Token (cached until shortly before it expires)."""
+        return token_cache.get("arm", self._fetch_access_token)
+
+    def _fetch_access_token(self):
         try:
             token_object = self.credential.get_token("https://management.azure.com/.default")
-            return token_object.token
+            return token_object.token, float(token_object.expires_on)
         except Exception as e:
             logger.error(f"Failed to get Azure Token: {e}")
             raise
 
-    def get_account_token(self, arm_access_token):
-        """Exchanges ARM token for Video Indexer Account Token."""
-        url = (
-            f"https://management.azure.com/subscriptions/{self.subscription_id}"
+    def get_account_token(self, arm_access_token=None):
+        """Returns a Video Indexer Account Token (cached, exchanged from the ARM token on refresh)."""
+        return token_cache.get(
+            self._account_token_key,
+            lambda: self._fetch_account_token(arm_access_token or self.get_access_token())
+        )
+
+    @property
+    def _account_token_key(self):
+        return f"vi:{self.subscription_id}:{self.resource_group}:{self.vi_name}"
+
+    @property
+    def _account_token_url(self):
+        return (
+            f"{self.arm_base}/subscriptions/{self.subscription_id}"
             f"/resourceGroups/{self.resource_group}"
             f"/providers/Microsoft.VideoIndexer/accounts/{self.vi_name}"
             f"/generateAccessToken?api-version=2024-01-01"
         )
-        headers = {"Authorization": f"Bearer {arm_access_token}"}
-        payload = {"permissionType": "Contributor", "scope": "Account"}
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code !=200:
+
+    def _fetch_account_token(self, arm_access_token):
+        """Exchanges ARM token for Video Indexer Account Token."""
+        response = self.session.post(self._account_token_url, **self._account_token_request(arm_access_token))
+        return self._account_token_from_response(response)
+
+    # Request construction / response handling shared with AsyncVideoIndexerService
+    @staticmethod
+    def _account_token_request(arm_access_token) -> Dict[str, Any]:
+        return {
+            "headers": {"Authorization": f"Bearer {arm_access_token}"},
+            "json": {"permissionType": "Contributor", "scope": "Account"},
+        }
+
+    @staticmethod
+    def _account_token_from_response(response) -> Tuple[str, float]:
+        if response.status_code != 200:
             raise Exception(f"Failed to get VI Account Token: {response.text}")
-        return response.json().get("accessToken")
+        token = response.json().get("accessToken")
+        return token, jwt_expiry(token)
+
+    @staticmethod
+    def _uploaded_video_id(response) -> str:
+        """The Azure video ID from an upload response; raises if the upload failed."""
+        if response.status_code != 200:
+            raise Exception(f"Azure Upload Failed: {response.text}")
+        return response.json().get("id")
+
+    def _index_found(self, response) -> bool:
+        """
+        False for a 404 (video deleted from VI), True for a 200; raises
+        otherwise. A 401 drops the cached account token first. The body of
+        an error response must already be read.
+        """
+        if response.status_code == 401:
+            # Token revoked/expired early: drop it so the next call refreshes
+            token_cache.invalidate(self._account_token_key)
+        if response.status_code == 404:
+            return False
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch video index: {response.text}")
+        return True
+
+    @staticmethod
+    def _upload_mode(mode=None) -> str:
+        """VI_UPLOAD_MODE (or `mode`), "file" if unknown."""
+        mode = (mode or os.getenv("VI_UPLOAD_MODE", "stream")).lower()
+        if mode not in UPLOAD_MODES:
+            logger.warning(f"Unknown VI_UPLOAD_MODE '{mode}', using 'file'")
+            mode = "file"
+        return mode
     
+    def _ydl_opts(self, **extra):
+        """Base yt-dlp options, plus cookies.txt when it is available."""
+        ydl_opts = {'quiet': True, **extra}
+        if os.path.exists(COOKIE_PATH):
+            ydl_opts['cookiefile'] = COOKIE_PATH
+        return ydl_opts
+
+    def extract_info(self, url) -> Dict[str, Any]:
+        """
+        yt-dlp metadata for a video (duration, title, formats, the selected
+        direct media URL), from the media info cache when possible.
+        """
+        info = get_media_info_cache().get(media_info_key(url))
+        if info is None:
+            info = self._extract_and_cache(url)
+        return info
+
+    def _extract_and_cache(self, url) -> Dict[str, Any]:
+        # Same format selection as the download, so the cached entry serves both
+        ydl_opts = self._ydl_opts(skip_download=True, format=YOUTUBE_FORMAT)
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        get_media_info_cache().set(media_info_key(url), info)
+        return info
+
     def get_video_duration(self, url):
         """Extract video duration (in seconds) without downloading."""
-        cookie_path = '/app/cookies.txt'
-        ydl_opts = {
-            'quiet': True,
-            'skip_download': True,
-        }
-        if os.path.exists(cookie_path):
-            ydl_opts['cookiefile'] = cookie_path
+        return self.extract_info(url).get('duration', 0)
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            return info.get('duration', 0)
+    def resolve_media_url(self, url) -> Tuple[str, Dict[str, str]]:
+        """
+        Resolves a YouTube page URL to the direct media URL of a single
+        progressive MP4 stream, plus the HTTP headers yt-dlp says to send.
+        """
+        return self._media_url_from_info(self.extract_info(url))
+
+    @staticmethod
+    def _media_url_from_info(info) -> Tuple[str, Dict[str, str]]:
+        if info.get('requested_formats'):
+            # Separate audio/video streams need merging; can't stream one URL
+            raise Exception("Selected format needs merging; no single media URL to stream.")
+        media_url = info.get('url')
+        if not media_url:
+            raise Exception("yt-dlp returned no direct media URL.")
+        return media_url, info.get('http_headers') or {}
 
     def download_youtube_video(self, url, output_path = "temp_video.mp4"):
         """Download a youtube video to a local file."""
         logger.info(f"Downloading Youtube video: {url}")
+        report_progress("download_started", mode="file")
+        report_download = throttled_reporter("download_progress")
 
-        cookie_path = '/app/cookies.txt'
+        def progress_hook(status):
+            if status.get("status") == "downloading":
+                report_download(bytes=status.get("downloaded_bytes"),
+                                total=status.get("total_bytes") or status.get("total_bytes_estimate"))
 
-        ydl_opts = {
-            'format': 'best[ext=mp4]/best',
-            'outtmpl': output_path,
-            'quiet': True,
-            'overwrites': True,
-        }
+        ydl_opts = self._ydl_opts(format=YOUTUBE_FORMAT, outtmpl=output_path, overwrites=True,
+                                  progress_hooks=[progress_hook])
 
-        if os.path.exists(cookie_path):
-            ydl_opts['cookiefile'] = cookie_path
+        if 'cookiefile' in ydl_opts:
             logger.info("Using cookies.txt for YouTube download")
         else:
             logger.warning("cookies.txt not found, downloading without cookies")
+        cache = get_media_info_cache()
+        cached_info = cache.get(media_info_key(url))
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+                if cached_info is not None:
+                    try:
+                        # Reuse the earlier extraction instead of running it again
+                        ydl.process_ie_result(dict(cached_info), download=True)
+                    except yt_dlp.utils.DownloadError as e:
+                        logger.info(f"Cached media info is stale ({e}); extracting again")
+                        cache.invalidate(media_info_key(url))
+                        ydl.download([url])
+                else:
+                    ydl.download([url])
             logger.info("Download complete.")
+            report_progress("download_finished", bytes=os.path.getsize(output_path))
             return output_path
         except Exception as e:
             raise Exception(f"Youtube Download Failed: {str(e)}")
-        
-    # --- UPDATED FUNCTION: Upload Local File ---
-    def upload_video(self, video_path, video_name):
-        """Uploads a LOCAL FILE to Azure Video Indexer."""
-        arm_token = self.get_access_token()
-        vi_token = self.get_account_token(arm_token)
 
-        api_url = f"https://api.videoindexer.ai/{self.location}/Accounts/{self.account_id}/Videos"
-        
+    def upload_youtube_video(self, url, video_name, source_video_id=None, mode=None):
+        """
+        Gets a YouTube video into Video Indexer and returns the Azure video ID.
+
+        Tries VI_UPLOAD_MODE first (stream by default) and falls back to a
+        temp-file upload if that fails. The upload is recorded in the
+        insights store so later audits can reuse it.
+        """
+        mode = self._upload_mode(mode)
+        if mode != "file":
+            upload = self._upload_by_media_url if mode == "url" else self._upload_streamed
+            try:
+                azure_video_id, content_hash = upload(url, video_name)
+                self.remember_upload(azure_video_id, source_video_id, content_hash)
+                return azure_video_id
+            except Exception as e:
+                logger.warning(f"{mode} upload failed ({e}); falling back to temp-file upload")
+
+        return self._upload_via_temp_file(url, video_name, source_video_id)
+
+    def _upload_streamed(self, url, video_name):
+        """Pipes the media URL's bytes straight into the VI multipart upload."""
+        report_progress("download_started", mode="stream")
+        media_url, headers = self.resolve_media_url(url)
+        logger.info(f"Streaming {url} into Video Indexer...")
+
+        with self.session.get(media_url, headers=headers, stream=True, timeout=(10, 60)) as media:
+            if media.status_code != 200:
+                # Signed media URLs expire; don't let the fallback reuse this one
+                get_media_info_cache().invalidate(media_info_key(url))
+                raise Exception(f"Media fetch failed with HTTP {media.status_code}")
+            size = media.headers.get("Content-Length")
+            media_size = int(size) if size and size.isdigit() else None
+            # Download and upload are the same stream here, so one counter covers both
+            report_upload = throttled_reporter("upload_progress")
+            body = build_multipart_stream(
+                media.iter_content(chunk_size=STREAM_CHUNK_SIZE),
+                filename=f"{video_name}.mp4",
+                media_size=media_size,
+                on_progress=lambda sent: report_upload(bytes=sent, total=media_size),
+            )
+            response = self.session.post(
+                self._videos_url(), params=self._upload_params(video_name),
+                data=body, headers={"Content-Type": body.content_type}
+            )
+
+        return self._streamed_upload_finished(response, body)
+
+    def _streamed_upload_finished(self, response, body):
+        azure_video_id = self._uploaded_video_id(response)
+        logger.info(f"Streamed {body.bytes_sent / 1e6:.1f} MB to Azure")
+        report_progress("download_finished", bytes=body.bytes_sent)
+        report_progress("upload_finished", azure_video_id=azure_video_id, bytes=body.bytes_sent)
+        return azure_video_id, body.content_hash
+
+    def _upload_by_media_url(self, url, video_name):
+        """Lets Video Indexer pull the media from its direct URL (no bytes through us)."""
+        media_url, _ = self.resolve_media_url(url)
+        params = {**self._upload_params(video_name), "videoUrl": media_url}
+        logger.info(f"Asking Video Indexer to fetch {url} itself...")
+        report_progress("upload_started", mode="url")
+
+        response = self.session.post(self._videos_url(), params=params)
+        azure_video_id = self._uploaded_video_id(response)
+        report_progress("upload_finished", azure_video_id=azure_video_id)
+        # VI never hands the bytes back to us, so there is no content hash
+        return azure_video_id, None
+
+    def _upload_via_temp_file(self, url, video_name, source_video_id):
+        """Disk fallback: unique per-session temp file, always removed afterwards."""
+        local_path = self._temp_video_path(video_name)
+        try:
+            self.download_youtube_video(url, output_path=local_path)
+
+            content_hash = file_sha256(local_path)
+            azure_video_id = self._identical_upload(content_hash, source_video_id)
+            if azure_video_id is None:
+                azure_video_id = self.upload_video(local_path, video_name)
+                self.remember_upload(azure_video_id, source_video_id, content_hash)
+            return azure_video_id
+        finally:
+            if os.path.exists(local_path):
+                os.remove(local_path)
+
+    def _temp_video_path(self, video_name) -> str:
+        """A unique per-session temp file for the disk fallback; the caller removes it."""
+        fd, local_path = tempfile.mkstemp(prefix=f"audit_{video_name}_", suffix=".mp4")
+        os.close(fd)
+        return local_path
+
+    def _identical_upload(self, content_hash: str, source_video_id: Optional[str]) -> Optional[str]:
+        """The Azure video ID the same bytes were already indexed under (maybe from another URL), if any."""
+        existing = self.insights_store.lookup(content_hash=content_hash) if self.insights_store else None
+        if existing is None:
+            return None
+        logger.info(f"Identical video already indexed as {existing.azure_video_id}; skipping upload")
+        self.remember_upload(existing.azure_video_id, source_video_id, content_hash)
+        return existing.azure_video_id
+
+    def _videos_url(self):
+        return f"{self.api_base}/{self.location}/Accounts/{self.account_id}/Videos"
+
+    def _index_url(self, video_id):
+        return f"{self._videos_url()}/{video_id}/Index"
+
+    def _upload_params(self, video_name, access_token=None):
         params = {
-            "accessToken": vi_token,
+            "accessToken": access_token or self.get_account_token(),
             "name": video_name,
             "privacy": "Private",
             "indexingPreset": "Default",
-            # We removed "videoUrl" because we are sending a file payload instead
         }
+        notify_url = callback_url()
+        if notify_url:
+            # VI calls this URL (adding ?id=&state=) when indexing finishes
+            params["callbackUrl"] = notify_url
+        return params
+
+    # --- UPDATED FUNCTION: Upload Local File ---
+    def upload_video(self, video_path, video_name):
+        """Uploads a LOCAL FILE to Azure Video Indexer."""
+        params = self._upload_params(video_name)
         logger.info(f"Uploading file {video_path} to Azure...")
+        size = os.path.getsize(video_path)
+        report_progress("upload_started", mode="file", total=size)
 
         # Open the file in binary mode and stream it on Azure
         with open(video_path, 'rb') as video_file:
             files = {'file': video_file}
-            response = requests.post(api_url, params=params, files=files)
+            response = self.session.post(self._videos_url(), params=params, files=files)
 
-        if response.status_code != 200:
-            raise Exception(f"Azure Upload Failed: {response.text}")
-        
-        return response.json().get("id")
+        azure_video_id = self._uploaded_video_id(response)
+        report_progress("upload_finished", azure_video_id=azure_video_id, bytes=size)
+        return azure_video_id
     
-    def wait_for_processing(self, video_id):
-        """Polls status until complete."""
+    def get_video_index(self, video_id, view: Optional[Dict[str, str]] = None):
+        """
+        Fetches the current /Index document for a video, slimmed to state,
+        progress, duration and transcript / OCR (see INDEX_VIEW_PARAMS).
+        """
+        vi_token = self.get_account_token()
+
+        params = {"accessToken": vi_token, **(view or INDEX_VIEW_PARAMS)}
+        with self.session.get(self._index_url(video_id), params=params, stream=True) as response:
+            if not self._index_found(response):
+                return None
+            response.raw.decode_content = True
+            return parse_insights(response.raw)
+
+    def get_video_state(self, video_id):
+        """The /Index document without transcript / OCR: enough to poll state and progress."""
+        return self.get_video_index(video_id, view=INDEX_STATE_PARAMS)
+
+    def wait_for_processing(self, video_id, policy: Optional[PollingPolicy] = None):
+        """
+        Polls status until complete.
+
+        Polls adaptively (fast at first, exponential backoff with jitter,
+        shortened as VI's processingProgress approaches 100%) and raises once
+        the policy's deadline passes. In callback mode a VI callback wakes the
+        wait immediately instead of sleeping out the interval.
+        """
+        policy = policy or PollingPolicy.from_env()
         logger.info(f"Waiting for video {video_id} to process...")
-        while True:
-            arm_token = self.get_access_token()
-            vi_token = self.get_account_token(arm_token)
-
-            url = f"https://api.videoindexer.ai/{self.location}/Accounts/{self.account_id}/Videos/{video_id}/Index"
-            params = {"accessToken": vi_token}
-            response = requests.get(url, params=params)
-            data = response.json()
-            logger.info(f"Response type: {type(data)}, Response: {str(data)[:500]}")
-
-            state = data.get("state")
-            if state == "Processed":
-                return data
-            elif state == "Failed":
-                return Exception("Video Indexing Failed in Azure.")
-            elif state == "Quarantined":
-                raise Exception("Video Quarantined (Copyright/Content Policy Violation).")
-            
-            logger.info(f"Status: {state}... waiting 30s")
-            time.sleep(30)
+
+        completed = completion_notifier.register(video_id)
+        start = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                data = self.get_video_state(video_id)
+                if data is None:
+                    raise Exception(f"Video {video_id} not found in Azure Video Indexer.")
+
+                state = data.get("state")
+                if state == "Processed":
+                    report_progress("indexing_progress", state=state, percent=100)
+                    # Transcript / OCR are fetched once, now that they are final
+                    data = self.get_video_index(video_id)
+                    if data is None:
+                        raise Exception(f"Video {video_id} not found in Azure Video Indexer.")
+                    self.remember_insights(video_id, data)
+                    return data
+                elif state == "Failed":
+                    raise Exception("Video Indexing Failed in Azure.")
+                elif state == "Quarantined":
+                    raise Exception("Video Quarantined (Copyright/Content Policy Violation).")
+
+                elapsed = time.monotonic() - start
+                progress = parse_progress(data)
+                report_progress("indexing_progress", state=state, percent=progress)
+                interval = policy.next_interval(attempt, elapsed, progress)
+
+                remaining = policy.remaining(elapsed)
+                if remaining is not None:
+                    if remaining <= 0:
+                        raise Exception(
+                            f"Timed out after {int(elapsed)}s waiting for video {video_id} (last state: {state})."
+                        )
+                    interval = min(interval, remaining)
+
+                logger.info(f"Status: {state} ({progress if progress is not None else '?'}%)... next poll in {interval:.1f}s")
+                # Returns early if the VI callback for this video arrives
+                completed.wait(interval)
+                completed.clear()
+                attempt += 1
+        finally:
+            completion_notifier.unregister(video_id)
+
+    # --- Reuse of previously indexed videos ---
+    def find_existing_insights(self, source_video_id: Optional[str] = None,
+                               content_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns insights for a video that was already indexed, or None.
+
+        Looks the video up by content hash (if given) or source video ID, then
+        serves the locally persisted insights JSON, falling back to fetching
+        /Index for the existing Azure video. Nothing is uploaded here.
+        """
+        record = self._indexed_record(source_video_id, content_hash)
+        if record is None:
+            return None
+
+        insights = self.insights_store.load_insights(record.azure_video_id)
+        if insights is not None:
+            return self._reused_local(record, insights)
+
+        try:
+            data = self.get_video_index(record.azure_video_id)
+        except Exception as e:
+            logger.warning(f"Could not fetch index for known video {record.azure_video_id}: {e}")
+            return None
+
+        action = self._reuse_action(record, data)
+        if action == "reuse":
+            self.remember_insights(record.azure_video_id, data)
+            return data
+        if action == "wait":
+            return self.wait_for_processing(record.azure_video_id)
+        return None
+
+    def _indexed_record(self, source_video_id: Optional[str], content_hash: Optional[str]) -> Optional[IndexedVideo]:
+        if self.insights_store is None:
+            return None
+        return self.insights_store.lookup(source_video_id=source_video_id, content_hash=content_hash)
+
+    @staticmethod
+    def _reused_local(record: IndexedVideo, insights: Dict[str, Any]) -> Dict[str, Any]:
+        logger.info(f"Reusing local insights for Azure video {record.azure_video_id}")
+        report_progress("insights_reused", azure_video_id=record.azure_video_id, source="local")
+        return insights
+
+    def _reuse_action(self, record: IndexedVideo, data: Optional[Dict[str, Any]]) -> str:
+        """
+        What to do with a known video's /Index document: "reuse" it
+        (Processed), "wait" for it (still indexing) or "upload" again
+        (deleted, Failed, Quarantined; the record is forgotten).
+        """
+        state = (data or {}).get("state")
+        if state == "Processed":
+            logger.info(f"Reusing Azure video {record.azure_video_id} (no re-upload)")
+            report_progress("insights_reused", azure_video_id=record.azure_video_id, source="azure")
+            return "reuse"
+        if state in ("Uploaded", "Processing"):
+            logger.info(f"Azure video {record.azure_video_id} is still indexing; waiting on it")
+            return "wait"
+        # Deleted from Video Indexer since we recorded it, or not reusable
+        self.insights_store.forget(record.azure_video_id)
+        return "upload"
+
+    def remember_upload(self, azure_video_id: str, source_video_id: Optional[str],
+                        content_hash: Optional[str]) -> None:
+        """Records which source video an Azure video ID belongs to."""
+        if self.insights_store is not None:
+            self.insights_store.record(azure_video_id, source_video_id, content_hash)
+
+    def remember_insights(self, azure_video_id: str, insights: Dict[str, Any]) -> None:
+        """Keeps a local copy of processed insights (only what extract_data reads) for future audits."""
+        if self.insights_store is None:
+            return
+        try:
+            self.insights_store.save_insights(azure_video_id, slim_insights(insights))
+        except OSError as e:
+            logger.warning(f"Failed to persist insights for {azure_video_id}: {e}")
 
     def extract_data(self, vi_json):
-        """Parses the JSON into our State format."""
-        transcript_lines = []
+        """
+        Parses the JSON into our State format: columnar transcript / OCR
+        segment tables (text, start, end, confidence; OCR frames merged),
+        plus the flat transcript string and OCR lines derived from them.
+        """
+        transcript_items, ocr_items = [], []
         for v in vi_json.get("videos", []):
             insights = v.get("insights", {})
-            for item in insights.get("transcript", []):
-                transcript_lines.append(item.get("text"))
+            transcript_items.extend(insights.get("transcript", []))
+            ocr_items.extend(insights.get("ocr", []))
 
-        ocr_lines = []
-        for v in vi_json.get("videos", []):
-            insights = v.get("insights", {})
-            for item in insights.get("ocr", []):
-                ocr_lines.append(item.get("text"))
+        transcript_segments = table_from_insights(transcript_items)
+        ocr_segments = table_from_insights(ocr_items, merge_frames=True)
 
         return {
-            "transcript": " ".join(transcript_lines),
-            "ocr_text": ocr_lines,
+            "transcript": " ".join(texts(transcript_segments)),
+            "ocr_text": list(dict.fromkeys(texts(ocr_segments))),
+            "transcript_segments": transcript_segments,
+            "ocr_segments": ocr_segments,
             "video_metadata": {
                 "duration": vi_json.get("summarizedInsights", {}).get("duration", {}).get("seconds"),
                 "platform": "youtube"
@@ -0,0 +1,287 @@
+"""
+Async Azure Video Indexer client.
+
+VideoIndexerService blocks a thread for a whole audit: requests calls,
+sleeping between polls, yt-dlp. With async graph nodes run through
+ainvoke/astream, one event loop can instead keep dozens of audits in flight
+while they wait on Video Indexer:
+
+- HTTP goes through the shared httpx.AsyncClient (vi_http.async_request),
+  with the same token cache as the sync service.
+- Waiting for indexing is handed to the shared VI poller, which tracks
+  every audit's video in one loop and is woken early by the VI callback.
+- yt-dlp and other blocking work (credential calls, hashing, file reads)
+  run on a small bounded thread pool (YTDLP_MAX_WORKERS), so they neither
+  stall the loop nor spawn a thread per audit.
+- Downloads, uploads and status polls each take a slot of their stage's
+  concurrency limit (services/stage_limits.py).
+
+yt-dlp option handling, extract_data and the insights store bookkeeping are
+inherited from VideoIndexerService; every method that does I/O is overridden
+with a coroutine of the same name. Request construction, response checks
+and the reuse / fallback decisions are VideoIndexerService helpers both
+clients call, so only the I/O itself differs.
+"""
+import os
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from backend.src.services.video_indexer import (
+    VideoIndexerService, STREAM_CHUNK_SIZE, INDEX_VIEW_PARAMS, INDEX_STATE_PARAMS,
+)
+from backend.src.services.insights_store import file_sha256
+from backend.src.services.media_stream import build_multipart_stream
+from backend.src.services.vi_http import token_cache, async_request, async_stream, get_async_http_client
+from backend.src.services.insights_parser import aparse_insights
+from backend.src.services.vi_polling import PollingPolicy, vi_poller
+from backend.src.services.progress import report_progress, throttled_reporter
+from backend.src.services.media_info import get_media_info_cache, media_info_key
+from backend.src.services.stage_limits import stage
+from backend.src.services.instrumentation import measure
+
+logger = logging.getLogger("video-indexer-async")
+
+YTDLP_MAX_WORKERS = int(os.getenv("YTDLP_MAX_WORKERS", "4"))
+_blocking_executor = ThreadPoolExecutor(max_workers=YTDLP_MAX_WORKERS, thread_name_prefix="vi-blocking")
+
+# yt-dlp extractions in flight, by media info key: concurrent callers for
+# the same video (/check-duration + the audit) share one extraction
+_pending_extractions: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Runs a blocking call on the bounded executor. The caller's contextvars
+    are carried over, so report_progress() still reaches the graph stream.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_blocking_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+class AsyncVideoIndexerService(VideoIndexerService):
+    """VideoIndexerService with non-blocking I/O; await every public method."""
+
+    # --- Auth ---
+    async def get_access_token(self):
+        """Returns an ARM Access Token (cached; the credential call runs off-loop)."""
+        async def fetch():
+            with measure("vi_token", kind="arm"):
+                return await run_blocking(self._fetch_access_token)
+        return await token_cache.aget("arm", fetch)
+
+    async def get_account_token(self, arm_access_token=None):
+        """Returns a Video Indexer Account Token (cached, exchanged from the ARM token on refresh)."""
+        async def fetch():
+            arm_token = arm_access_token or await self.get_access_token()
+            with measure("vi_token", kind="account"):
+                return await self._fetch_account_token(arm_token)
+        return await token_cache.aget(self._account_token_key, fetch)
+
+    async def _fetch_account_token(self, arm_access_token):
+        response = await async_request("POST", self._account_token_url, **self._account_token_request(arm_access_token))
+        return self._account_token_from_response(response)
+
+    # --- yt-dlp (blocking, offloaded) ---
+    async def extract_info(self, url) -> Dict[str, Any]:
+        """Cached yt-dlp metadata; a cache miss extracts on the bounded executor."""
+        key = media_info_key(url)
+        info = get_media_info_cache().get(key)
+        if info is not None:
+            return info
+
+        pending = _pending_extractions.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._extract_limited(url))
+            _pending_extractions[key] = pending
+            pending.add_done_callback(lambda _: _pending_extractions.pop(key, None))
+        # shield: one caller giving up must not cancel the others' extraction
+        return await asyncio.shield(pending)
+
+    async def _extract_limited(self, url):
+        async with stage("download"):
+            with measure("ytdlp_extract"):
+                return await run_blocking(self._extract_and_cache, url)
+
+    async def get_video_duration(self, url):
+        return (await self.extract_info(url)).get('duration', 0)
+
+    async def resolve_media_url(self, url) -> Tuple[str, Dict[str, str]]:
+        return self._media_url_from_info(await self.extract_info(url))
+
+    async def download_youtube_video(self, url, output_path="temp_video.mp4"):
+        async with stage("download"):
+            with measure("download") as step:
+                path = await run_blocking(super().download_youtube_video, url, output_path)
+                step.add(bytes=os.path.getsize(path))
+                return path
+
+    # --- Upload ---
+    async def upload_youtube_video(self, url, video_name, source_video_id=None, mode=None):
+        """Async upload_youtube_video(): same modes and temp-file fallback."""
+        mode = self._upload_mode(mode)
+        if mode != "file":
+            upload = self._upload_by_media_url if mode == "url" else self._upload_streamed
+            try:
+                azure_video_id, content_hash = await upload(url, video_name)
+                self.remember_upload(azure_video_id, source_video_id, content_hash)
+                return azure_video_id
+            except Exception as e:
+                logger.warning(f"{mode} upload failed ({e}); falling back to temp-file upload")
+
+        return await self._upload_via_temp_file(url, video_name, source_video_id)
+
+    async def _upload_streamed(self, url, video_name):
+        """Pipes the media URL's bytes straight into the VI multipart upload."""
+        report_progress("download_started", mode="stream")
+        media_url, headers = await self.resolve_media_url(url)
+        logger.info(f"Streaming {url} into Video Indexer...")
+
+        # Download and upload are one stream here, so they share the upload slot
+        async with stage("upload"), get_async_http_client().stream("GET", media_url, headers=headers) as media:
+            with measure("upload", mode="stream") as step:
+                if media.status_code != 200:
+                    # Signed media URLs expire; don't let the fallback reuse this one
+                    get_media_info_cache().invalidate(media_info_key(url))
+                    raise Exception(f"Media fetch failed with HTTP {media.status_code}")
+                size = media.headers.get("Content-Length")
+                media_size = int(size) if size and size.isdigit() else None
+                report_upload = throttled_reporter("upload_progress")
+                body = build_multipart_stream(
+                    media.aiter_bytes(STREAM_CHUNK_SIZE),
+                    filename=f"{video_name}.mp4",
+                    media_size=media_size,
+                    on_progress=lambda sent: report_upload(bytes=sent, total=media_size),
+                )
+                response = await self._post_multipart(body, await self._upload_params(video_name))
+                step.add(bytes=body.bytes_sent)
+
+        return self._streamed_upload_finished(response, body)
+
+    async def _upload_by_media_url(self, url, video_name):
+        """Lets Video Indexer pull the media from its direct URL (no bytes through us)."""
+        media_url, _ = await self.resolve_media_url(url)
+        params = {**await self._upload_params(video_name), "videoUrl": media_url}
+        logger.info(f"Asking Video Indexer to fetch {url} itself...")
+        report_progress("upload_started", mode="url")
+
+        async with stage("upload"):
+            with measure("upload", mode="url"):
+                response = await async_request("POST", self._videos_url(), retry=False, params=params)
+        azure_video_id = self._uploaded_video_id(response)
+        report_progress("upload_finished", azure_video_id=azure_video_id)
+        return azure_video_id, None
+
+    async def _upload_via_temp_file(self, url, video_name, source_video_id):
+        """Disk fallback: unique per-session temp file, always removed afterwards."""
+        local_path = self._temp_video_path(video_name)
+        try:
+            await self.download_youtube_video(url, output_path=local_path)
+
+            content_hash = await run_blocking(file_sha256, local_path)
+            azure_video_id = self._identical_upload(content_hash, source_video_id)
+            if azure_video_id is None:
+                azure_video_id = await self.upload_video(local_path, video_name)
+                self.remember_upload(azure_video_id, source_video_id, content_hash)
+            return azure_video_id
+        finally:
+            if os.path.exists(local_path):
+                os.remove(local_path)
+
+    async def _upload_params(self, video_name, access_token=None):
+        return super()._upload_params(video_name, access_token=access_token or await self.get_account_token())
+
+    async def upload_video(self, video_path, video_name):
+        """Uploads a LOCAL FILE to Azure Video Indexer, read in chunks off-loop."""
+        logger.info(f"Uploading file {video_path} to Azure...")
+        size = os.path.getsize(video_path)
+        report_progress("upload_started", mode="file", total=size)
+
+        body = build_multipart_stream(_read_chunks(video_path), filename=f"{video_name}.mp4", media_size=size)
+        params = await self._upload_params(video_name)
+        async with stage("upload"):
+            with measure("upload", mode="file") as step:
+                response = await self._post_multipart(body, params)
+                step.add(bytes=size)
+
+        azure_video_id = self._uploaded_video_id(response)
+        report_progress("upload_finished", azure_video_id=azure_video_id, bytes=size)
+        return azure_video_id
+
+    async def _post_multipart(self, body, params):
+        headers = {"Content-Type": body.content_type}
+        if hasattr(body, "__len__"):
+            headers["Content-Length"] = str(len(body))
+        # aiter(): httpx must see an async-only iterable to stream it on an AsyncClient.
+        # Not retried: the body is consumed as it is sent.
+        return await async_request("POST", self._videos_url(), retry=False,
+                                   params=params, content=aiter(body), headers=headers)
+
+    # --- Indexing ---
+    async def get_video_index(self, video_id, view: Optional[Dict[str, str]] = None):
+        """Async get_video_index(): the slimmed /Index document, parsed as it streams in."""
+        params = {"accessToken": await self.get_account_token(), **(view or INDEX_VIEW_PARAMS)}
+        async with async_stream("GET", self._index_url(video_id), params=params) as response:
+            if response.status_code != 200:
+                await response.aread()  # the error message is the body
+            if not self._index_found(response):
+                return None
+            with measure("vi_index_parse"):
+                return await aparse_insights(response.aiter_bytes())
+
+    async def get_video_state(self, video_id):
+        """Async get_video_state(): /Index without transcript / OCR, for polling."""
+        return await self.get_video_index(video_id, view=INDEX_STATE_PARAMS)
+
+    async def wait_for_processing(self, video_id, policy: Optional[PollingPolicy] = None):
+        """
+        Async wait_for_processing(): same adaptive polling and deadline, but
+        the video is handed to the shared poller (vi_polling.VIPoller), which
+        waits on every audit's video from one loop, woken early by the VI
+        callback.
+        """
+        policy = policy or PollingPolicy.from_env()
+        logger.info(f"Waiting for video {video_id} to process...")
+        with measure("vi_wait", azure_video_id=video_id):
+            data = await vi_poller.wait(self, video_id, policy)
+        await run_blocking(self.remember_insights, video_id, data)
+        return data
+
+    async def find_existing_insights(self, source_video_id: Optional[str] = None,
+                                     content_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Async find_existing_insights(): local insights, else the existing Azure video."""
+        record = self._indexed_record(source_video_id, content_hash)
+        if record is None:
+            return None
+
+        insights = await run_blocking(self.insights_store.load_insights, record.azure_video_id)
+        if insights is not None:
+            return self._reused_local(record, insights)
+
+        try:
+            data = await self.get_video_index(record.azure_video_id)
+        except Exception as e:
+            logger.warning(f"Could not fetch index for known video {record.azure_video_id}: {e}")
+            return None
+
+        action = self._reuse_action(record, data)
+        if action == "reuse":
+            await run_blocking(self.remember_insights, record.azure_video_id, data)
+            return data
+        if action == "wait":
+            return await self.wait_for_processing(record.azure_video_id)
+        return None
+
+
+async def _read_chunks(path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Reads a file in chunks on the blocking executor."""
+    with open(path, "rb") as f:
+        while True:
+            chunk = await run_blocking(f.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,62 @@
+"""
+Helpers for working with YouTube URLs.
+
+The same video can be shared as youtu.be/<id>, youtube.com/watch?v=<id>,
+/shorts/<id>, /embed/<id>, with tracking params (si=, t=, list=) and so on.
+Anything that caches or deduplicates by video must key on the canonical
+11-character video ID, never on the raw URL.
+"""
+import re
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+# YouTube video IDs are exactly 11 chars from this alphabet
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+_YOUTUBE_HOSTS = {
+    "youtube.com",
+    "m.youtube.com",
+    "music.youtube.com",
+    "youtube-nocookie.com",
+}
+
+# Path prefixes that are followed by the video ID, e.g. /shorts/<id>
+_PATH_PREFIXES = ("shorts", "embed", "live", "v", "e")
+
+
+def parse_video_id(url: str) -> Optional[str]:
+    """
+    Returns the canonical YouTube video ID for any supported URL form,
+    or None if the URL is not a recognisable YouTube video link.
+
+    Examples:
+        https://youtu.be/dT7S75eYhcQ?si=abc           -> dT7S75eYhcQ
+        https://www.youtube.com/watch?v=dT7S75eYhcQ&t=3 -> dT7S75eYhcQ
+        https://youtube.com/shorts/dT7S75eYhcQ         -> dT7S75eYhcQ
+    """
+    if not url:
+        return None
+
+    url = url.strip()
+    if "://" not in url:
+        url = f"https://{url}"
+
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    candidate = None
+    segments = [s for s in parsed.path.split("/") if s]
+
+    if host == "youtu.be":
+        candidate = segments[0] if segments else None
+    elif host in _YOUTUBE_HOSTS:
+        if segments and segments[0] == "watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        elif len(segments) >= 2 and segments[0] in _PATH_PREFIXES:
+            candidate = segments[1]
+
+    if candidate and _VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
@@ -7,7 +7,7 @@ import LoadingState from './components/LoadingState';
 import ResultsDashboard from './components/ResultsDashboard';
 
 function App() {
-  const { phase, results, error, startTime, submitAudit, reset } = useAudit();
+  const { phase, results, error, startTime, progressStep, submitAudit, reset } = useAudit();
 
   return (
     <div className="min-h-screen bg-[#0a0e1a] bg-dot-grid text-slate-100 flex flex-col">
@@ -23,7 +23,7 @@ function App() {
           </div>
         )}
 
-        {phase === 'loading' && <LoadingState startTime={startTime} />}
+        {phase === 'loading' && <LoadingState startTime={startTime} progressStep={progressStep} />}
 
         {phase === 'success' && (
           <ResultsDashboard results={results} onReset={reset} />
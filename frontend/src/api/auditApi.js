@@ -1,18 +1,123 @@
 const API_BASE = '/api';
 
-export async function submitAudit(videoUrl) {
+const POLL_INTERVAL_MS = 3000;
+
+const PROGRESS_EVENTS = [
+  'status',
+  'joined',
+  'download_started',
+  'download_progress',
+  'download_finished',
+  'upload_started',
+  'upload_progress',
+  'upload_finished',
+  'insights_reused',
+  'indexing_progress',
+  'retrieval_finished',
+  'precheck_finished',
+  'audit_skipped',
+  'prompt_built',
+  'llm_started',
+  'llm_token',
+  'llm_repair',
+  'node_finished',
+];
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export async function getAuditJob(jobId) {
+  const response = await fetch(`${API_BASE}/audit/${jobId}`);
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.detail || `Audit status check failed with status ${response.status}`);
+  }
+
+  return response.json();
+}
+
+export async function submitAudit(videoUrl, onProgress) {
   const response = await fetch(`${API_BASE}/audit`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ video_url: videoUrl }),
   });
 
+  if (response.status === 429) {
+    throw new Error('The audit queue is full. Please try again in a few minutes.');
+  }
+
   if (!response.ok) {
     const errorData = await response.json().catch(() => ({}));
     throw new Error(errorData.detail || `Audit failed with status ${response.status}`);
   }
 
-  return response.json();
+  const { job_id: jobId } = await response.json();
+
+  // The audit runs in the background; follow its progress stream, or poll
+  // if the browser/proxy can't do Server-Sent Events
+  if (typeof EventSource !== 'undefined') {
+    try {
+      return await followAuditEvents(jobId, onProgress);
+    } catch (err) {
+      if (!err.streamUnavailable) {
+        throw err;
+      }
+    }
+  }
+  return pollAuditJob(jobId);
+}
+
+// Resolves with the audit result from GET /audit/{jobId}/events.
+// onProgress receives every other event as (eventName, data).
+export function followAuditEvents(jobId, onProgress) {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_BASE}/audit/${jobId}/events`);
+    let received = false;
+
+    const listen = (name, handler) => {
+      source.addEventListener(name, (event) => {
+        received = true;
+        handler(JSON.parse(event.data));
+      });
+    };
+
+    listen('result', (data) => {
+      source.close();
+      resolve(data.result);
+    });
+    listen('failed', (data) => {
+      source.close();
+      reject(new Error(data.error || 'Audit failed'));
+    });
+    PROGRESS_EVENTS.forEach((name) => listen(name, (data) => onProgress?.(name, data)));
+
+    source.onerror = () => {
+      // Before any event, or once the browser gives up reconnecting: fall
+      // back to polling. Otherwise EventSource reconnects by itself and
+      // resumes from Last-Event-ID.
+      if (!received || source.readyState === EventSource.CLOSED) {
+        source.close();
+        const err = new Error('Progress stream unavailable');
+        err.streamUnavailable = true;
+        reject(err);
+      }
+    };
+  });
+}
+
+async function pollAuditJob(jobId) {
+  for (;;) {
+    await sleep(POLL_INTERVAL_MS);
+    const job = await getAuditJob(jobId);
+
+    if (job.status === 'COMPLETED') {
+      return job.result;
+    }
+    if (job.status === 'FAILED') {
+      throw new Error(job.error || 'Audit failed');
+    }
+  }
 }
 
 export async function checkDuration(videoUrl) {
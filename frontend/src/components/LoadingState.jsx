@@ -19,10 +19,15 @@ function formatElapsed(ms) {
     : `${seconds}s`;
 }
 
-export default function LoadingState({ startTime }) {
+export default function LoadingState({ startTime, progressStep = 0 }) {
   const [currentStep, setCurrentStep] = useState(0);
   const [elapsed, setElapsed] = useState(0);
 
+  // Jump ahead when the backend reports a later step
+  useEffect(() => {
+    setCurrentStep((prev) => Math.max(prev, progressStep));
+  }, [progressStep]);
+
   // Advance through simulated steps
   useEffect(() => {
     if (currentStep >= LOADING_STEPS.length - 1) return;
@@ -1,16 +1,26 @@
 import { useState } from 'react';
 import { checkDuration, submitAudit as submitAuditApi } from '../api/auditApi';
+import { PROGRESS_EVENT_STEPS } from '../utils/constants';
 
 export function useAudit() {
   const [phase, setPhase] = useState('idle');
   const [results, setResults] = useState(null);
   const [error, setError] = useState(null);
   const [startTime, setStartTime] = useState(null);
+  const [progressStep, setProgressStep] = useState(0);
+
+  const handleProgress = (eventName) => {
+    const step = PROGRESS_EVENT_STEPS[eventName];
+    if (step !== undefined) {
+      setProgressStep((prev) => Math.max(prev, step));
+    }
+  };
 
   const submitAudit = async (videoUrl) => {
     setPhase('checking');
     setError(null);
     setResults(null);
+    setProgressStep(0);
 
     try {
       const durationData = await checkDuration(videoUrl);
@@ -28,7 +38,7 @@ export function useAudit() {
       setPhase('loading');
       setStartTime(Date.now());
 
-      const data = await submitAuditApi(videoUrl);
+      const data = await submitAuditApi(videoUrl, handleProgress);
       setResults(data);
       setPhase('success');
     } catch (err) {
@@ -42,7 +52,8 @@ export function useAudit() {
     setResults(null);
     setError(null);
     setStartTime(null);
+    setProgressStep(0);
   };
 
-  return { phase, results, error, startTime, submitAudit, reset };
+  return { phase, results, error, startTime, progressStep, submitAudit, reset };
 }
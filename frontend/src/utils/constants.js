@@ -6,6 +6,26 @@ export const LOADING_STEPS = [
   { label: 'Generating compliance report', icon: 'FileCheck', duration: 30000 },
 ];
 
+// Index into LOADING_STEPS that a progress event from the backend proves
+// has been reached
+export const PROGRESS_EVENT_STEPS = {
+  download_started: 0,
+  download_progress: 0,
+  download_finished: 1,
+  upload_started: 1,
+  upload_progress: 1,
+  upload_finished: 2,
+  insights_reused: 2,
+  indexing_progress: 2,
+  retrieval_finished: 3,
+  precheck_finished: 3,
+  prompt_built: 3,
+  llm_started: 3,
+  llm_token: 3,
+  llm_repair: 3,
+  audit_skipped: 4,
+};
+
 export const SEVERITY_CONFIG = {
   CRITICAL: {
     bg: 'bg-red-950',
@@ -10,6 +10,7 @@ compliance audit workflow. Think of it as the master switch that:
 
 # Standard library imports for basic Python functionality
 import uuid      # Generates unique IDs (like session tracking numbers)
+import asyncio   # The workflow nodes are async, so the graph runs in an event loop
 import json      # Handles JSON data formatting (converts Python dicts to readable text)
 import logging   # Records what happens during execution (like a flight recorder)
 from pprint import pprint  # Pretty-prints data structures (unused here, but available)
@@ -79,10 +80,10 @@ def run_cli_simulation():
     # ========== STEP 3: EXECUTE GRAPH ==========
     # This is where the magic happens - runs the entire workflow
     try:
-        # app.invoke() triggers the LangGraph workflow
+        # app.ainvoke() triggers the LangGraph workflow (the nodes are async)
         # It passes through: START → Indexer → Auditor → END
         # Returns the final state with all results
-        final_state = app.invoke(initial_inputs)
+        final_state = asyncio.run(app.ainvoke(initial_inputs))
         
         # ========== DISPLAY SECTION: EXECUTION COMPLETE ==========
         print("\n--- 2. WORKFLOW EXECUTION COMPLETE ---")